@@ -68,7 +68,10 @@ analyzer.request_and_plot_metric(
     uplift_vs='control_segment'
 )
 
-# Get conversion breakdown data for further analysis
+# Get aggregated conversion breakdowns for further analysis
 conversion_data = analyzer.get_conversion_breakdowns()
 print(f"\nConversion breakdown data: {conversion_data.shape[0]} rows")
 print(conversion_data.head())
+
+# Row-level conversions are still available when needed
+conversion_rows = analyzer.get_conversion_breakdowns(row_level=True)
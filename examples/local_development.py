@@ -8,7 +8,7 @@ from unified_hex_harvest import ExperimentAnalyzer, create_experiment_config, se
 
 # Setup credentials for local development
 # This will look for local_secrets_actual.py with your real credentials
-setup_credentials(use_hex_secrets=False)
+setup_credentials(use_hex_secrets=False, application_default=True)
 
 # Now you can run your analysis locally
 config = create_experiment_config(
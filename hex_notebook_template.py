@@ -21,7 +21,7 @@ Just modify the experiment parameters below and run the analysis!
 ! uv pip install git+https://github.com/pcer96/unified_hex.git
 
 # Import the centralized library
-from unified_hex_harvest import ExperimentAnalyzer, ExperimentConfig, create_experiment_config
+from unified_hex_harvest import ExperimentAnalyzer, ExperimentConfig, create_experiment_config, setup_credentials
 
 # Standard imports (these should already be available in your Hex environment)
 import os
@@ -35,10 +35,10 @@ from datetime import datetime
 # 🔐 SETUP CREDENTIALS
 # =============================================================================
 
-# Setup credentials (same as your original notebook)
-with open('credentials.json', 'w') as f:
-    f.write(HARVEST_CREDENTIALS)
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = 'credentials.json'
+# Setup credentials in memory (no credentials.json is written). The bsp helpers build
+# their own BigQuery clients, so the key is also exposed to them through
+# GOOGLE_APPLICATION_CREDENTIALS, as a private temporary file removed at exit
+setup_credentials(use_hex_secrets=True, application_default=True)
 
 # =============================================================================
 # 🔧 EXPERIMENT CONFIGURATION
@@ -8,8 +8,12 @@ setup(
     packages=find_packages(),
     install_requires=[
         "pandas",
+        "numpy",
         "plotly>=5.24.1",
         "pandas-gbq",
+        "pyarrow",
+        "google-cloud-bigquery",
+        "db-dtypes",
         "scipy",
         "slack-sdk",
         "kaleido",
@@ -17,4 +21,9 @@ setup(
         # Add other dependencies from your current notebook
     ],
     python_requires=">=3.8",
+    entry_points={
+        "console_scripts": [
+            "unified-hex=unified_hex_harvest.cli:main",
+        ],
+    },
 )
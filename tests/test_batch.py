@@ -0,0 +1,75 @@
+"""
+Tests of the batch statistics queries.
+"""
+
+import pytest
+
+from unified_hex_harvest.core.batch import get_batch_queries
+from unified_hex_harvest.core.config import ExperimentConfig
+
+METRICS = ['ConversionToSubscription', 'SubscriptionArpu']
+
+
+class Query:
+    """Stand-in for the bsp query builder, found in the callers' globals like in Hex."""
+    
+    def __init__(self):
+        self.parts = []
+    
+    def __getattr__(self, name):
+        def clause(*args, **kwargs):
+            self.parts.append(f"{name.rstrip('_').upper()} {args}")
+            return self
+        return clause
+    
+    def to_sql(self) -> str:
+        return ' '.join(self.parts)
+
+
+def _config(name: str, start_date: str, end_date: str, **kwargs) -> ExperimentConfig:
+    return ExperimentConfig(name, start_date, end_date, experiment_segments=['control', 'treatment'], metrics_list=METRICS, **kwargs)
+
+
+def test_batch_queries_group_experiments_by_granularity():
+    short_a = _config('short_a', '2025-01-01', '2025-01-20')
+    short_b = _config('short_b', '2025-01-10', '2025-01-31')
+    long = _config('long', '2025-01-01', '2025-03-31')
+    
+    queries = get_batch_queries([short_a, long, short_b])
+    
+    assert [[config.experiment_name for config in group] for group, _ in queries] == [['short_a', 'short_b'], ['long']]
+    daily_sql = queries[0][1]
+    # One scan per metric for the whole group, bins counted from each experiment's start
+    assert [daily_sql.count(f"'{metric}' AS metric") for metric in METRICS] == [1, 1]
+    assert "WHEN 'short_a' THEN TIMESTAMP('2025-01-01')" in daily_sql
+    assert "WHEN 'short_b' THEN TIMESTAMP('2025-01-10')" in daily_sql
+    assert 'GENERATE_ARRAY(0, 21)' in daily_sql
+    assert "'long'" not in daily_sql
+
+
+def test_batch_queries_skip_metrics_without_statistics():
+    config = _config('paywall', '2025-01-01', '2025-01-31')
+    
+    [(_, sql)] = get_batch_queries([config], ['ConversionToSubscription', 'NotAMetric'])
+    
+    assert "'ConversionToSubscription' AS metric" in sql
+    assert 'NotAMetric' not in sql
+
+
+@pytest.mark.parametrize('kwargs, message', [
+    ({'sample_rate': 0.1}, 'same sample_rate'),
+    ({'cuped': True}, 'do not support cuped or shards'),
+    ({'shards': 4}, 'do not support cuped or shards'),
+])
+def test_batch_queries_reject_settings_they_cannot_honour(kwargs, message):
+    configs = [_config('paywall', '2025-01-01', '2025-01-31'), _config('onboarding', '2025-01-01', '2025-01-31', **kwargs)]
+    
+    with pytest.raises(ValueError, match=message):
+        get_batch_queries(configs)
+
+
+def test_batch_queries_reject_duplicate_experiments():
+    config = _config('paywall', '2025-01-01', '2025-01-31')
+    
+    with pytest.raises(ValueError, match='only appear once'):
+        get_batch_queries([config, config])
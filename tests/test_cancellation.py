@@ -0,0 +1,50 @@
+"""
+Tests of stage timeouts and cancellation.
+"""
+
+import threading
+import time
+
+import pytest
+
+from unified_hex_harvest.core.config import ExperimentConfig
+from unified_hex_harvest.core.experiment_analyzer import ExperimentAnalyzer
+from unified_hex_harvest.utils.cancellation import Cancelled, CancellationToken, DeadlineExceeded
+
+
+def test_child_is_cancelled_with_parent():
+    parent = CancellationToken()
+    child = parent.child()
+    parent.cancel('stop')
+    
+    with pytest.raises(Cancelled):
+        child.check()
+
+
+def test_stage_deadline_does_not_apply_to_concurrent_stages():
+    config = ExperimentConfig(
+        'test_experiment', '2025-01-01', '2025-01-31',
+        experiment_segments=['control', 'treatment'],
+        stage_timeout_seconds=1.0
+    )
+    analyzer = ExperimentAnalyzer(config)
+    errors = {}
+    
+    def run(stage: str, delay: float):
+        time.sleep(delay)
+        try:
+            analyzer._checkpointed(stage, lambda cancellation: cancellation.sleep(0.7, interval=0.05))
+        except Exception as e:
+            errors[stage] = e
+    
+    # The second stage outlives the first one's deadline but not its own
+    threads = [threading.Thread(target=run, args=('first', 0)), threading.Thread(target=run, args=('second', 0.5))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == {}
+    
+    with pytest.raises(DeadlineExceeded, match='slow'):
+        analyzer._checkpointed('slow', lambda cancellation: cancellation.sleep(2, interval=0.05))
@@ -0,0 +1,46 @@
+"""
+Tests of the local warehouse cost ledger.
+"""
+
+import pytest
+
+from unified_hex_harvest.utils.cost_ledger import USD_PER_TIB, CostLedger, label_value
+
+
+def _record(ledger: CostLedger, job_id: str, metric: str, day: str, tib: float, mode: str = 'batch'):
+    ledger.record(created_at=f'{day}T06:00:00', run_id=f'run-{day}', job_id=job_id, experiment_name='paywall',
+                  metric=metric, stage='sufficient_stats', execution_mode=mode, bytes_billed=int(tib * 2 ** 40))
+
+
+def test_ledger_breaks_the_bill_down(tmp_path):
+    ledger = CostLedger(str(tmp_path / 'ledger.sqlite'))
+    _record(ledger, 'job-1', 'SubscriptionArpu', '2025-01-01', 2.0)
+    _record(ledger, 'job-2', 'ConversionToSubscription', '2025-01-01', 0.5)
+    _record(ledger, 'job-3', 'SubscriptionArpu', '2025-01-02', 1.0, mode='interactive')
+    
+    top = ledger.top(by='metric')
+    daily = ledger.daily(execution_mode='batch')
+    
+    assert list(top['metric']) == ['SubscriptionArpu', 'ConversionToSubscription']
+    assert list(top['cost_usd']) == pytest.approx([3.0 * USD_PER_TIB, 0.5 * USD_PER_TIB])
+    assert list(daily['date']) == ['2025-01-01']
+    assert ledger.summary(since='2025-01-02')['cost_usd'] == pytest.approx(USD_PER_TIB)
+    with pytest.raises(ValueError, match='Cannot group by'):
+        ledger.top(by='job_id')
+
+
+def test_label_values_are_valid_bigquery_labels():
+    assert label_value('SubscriptionArpu') == 'subscriptionarpu'
+    assert label_value('Paywall Test: v2.1') == 'paywall_test__v2_1'
+    assert len(label_value('x' * 100)) == 63
+
+
+def test_jobs_re_attached_to_are_recorded_once(tmp_path):
+    ledger = CostLedger(str(tmp_path / 'ledger.sqlite'))
+    _record(ledger, 'harvest_run_abc', 'SubscriptionArpu', '2025-01-01', 1.0)
+    # A retry or a resumed run re-attaches to the finished job and reports it again
+    _record(ledger, 'harvest_run_abc', 'SubscriptionArpu', '2025-01-02', 1.0)
+    _record(ledger, 'harvest_run_abc_retry1', 'SubscriptionArpu', '2025-01-02', 1.0)
+    
+    assert list(ledger.jobs()['job_id']) == ['harvest_run_abc', 'harvest_run_abc_retry1']
+    assert ledger.summary()['cost_usd'] == pytest.approx(2 * USD_PER_TIB)
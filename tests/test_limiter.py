@@ -0,0 +1,82 @@
+"""
+Tests of the cross-process warehouse slot limiter.
+"""
+
+import threading
+import time
+
+from unified_hex_harvest.utils.limiter import WarehouseLimiter
+
+
+def _limiter(tmp_path, **kwargs) -> WarehouseLimiter:
+    return WarehouseLimiter(str(tmp_path / 'slots.sqlite'), poll_interval=0.01, **kwargs)
+
+
+def _wait_for(condition, timeout: float = 5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, 'condition not reached'
+        time.sleep(0.01)
+
+
+def test_interactive_waiters_go_ahead_of_earlier_batch_waiters(tmp_path):
+    limiter = _limiter(tmp_path, slots=1, interactive_reserved_slots=0)
+    granted = []
+    
+    def job(priority: str):
+        with limiter.slot(priority):
+            granted.append(priority)
+    
+    with limiter.slot('interactive'):
+        batch = threading.Thread(target=job, args=('batch',))
+        batch.start()
+        _wait_for(lambda: limiter.usage()['waiting_batch'] == 1)
+        interactive = threading.Thread(target=job, args=('interactive',))
+        interactive.start()
+        _wait_for(lambda: limiter.usage()['waiting_interactive'] == 1)
+    batch.join()
+    interactive.join()
+    
+    assert granted == ['interactive', 'batch']
+
+
+def test_reserved_slots_are_only_given_to_interactive_work(tmp_path):
+    limiter = _limiter(tmp_path, slots=2, interactive_reserved_slots=1)
+    release = threading.Event()
+    
+    def batch_job():
+        with limiter.slot('batch'):
+            release.wait()
+    
+    first = threading.Thread(target=batch_job)
+    first.start()
+    _wait_for(lambda: limiter.usage()['running_batch'] == 1)
+    second = threading.Thread(target=batch_job)
+    second.start()
+    _wait_for(lambda: limiter.usage()['waiting_batch'] == 1)
+    
+    # The reserved slot is free for notebook work while the second batch job waits
+    with limiter.slot('interactive'):
+        assert limiter.usage() == {'running_interactive': 1, 'waiting_interactive': 0, 'running_batch': 1, 'waiting_batch': 1}
+    release.set()
+    first.join()
+    second.join()
+    assert limiter.usage()['running_batch'] == 0
+
+
+def test_slots_held_longer_than_the_lease_are_kept(tmp_path):
+    limiter = _limiter(tmp_path, slots=1, interactive_reserved_slots=0, lease_seconds=0.3)
+    granted_at = []
+    
+    def job():
+        with limiter.slot('interactive'):
+            granted_at.append(time.time())
+    
+    with limiter.slot('interactive'):
+        waiter = threading.Thread(target=job)
+        waiter.start()
+        time.sleep(1.0)
+        released_at = time.time()
+    waiter.join()
+    
+    assert granted_at[0] >= released_at
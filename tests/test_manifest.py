@@ -0,0 +1,129 @@
+"""
+Tests of experiment manifests, recompute planning and config fingerprints.
+"""
+
+import json
+from dataclasses import replace
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from unified_hex_harvest.core.config import ExperimentConfig
+from unified_hex_harvest.core.manifest import checkpoint_fingerprint, load_manifest, plan_recompute
+from unified_hex_harvest.utils.results_store import ResultsStore
+
+TODAY = date(2025, 3, 1)
+METRICS = ['ConversionToSubscription', 'SubscriptionArpu']
+
+
+def _config(**kwargs) -> ExperimentConfig:
+    return ExperimentConfig('test_experiment', '2025-01-01', '2025-01-31', experiment_segments=['control', 'treatment'], **kwargs)
+
+
+def _write_manifest(tmp_path, manifest) -> str:
+    path = tmp_path / 'experiments.json'
+    path.write_text(json.dumps(manifest))
+    return str(path)
+
+
+def _save(store: ResultsStore, plan, name: str):
+    stats_df = pd.DataFrame({'metric': plan.metrics[name], 'time_bin': 0, 'segment_name': 'control', 'n': 100})
+    store.save(name, plan.config_fingerprints[name], plan.metric_fingerprints[name], stats_df)
+
+
+def test_load_manifest_applies_defaults(tmp_path):
+    path = _write_manifest(tmp_path, {
+        'defaults': {'experiment_segments': ['control', 'treatment'], 'metrics_list': METRICS},
+        'experiments': [
+            {'experiment_name': 'paywall_copy_test', 'start_date': '2025-01-01', 'end_date': '2025-01-31'},
+            {'experiment_name': 'onboarding', 'start_date': '2025-01-15', 'end_date': '2025-02-15',
+             'metrics_list': ['Retention']},
+        ],
+    })
+    
+    paywall, onboarding = load_manifest(path)
+    
+    assert paywall.experiment_segments == ['control', 'treatment']
+    assert paywall.metrics_list == METRICS
+    assert onboarding.metrics_list == ['Retention']
+    assert onboarding.actions_end_date == '2025-02-15'
+
+
+def test_load_manifest_reports_every_problem(tmp_path):
+    path = _write_manifest(tmp_path, {'experiments': [
+        {'experiment_name': 'unknown_field', 'start_date': '2025-01-01', 'end_date': '2025-01-31', 'colour': 'red'},
+        {'experiment_name': 'missing_end', 'start_date': '2025-01-01'},
+        {'experiment_name': 'bad_date', 'start_date': '01/01/2025', 'end_date': '2025-01-31'},
+        {'experiment_name': 'bad_metric', 'start_date': '2025-01-01', 'end_date': '2025-01-31', 'metrics_list': ['Revenue']},
+    ]})
+    
+    with pytest.raises(ValueError) as error:
+        load_manifest(path)
+    
+    for label in ['unknown_field', 'missing_end', 'bad_date', 'bad_metric']:
+        assert f'- {label}:' in str(error.value)
+
+
+def test_load_manifest_rejects_cuped_and_shards_in_batches(tmp_path):
+    path = _write_manifest(tmp_path, {
+        'defaults': {'start_date': '2025-01-01', 'end_date': '2025-01-31'},
+        'experiments': [
+            {'experiment_name': 'adjusted', 'cuped': True},
+            {'experiment_name': 'sharded', 'shards': 4},
+        ],
+    })
+    
+    with pytest.raises(ValueError, match='adjusted: cuped and shards'):
+        load_manifest(path)
+    assert [config.shards for config in load_manifest(path, batch=False)] == [1, 4]
+
+
+def test_plan_recompute_keeps_stored_results_until_stale(tmp_path):
+    store = ResultsStore(str(tmp_path))
+    config = _config(metrics_list=METRICS)
+    
+    plan = plan_recompute([config], store, TODAY)
+    assert plan.metrics == {'test_experiment': METRICS}
+    assert plan.reasons['test_experiment'] == 'new experiment'
+    
+    _save(store, plan, 'test_experiment')
+    assert plan_recompute([config], store, TODAY).is_empty
+    # Presentation settings do not change the statistics
+    assert plan_recompute([replace(config, include_significance=True, significance_level=0.01)], store, TODAY).is_empty
+
+
+def test_plan_recompute_limits_work_to_stale_metrics(tmp_path):
+    store = ResultsStore(str(tmp_path))
+    config = _config(metrics_list=METRICS)
+    _save(store, plan_recompute([config], store, TODAY), 'test_experiment')
+    
+    added = plan_recompute([replace(config, metrics_list=METRICS + ['Retention'])], store, TODAY)
+    assert added.metrics == {'test_experiment': ['Retention']}
+    assert added.reasons['test_experiment'] == 'new or changed metrics'
+    
+    sampled = plan_recompute([replace(config, sample_rate=0.1)], store, TODAY)
+    assert sampled.metrics == {'test_experiment': METRICS}
+    assert sampled.reasons['test_experiment'] == 'config or data changed'
+    
+    # A running experiment gets a new day of data
+    running = replace(config, end_date='2025-03-31', actions_end_date='2025-03-31')
+    _save(store, plan_recompute([running], store, TODAY), 'test_experiment')
+    assert plan_recompute([running], store, TODAY).is_empty
+    assert plan_recompute([running], store, date(2025, 3, 2)).metrics == {'test_experiment': METRICS}
+
+
+def test_checkpoint_fingerprint_ignores_operational_settings():
+    config = _config()
+    resumed = replace(config, stage_timeout_seconds=900, run_timeout_seconds=3600, query_retries=0,
+                      max_concurrent_stages=1, profile_memory=True, memory_warning_mb=None)
+    
+    assert checkpoint_fingerprint(config, config.metrics_list, TODAY) == checkpoint_fingerprint(resumed, config.metrics_list, TODAY)
+
+
+def test_checkpoint_fingerprint_follows_analysis_and_metrics():
+    config = _config()
+    fingerprint = checkpoint_fingerprint(config, config.metrics_list, TODAY)
+    
+    assert checkpoint_fingerprint(replace(config, sample_rate=0.1), config.metrics_list, TODAY) != fingerprint
+    assert checkpoint_fingerprint(config, config.metrics_list[:2], TODAY) != fingerprint
@@ -0,0 +1,43 @@
+"""
+Tests of the stage planner.
+"""
+
+import threading
+
+import pytest
+
+from unified_hex_harvest.core.planner import StagePlan
+from unified_hex_harvest.utils.bsp_helpers import find_helper, using_helpers
+
+
+def test_order_follows_inputs():
+    plan = StagePlan('test')
+    plan.add('render', lambda inputs: None, ['data'], main_thread=True)
+    plan.add('data', lambda inputs: 1)
+    
+    assert plan.order() == ['data', 'render']
+
+
+def test_cycle_is_rejected():
+    plan = StagePlan('test')
+    plan.add('a', lambda inputs: None, ['b'])
+    plan.add('b', lambda inputs: None, ['a'])
+    
+    with pytest.raises(ValueError):
+        plan.order()
+
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_worker_stages_find_resolved_helpers(max_workers):
+    def request_multiple_metrics():
+        return 'metrics'
+    
+    plan = StagePlan('test')
+    plan.add('fetch', lambda inputs: (find_helper('request_multiple_metrics')(), threading.current_thread().name))
+    plan.add('render', lambda inputs: inputs['fetch'], ['fetch'], main_thread=True)
+    
+    with using_helpers({'request_multiple_metrics': request_multiple_metrics}):
+        results = plan.run(max_workers)
+    
+    assert results['render'][0] == 'metrics'
+    assert results['render'][1].startswith('stage') == (max_workers > 1)
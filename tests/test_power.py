@@ -0,0 +1,62 @@
+"""
+Tests of the power and sample-size planner.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from unified_hex_harvest.core.config import ExperimentConfig
+from unified_hex_harvest.core.power import PowerPlanner
+
+# 28 days of a reference experiment: 10% conversion, revenue of 2.0 per user
+REFERENCE = pd.DataFrame([
+    {'metric': 'ConversionToSubscription', 'segment_name': segment, 'time_bin': 0, 'n': 14000.0,
+     'sum_x': 1400.0, 'sum_x2': 1400.0, 'sum_y': 1400.0, 'sum_y2': 1400.0, 'sum_xy': 1400.0}
+    for segment in ['control', 'treatment']
+] + [
+    {'metric': 'SubscriptionArpu', 'segment_name': segment, 'time_bin': 0, 'n': 14000.0,
+     'sum_x': 28000.0, 'sum_x2': 14000.0 * (25.0 + 4.0), 'sum_y': 2800.0, 'sum_y2': 2800.0, 'sum_xy': 28000.0}
+    for segment in ['control', 'treatment']
+])
+
+
+@pytest.fixture
+def planner() -> PowerPlanner:
+    config = ExperimentConfig('draft', '2025-03-01', '2025-03-28', experiment_segments=['control', 'treatment'],
+                              metrics_list=['ConversionToSubscription', 'SubscriptionArpu'])
+    return PowerPlanner(config)
+
+
+def test_baselines_pool_the_reference_arms(planner):
+    baselines = planner.get_baselines('reference', '2025-01-01', '2025-01-28', stats_df=REFERENCE).set_index('metric')
+    
+    assert baselines.loc['ConversionToSubscription', 'baseline'] == pytest.approx(0.1)
+    assert baselines.loc['ConversionToSubscription', 'unit_variance'] == pytest.approx(0.09)
+    assert baselines.loc['SubscriptionArpu', 'baseline'] == pytest.approx(2.0)
+    assert baselines.loc['SubscriptionArpu', 'unit_variance'] == pytest.approx(25.0, rel=1e-3)
+    assert baselines.loc['SubscriptionArpu', 'daily_users'] == pytest.approx(1000.0)
+
+
+def test_required_runtime_matches_closed_form(planner):
+    baselines = planner.get_baselines('reference', '2025-01-01', '2025-01-28', stats_df=REFERENCE)
+    
+    runtime = planner.required_runtime(baselines, mde=[0.05], power=0.8).set_index('metric')
+    
+    # Two equal arms: n per arm = (z_alpha/2 + z_beta)^2 * 2 * variance / delta^2
+    z = stats.norm.ppf(0.975) + stats.norm.ppf(0.8)
+    per_arm = z ** 2 * 2 * 0.09 / (0.05 * 0.1) ** 2
+    assert runtime.loc['ConversionToSubscription', 'required_users'] == pytest.approx(2 * per_arm)
+    assert runtime.loc['ConversionToSubscription', 'required_days'] == np.ceil(2 * per_arm / 1000)
+
+
+def test_power_grid_agrees_with_required_runtime(planner):
+    baselines = planner.get_baselines('reference', '2025-01-01', '2025-01-28', stats_df=REFERENCE)
+    runtime = planner.required_runtime(baselines, mde=[0.1], n_arms=[3], control_share=[0.5])
+    days = int(runtime.set_index('metric').loc['SubscriptionArpu', 'required_days'])
+    
+    grid = planner.power_grid(baselines, mde=[0.1], n_arms=[3], control_share=[0.5], durations=[days - 1, days])
+    power = grid[grid['metric'] == 'SubscriptionArpu'].set_index('duration_days')['power']
+    
+    assert power[days - 1] < 0.8 <= power[days]
@@ -0,0 +1,41 @@
+"""
+Tests of the shared query result cache.
+"""
+
+from types import SimpleNamespace
+
+import pandas as pd
+
+from unified_hex_harvest.utils import result_cache
+from unified_hex_harvest.utils.result_cache import LocalBackend, ResultCache
+
+
+def test_result_round_trip_ignores_whitespace(tmp_path):
+    cache = ResultCache(LocalBackend(str(tmp_path)))
+    df = pd.DataFrame({'segment_name': ['control', 'treatment'], 'users': [100, 120]})
+    cache.put('SELECT *\nFROM users', df)
+    
+    pd.testing.assert_frame_equal(cache.get('SELECT * FROM users'), df)
+    assert cache.get('SELECT * FROM events') is None
+
+
+
+def test_results_expire_and_are_pruned(tmp_path, monkeypatch):
+    clock = [1000000.0]
+    monkeypatch.setattr(result_cache, 'time', SimpleNamespace(time=lambda: clock[0]))
+    backend = LocalBackend(str(tmp_path))
+    cache = ResultCache(backend, max_age_hours=12)
+    df = pd.DataFrame({'users': [100]})
+    cache.put('SELECT 1', df)
+    clock[0] += 6 * 3600
+    cache.put('SELECT 2', df)
+    
+    clock[0] += 7 * 3600
+    
+    assert cache.get('SELECT 1') is None
+    pd.testing.assert_frame_equal(cache.get('SELECT 2'), df)
+    assert ResultCache(backend, max_age_hours=None).get('SELECT 1') is not None
+    assert cache.prune() == 1
+    assert [entry['sql'] for entry in backend.entries()] == ['SELECT 2']
+    assert cache.prune(max_age_hours=1) == 1
+    assert backend.entries() == []
@@ -0,0 +1,98 @@
+"""
+Tests of the classification and retrying of transient warehouse errors.
+"""
+
+import concurrent.futures
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from unified_hex_harvest.utils.retry import RetryPolicy, is_retryable
+from unified_hex_harvest.utils.warehouse import Warehouse
+
+
+class APIError(Exception):
+    """Error shaped like ``google.api_core.exceptions.GoogleAPICallError``."""
+    
+    def __init__(self, code=None, errors=None):
+        super().__init__('api error')
+        self.code = code
+        self.errors = errors or []
+
+
+@pytest.mark.parametrize('error', [
+    ConnectionError('reset'),
+    TimeoutError('timed out'),
+    concurrent.futures.TimeoutError(),
+    APIError(code=429),
+    APIError(code=503),
+    APIError(code=400, errors=[{'reason': 'rateLimitExceeded'}]),
+    APIError(errors=[{'reason': 'backendError'}]),
+])
+def test_transient_errors_are_retryable(error):
+    assert is_retryable(error)
+
+
+@pytest.mark.parametrize('error', [
+    ValueError('bad value'),
+    APIError(code=400, errors=[{'reason': 'invalidQuery'}]),
+    APIError(code=403, errors=[{'reason': 'accessDenied'}]),
+])
+def test_permanent_errors_are_not_retryable(error):
+    assert not is_retryable(error)
+
+
+def test_requests_errors_are_retryable():
+    requests = pytest.importorskip('requests')
+    
+    assert is_retryable(requests.exceptions.ConnectionError('reset'))
+    assert is_retryable(requests.exceptions.ReadTimeout('timed out'))
+    assert not is_retryable(requests.exceptions.HTTPError('not found'))
+
+
+def test_call_retries_until_success():
+    attempts = []
+    
+    def flaky(attempt: int) -> str:
+        attempts.append(attempt)
+        if attempt < 2:
+            raise APIError(code=503)
+        return 'done'
+    
+    assert RetryPolicy(max_retries=3, initial_delay=0).call(flaky) == 'done'
+    assert attempts == [0, 1, 2]
+
+
+def test_call_raises_permanent_errors_immediately():
+    attempts = []
+    
+    def invalid(attempt: int):
+        attempts.append(attempt)
+        raise ValueError('bad query')
+    
+    with pytest.raises(ValueError):
+        RetryPolicy(max_retries=3, initial_delay=0).call(invalid)
+    assert attempts == [0]
+
+
+def test_job_ids_are_reused_by_retries_and_runs_only():
+    warehouse = Warehouse(retry_policy=RetryPolicy(max_retries=2, initial_delay=0))
+    job_ids = []
+    
+    def run_job(query, labels, job_id, cancellation):
+        job_ids.append(job_id)
+        if len(job_ids) == 1:
+            raise APIError(code=503)
+        return SimpleNamespace(job_id=job_id, cache_hit=False), pd.DataFrame({'n': [1]})
+    
+    warehouse._run_job = run_job
+    warehouse.read_gbq('SELECT 1')
+    warehouse.read_gbq('SELECT 1')
+    
+    # The retry re-attaches to the job of its call, a later call does not
+    assert job_ids[0] == job_ids[1] != job_ids[2]
+    with warehouse.run('resumed'):
+        assert warehouse.job_id('SELECT 1') == warehouse.job_id('SELECT 1')
+        assert warehouse.job_id('SELECT 1').startswith('harvest_resumed_')
+    assert warehouse.run_id is None
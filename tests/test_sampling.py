@@ -0,0 +1,94 @@
+"""
+Tests of hash-based user sampling: the sampling condition and the confidence bands of metric charts.
+"""
+
+import hashlib
+import re
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from unified_hex_harvest.core.config import ExperimentConfig
+from unified_hex_harvest.core.experiment_analyzer import ExperimentAnalyzer
+from unified_hex_harvest.utils.data_queries import DataQueries
+
+USERS = [f'user-{i}' for i in range(20000)]
+
+
+def _fingerprint(value: str) -> int:
+    """Signed 64-bit hash standing in for FARM_FINGERPRINT."""
+    return int.from_bytes(hashlib.sha256(value.encode()).digest()[:8], 'big', signed=True)
+
+
+def _evaluate(condition: str, uid: str) -> bool:
+    """Evaluate an ABS(MOD(FARM_FINGERPRINT(...), m)) condition for one user id."""
+    match = re.fullmatch(r"ABS\(MOD\(FARM_FINGERPRINT\((uid)\), (\d+)\)\) (<|=) (\d+)", condition)
+    _, modulus, operator, bound = match.groups()
+    # BigQuery MOD keeps the sign of the dividend, so ABS(MOD(h, m)) is |h| % m
+    bucket = abs(_fingerprint(uid)) % int(modulus)
+    return bucket < int(bound) if operator == '<' else bucket == int(bound)
+
+
+def test_sample_keeps_the_same_users_in_every_query():
+    assert DataQueries.sample_filter('uid', 0.1) == DataQueries.sample_filter('uid', 0.1)
+    
+    small = {uid for uid in USERS if _evaluate(DataQueries.sample_filter('uid', 0.1), uid)}
+    large = {uid for uid in USERS if _evaluate(DataQueries.sample_filter('uid', 0.5), uid)}
+    
+    # A larger rate extends the sample rather than drawing a new one
+    assert small < large
+    assert len(small) / len(USERS) == pytest.approx(0.1, abs=0.01)
+    assert len(large) / len(USERS) == pytest.approx(0.5, abs=0.02)
+    assert all(_evaluate(DataQueries.sample_filter('uid', 1.0), uid) for uid in USERS)
+
+
+@pytest.mark.parametrize('sample_rate', [0, -0.5, 1.5])
+def test_sample_rate_outside_unit_interval_is_rejected(sample_rate):
+    with pytest.raises(ValueError, match='sample_rate'):
+        DataQueries.sample_filter('uid', sample_rate)
+
+
+class _Axes:
+    """Records the bands drawn on a chart."""
+    
+    def __init__(self):
+        self.bands = []
+    
+    def fill_between(self, x, low, high, **kwargs):
+        self.bands.append((list(x), list(low), list(high)))
+
+
+def test_sample_bands_share_one_query_and_follow_the_profile():
+    metrics = ['ConversionToSubscription', 'AutoRenewOff']
+    config = ExperimentConfig('test_experiment', '2025-01-01', '2025-01-31', experiment_segments=['control', 'treatment'],
+                              metrics_list=metrics, sample_rate=0.1)
+    analyzer = ExperimentAnalyzer(config)
+    queries = []
+    
+    def get_sufficient_stats(metric_names, exclude_converted=False):
+        queries.append(list(metric_names))
+        # 10% conversion, 100 sampled users a day
+        return pd.DataFrame([
+            {'metric': metric, 'segment_name': segment, 'time_bin': time_bin, 'n': 100.0 * (time_bin + 1),
+             'sum_x': 10.0 * (time_bin + 1), 'sum_x2': 10.0 * (time_bin + 1), 'sum_y': 0.0, 'sum_y2': 0.0, 'sum_xy': 0.0}
+            for metric in metric_names for segment in config.experiment_segments for time_bin in range(3)
+        ])
+    
+    analyzer.get_sufficient_stats = get_sufficient_stats
+    # The profiles start one bin later than the statistics
+    days = list(pd.date_range('2025-01-02', periods=2))
+    results = [SimpleNamespace(profile={'time_bin': days, 'value': [0.1, 0.1]}) for _ in range(2)]
+    ax = _Axes()
+    
+    for metric in metrics:
+        analyzer._plot_sample_bands(ax, metric, results, ['blue', 'red'], exclude_converted=False)
+    
+    assert queries == [metrics]
+    assert len(ax.bands) == 4
+    x, low, _ = ax.bands[0]
+    half_width = stats.norm.ppf(0.975) * np.sqrt(0.09 / np.array([200.0, 300.0]))
+    assert x == days
+    assert low == pytest.approx(0.1 - half_width)
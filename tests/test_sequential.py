@@ -0,0 +1,86 @@
+"""
+Tests of the incremental sequential test state and of its band on metric charts.
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from unified_hex_harvest.core.config import ExperimentConfig
+from unified_hex_harvest.core.experiment_analyzer import ExperimentAnalyzer
+from unified_hex_harvest.core.sequential import SequentialTest
+from unified_hex_harvest.core.significance import SufficientStats
+
+SEGMENTS = ['control', 'treatment']
+
+
+def _stats(metrics, time_bins) -> SufficientStats:
+    """Cumulative statistics of a proportion growing by 100 users a day, with a lift in treatment."""
+    rows = []
+    for metric in metrics:
+        for segment, rate in zip(SEGMENTS, [0.10, 0.13]):
+            for time_bin in time_bins:
+                n = 100.0 * (time_bin + 1)
+                conversions = np.floor(n * rate)
+                rows.append({'metric': metric, 'segment_name': segment, 'time_bin': time_bin, 'n': n,
+                             'sum_x': conversions, 'sum_x2': conversions, 'sum_y': 0.0, 'sum_y2': 0.0, 'sum_xy': 0.0})
+    return SufficientStats.from_frame(pd.DataFrame(rows), segments=SEGMENTS)
+
+
+def test_metric_added_later_starts_from_first_bin(tmp_path):
+    test = SequentialTest('test_experiment', SEGMENTS, state_dir=str(tmp_path))
+    test.update(_stats(['ConversionToSubscription'], range(5)))
+    test.update(_stats(['ConversionToSubscription', 'AutoRenewOff'], range(8)))
+    
+    reference = SequentialTest('reference', SEGMENTS, state_dir=str(tmp_path))
+    reference.update(_stats(['ConversionToSubscription'], range(8)))
+    
+    added = test.history_frame('AutoRenewOff')
+    assert list(added['time_bin']) == list(range(8))
+    assert test.last_time_bins == {'ConversionToSubscription': 7, 'AutoRenewOff': 7}
+    pd.testing.assert_frame_equal(test.history_frame('ConversionToSubscription'), reference.history_frame())
+    pd.testing.assert_frame_equal(added.drop(columns='metric'), reference.history_frame().drop(columns='metric'))
+
+
+def test_state_is_reset_when_segments_or_alpha_change(tmp_path):
+    test = SequentialTest('test_experiment', SEGMENTS, state_dir=str(tmp_path))
+    test.update(_stats(['ConversionToSubscription'], range(5)))
+    test.save()
+    
+    assert SequentialTest.load('test_experiment', SEGMENTS, state_dir=str(tmp_path)).last_time_bin('ConversionToSubscription') == 4
+    assert SequentialTest.load('test_experiment', SEGMENTS, alpha=0.01, state_dir=str(tmp_path)).last_time_bins == {}
+    assert SequentialTest.load('test_experiment', SEGMENTS + ['other'], state_dir=str(tmp_path)).history == []
+
+
+class _Axes:
+    """Records the bands drawn on a chart."""
+    
+    def __init__(self):
+        self.bands = []
+    
+    def fill_between(self, x, low, high, **kwargs):
+        self.bands.append((list(x), list(low), list(high)))
+
+
+def test_boundary_is_aligned_on_time_with_the_profile(tmp_path):
+    # Weekly chart bins
+    config = ExperimentConfig('test_experiment', '2025-01-01', '2025-03-31', experiment_segments=SEGMENTS,
+                              sequential_testing=True, sequential_state_dir=str(tmp_path))
+    analyzer = ExperimentAnalyzer(config)
+    analyzer.sequential_test = SequentialTest('test_experiment', SEGMENTS, state_dir=str(tmp_path))
+    analyzer.sequential_test.update(_stats(['ConversionToSubscription'], range(21)))
+    # The profile starts one chart bin later than the daily state
+    days = pd.date_range('2025-01-08', periods=2, freq='7D')
+    results = [SimpleNamespace(profile={'time_bin': list(days), 'value': [0.1, 0.2]}) for _ in SEGMENTS]
+    ax = _Axes()
+    
+    analyzer._plot_sequential_boundary(ax, 'ConversionToSubscription', results, ['blue', 'red'])
+    
+    history = analyzer.sequential_test.history_frame('ConversionToSubscription').set_index('time_bin')
+    [(x, low, high)] = ax.bands
+    assert x == list(days)
+    # Chart bin 1 (2025-01-08) closes on day 13, chart bin 2 on day 20
+    assert low == pytest.approx([0.1 + history.loc[13, 'ci_low'], 0.2 + history.loc[20, 'ci_low']])
+    assert high == pytest.approx([0.1 + history.loc[13, 'ci_high'], 0.2 + history.loc[20, 'ci_high']])
@@ -0,0 +1,67 @@
+"""
+Tests of shard-parallel execution: the shard conditions and the profiles built from sharded statistics.
+"""
+
+import hashlib
+import re
+
+import pandas as pd
+import pytest
+
+from unified_hex_harvest.core.config import ExperimentConfig
+from unified_hex_harvest.core.experiment_analyzer import ExperimentAnalyzer
+from unified_hex_harvest.utils.data_queries import DataQueries
+
+SEGMENTS = ['control', 'treatment']
+
+
+def _evaluate(condition: str, uid: str) -> bool:
+    """Evaluate an ABS(MOD(FARM_FINGERPRINT(...), m)) condition for one user id."""
+    match = re.fullmatch(r"ABS\(MOD\(FARM_FINGERPRINT\((.+)\), (\d+)\)\) (<|=) (\d+)", condition)
+    key, modulus, operator, bound = match.groups()
+    salt = re.fullmatch(r"CONCAT\('(.*)', uid\)", key)
+    # Signed 64-bit hash standing in for FARM_FINGERPRINT
+    h = int.from_bytes(hashlib.sha256(((salt.group(1) if salt else '') + uid).encode()).digest()[:8], 'big', signed=True)
+    bucket = abs(h) % int(modulus)
+    return bucket < int(bound) if operator == '<' else bucket == int(bound)
+
+
+def test_shards_partition_the_users():
+    users = [f'user-{i}' for i in range(12000)]
+    
+    shards = [
+        {uid for uid in users if _evaluate(DataQueries.shard_filter('uid', shard, 4), uid)}
+        for shard in range(4)
+    ]
+    
+    assert sum(len(shard) for shard in shards) == len(users)
+    assert set().union(*shards) == set(users)
+    assert min(len(shard) for shard in shards) > 0.9 * len(users) / 4
+    # Shards are salted, so a sample spreads evenly over them
+    sample = [uid for uid in users if _evaluate(DataQueries.sample_filter('uid', 0.25), uid)]
+    assert all(len(shard.intersection(sample)) == pytest.approx(len(sample) / 4, rel=0.15) for shard in shards)
+
+
+def test_shard_outside_range_is_rejected():
+    with pytest.raises(ValueError, match='shard must be in'):
+        DataQueries.shard_filter('uid', 4, 4)
+
+
+def test_ratio_metric_profile_is_per_exposed_user():
+    config = ExperimentConfig(
+        'test_experiment', '2025-01-01', '2025-01-31',
+        experiment_segments=SEGMENTS, shards=4
+    )
+    analyzer = ExperimentAnalyzer(config)
+    stats_df = pd.DataFrame([
+        {'metric': 'SubscriptionArps', 'segment_name': segment, 'time_bin': time_bin, 'n': 100.0 * (time_bin + 1),
+         'sum_x': revenue * (time_bin + 1), 'sum_x2': 0.0, 'sum_y': 10.0 * (time_bin + 1), 'sum_y2': 0.0, 'sum_xy': 0.0}
+        for segment, revenue in zip(SEGMENTS, [50.0, 60.0])
+        for time_bin in range(3)
+    ])
+    
+    profiles = analyzer._profiles_from_stats(stats_df)
+    
+    # Revenue per exposed user (as request_multiple_metrics), not per paying user
+    assert [profile.profile['value'] for profile in profiles] == [[0.5] * 3, [0.6] * 3]
+    assert profiles[0].profile['time_bin'][1] == pd.Timestamp('2025-01-02')
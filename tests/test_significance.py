@@ -0,0 +1,121 @@
+"""
+Tests of the significance tests computed from sufficient statistics.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from unified_hex_harvest.core.significance import SufficientStats, compare_to_control, significance_table
+
+SEGMENTS = ['treatment_a', 'control', 'treatment_b']
+SIZES = [900, 1000, 1100]
+
+
+def _users(rng, metric: str, segment: int) -> np.ndarray:
+    """Per-user cumulative values of one arm."""
+    if metric == 'ConversionToSubscription':
+        return (rng.random(SIZES[segment]) < [0.12, 0.10, 0.11][segment]).astype(float)
+    # Revenue: most users pay nothing, payers pay a skewed amount
+    paid = rng.random(SIZES[segment]) < 0.2
+    return np.where(paid, rng.gamma(2.0, [12.0, 10.0, 10.5][segment], SIZES[segment]), 0.0)
+
+
+def _row(metric: str, segment: str, x: np.ndarray, **columns) -> dict:
+    y = (x > 0).astype(float)
+    return {'metric': metric, 'segment_name': segment, 'time_bin': 0, 'n': len(x),
+            'sum_x': x.sum(), 'sum_x2': (x * x).sum(), 'sum_y': y.sum(), 'sum_y2': y.sum(), 'sum_xy': x.sum(), **columns}
+
+
+@pytest.fixture
+def users():
+    rng = np.random.default_rng(7)
+    return {
+        metric: [_users(rng, metric, segment) for segment in range(len(SEGMENTS))]
+        for metric in ['ConversionToSubscription', 'SubscriptionArpu', 'SubscriptionArps']
+    }
+
+
+@pytest.fixture
+def results(users):
+    rows = [_row(metric, segment, x) for metric, arms in users.items() for segment, x in zip(SEGMENTS, arms)]
+    s = SufficientStats.from_frame(pd.DataFrame(rows), segments=SEGMENTS)
+    return compare_to_control(s, control_segment='control')
+
+
+def test_proportion_matches_pooled_two_proportion_test(users, results):
+    control = users['ConversionToSubscription'][1]
+    for segment in [0, 2]:
+        treatment = users['ConversionToSubscription'][segment]
+        table = [[treatment.sum(), len(treatment) - treatment.sum()], [control.sum(), len(control) - control.sum()]]
+        _, p_value, _, _ = stats.chi2_contingency(table, correction=False)
+        
+        assert results['estimate'][0, segment, 0] == pytest.approx(treatment.mean())
+        assert results['p_value'][0, segment, 0] == pytest.approx(p_value)
+
+
+def test_mean_matches_welch_t_test(users, results):
+    control = users['SubscriptionArpu'][1]
+    for segment in [0, 2]:
+        treatment = users['SubscriptionArpu'][segment]
+        welch = stats.ttest_ind(treatment, control, equal_var=False)
+        variances = [treatment.var(ddof=1) / len(treatment), control.var(ddof=1) / len(control)]
+        dof = sum(variances) ** 2 / (variances[0] ** 2 / (len(treatment) - 1) + variances[1] ** 2 / (len(control) - 1))
+        half_width = stats.t.ppf(0.975, dof) * np.sqrt(sum(variances))
+        
+        assert results['statistic'][1, segment, 0] == pytest.approx(welch.statistic)
+        assert results['p_value'][1, segment, 0] == pytest.approx(welch.pvalue)
+        assert results['ci_low'][1, segment, 0] == pytest.approx(treatment.mean() - control.mean() - half_width)
+
+
+def test_ratio_matches_delta_method(users, results):
+    def ratio_and_variance(x):
+        y = (x > 0).astype(float)
+        ratio = x.sum() / y.sum()
+        # Delta method: variance of the linearized per-user value x - ratio * y
+        return ratio, (x - ratio * y).var(ddof=1) / (len(x) * y.mean() ** 2)
+    
+    control, control_variance = ratio_and_variance(users['SubscriptionArps'][1])
+    treatment, treatment_variance = ratio_and_variance(users['SubscriptionArps'][2])
+    z = (treatment - control) / np.sqrt(treatment_variance + control_variance)
+    
+    assert results['estimate'][2, 2, 0] == pytest.approx(treatment)
+    assert results['statistic'][2, 2, 0] == pytest.approx(z)
+    assert results['p_value'][2, 2, 0] == pytest.approx(2 * stats.norm.sf(abs(z)))
+
+
+def test_table_drops_control_rows(users):
+    rows = [_row('SubscriptionArpu', segment, x) for segment, x in zip(SEGMENTS, users['SubscriptionArpu'])]
+    s = SufficientStats.from_frame(pd.DataFrame(rows), segments=SEGMENTS)
+    
+    table = significance_table(s, control_segment='control')
+    
+    assert list(table['segment_name']) == ['treatment_a', 'treatment_b']
+    assert list(table['control_estimate']) == pytest.approx([users['SubscriptionArpu'][1].mean()] * 2)
+
+
+def test_cuped_adjusts_with_pooled_coefficient():
+    rng = np.random.default_rng(11)
+    covariates = [rng.gamma(2.0, 5.0, size) for size in SIZES]
+    # Revenue during the experiment follows each user's prior revenue
+    values = [0.8 * c + rng.normal(0, 3, len(c)) + [1.0, 0.0, 0.5][segment] for segment, c in enumerate(covariates)]
+    rows = [
+        _row(metric, segment, x, sum_c=c.sum(), sum_c2=(c * c).sum(), sum_xc=(x * c).sum())
+        for metric in ['SubscriptionArpu', 'SubscriptionArps']
+        for segment, x, c in zip(SEGMENTS, values, covariates)
+    ]
+    s = SufficientStats.from_frame(pd.DataFrame(rows), segments=SEGMENTS)
+    
+    results = compare_to_control(s, control_segment='control')
+    
+    x_all, c_all = np.concatenate(values), np.concatenate(covariates)
+    theta = np.cov(x_all, c_all)[0, 1] / c_all.var(ddof=1)
+    for segment, (x, c) in enumerate(zip(values, covariates)):
+        adjusted = x - theta * (c - c_all.mean())
+        assert results['estimate'][0, segment, 0] == pytest.approx(adjusted.mean())
+        assert results['variance_reduction'][0, segment, 0] == pytest.approx(1 - adjusted.var(ddof=1) / x.var(ddof=1))
+        assert results['variance_reduction'][0, segment, 0] > 0.5
+    # Ratio metrics are left unadjusted
+    assert results['estimate'][1, 2, 0] == pytest.approx(values[2].sum() / (values[2] > 0).sum())
+    assert results['variance_reduction'][1, 2, 0] == pytest.approx(0)
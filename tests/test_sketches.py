@@ -0,0 +1,76 @@
+"""
+Tests of the HyperLogLog reach sketches.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from unified_hex_harvest.utils.sketches import HLL_PRECISION, HyperLogLog, SketchStore
+
+# Standard error of HyperLogLog with 2 ** 12 registers is 1.04 / 64, about 1.6%
+TOLERANCE = 4 * 1.04 / np.sqrt(2 ** HLL_PRECISION)
+
+
+def _registers(hashes: np.ndarray) -> pd.DataFrame:
+    """Register rows as computed in the warehouse from 64-bit user hashes."""
+    register = hashes & np.uint64(2 ** HLL_PRECISION - 1)
+    w = hashes >> np.uint64(HLL_PRECISION)
+    bits = 64 - HLL_PRECISION
+    rho = np.where(w == 0, bits + 1, bits - np.floor(np.log2(np.maximum(w, 1).astype(float))))
+    return pd.DataFrame({'register': register.astype(np.int64), 'rho': rho.astype(int)})
+
+
+def _users(rng, count: int) -> np.ndarray:
+    """Distinct users as uniformly distributed 64-bit hashes."""
+    return rng.integers(0, 2 ** 64, count, dtype=np.uint64, endpoint=False)
+
+
+def _sketch(hashes: np.ndarray) -> HyperLogLog:
+    rows = _registers(hashes)
+    return HyperLogLog.from_registers(rows['register'], rows['rho'])
+
+
+@pytest.mark.parametrize('count', [100, 5000, 200000])
+def test_estimate_is_within_error_bound(count):
+    hashes = _users(np.random.default_rng(count), count)
+    
+    assert _sketch(hashes).estimate() == pytest.approx(count, rel=TOLERANCE)
+
+
+def test_merge_counts_overlapping_users_once():
+    users = _users(np.random.default_rng(1), 60000)
+    first, second = _sketch(users[:40000]), _sketch(users[20000:])
+    
+    merged = first.merge(second)
+    
+    assert np.array_equal(merged.registers, _sketch(users).registers)
+    assert merged.estimate() == pytest.approx(60000, rel=TOLERANCE)
+    assert HyperLogLog.from_bytes(merged.to_bytes()).estimate() == merged.estimate()
+
+
+def test_store_rolls_up_hours_segments_and_clients(tmp_path):
+    rng = np.random.default_rng(2)
+    users = {segment: _users(rng, 30000) for segment in ['control', 'treatment']}
+    frames = []
+    for segment, hashes in users.items():
+        # Every user is exposed in two of three hours, on one of two clients
+        for hour in range(3):
+            exposed = hashes[np.arange(len(hashes)) % 3 != hour]
+            for client, part in zip(['ios', 'web'], np.array_split(exposed, 2)):
+                frames.append(_registers(part).assign(
+                    hour=pd.Timestamp('2025-01-01') + pd.Timedelta(hours=hour), segment_name=segment, segmentation_client=client
+                ))
+    store = SketchStore(str(tmp_path / 'sketches.sqlite'))
+    store.add_registers('test_experiment', pd.concat(frames, ignore_index=True))
+    
+    cumulative = store.reach('test_experiment', by=['segment_name'])
+    last_hour = store.reach('test_experiment', by=['segment_name'], start='2025-01-01 02:00', cumulative=False)
+    total = store.reach('test_experiment', cumulative=False)
+    
+    control = cumulative[cumulative['segment_name'] == 'control']
+    assert list(control['time']) == list(pd.date_range('2025-01-01', periods=3, freq='h'))
+    assert control['users'].to_list() == pytest.approx([20000, 30000, 30000], rel=TOLERANCE)
+    assert last_hour['users'].to_list() == pytest.approx([20000, 20000], rel=TOLERANCE)
+    assert total['users'][0] == pytest.approx(60000, rel=TOLERANCE)
+    assert store.last_hour('test_experiment') == pd.Timestamp('2025-01-01 02:00').isoformat()
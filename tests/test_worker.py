@@ -0,0 +1,59 @@
+"""
+Tests of queuing experiment configs for workers.
+"""
+
+import time
+
+from unified_hex_harvest.core.config import ExperimentConfig
+from unified_hex_harvest.core.worker import enqueue_analyses
+from unified_hex_harvest.utils.work_queue import SQLiteWorkQueue
+
+
+def test_config_dict_round_trip():
+    config = ExperimentConfig(
+        'test_experiment', '2025-01-01', '2025-03-31',
+        experiment_segments=['control', 'treatment'],
+        shards=4,
+        stage_timeout_seconds=600
+    )
+    
+    assert ExperimentConfig.from_dict(config.to_dict()) == config
+
+
+def test_queued_payload_builds_config(tmp_path):
+    config = ExperimentConfig('test_experiment', '2025-01-01', '2025-01-31', experiment_segments=['control', 'treatment'])
+    queue = SQLiteWorkQueue(str(tmp_path / 'queue.sqlite'))
+    
+    assert enqueue_analyses(queue, [config]) == 1
+    task = queue.lease('worker')
+    
+    assert ExperimentConfig.from_dict(task.payload) == config
+
+
+
+def test_expired_lease_is_taken_over_by_another_worker(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / 'queue.sqlite'))
+    queue.put('task', {'experiment_name': 'test_experiment'})
+    crashed = queue.lease('worker-a', lease_seconds=0.1)
+    
+    assert queue.lease('worker-b') is None
+    time.sleep(0.2)
+    successor = queue.lease('worker-b')
+    
+    assert successor.task_id == 'task' and successor.attempts == 2
+    # The first worker lost its lease and cannot record a result any more
+    assert not queue.extend(crashed)
+    assert not queue.complete(crashed, {'worker': 'a'})
+    assert queue.complete(successor, {'worker': 'b'})
+    assert queue.result('task') == {'worker': 'b'}
+    assert queue.counts()['done'] == 1
+
+
+def test_expired_lease_without_attempts_left_fails_the_task(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / 'queue.sqlite'))
+    queue.put('task', {}, max_attempts=1)
+    queue.lease('worker-a', lease_seconds=0.1)
+    time.sleep(0.2)
+    
+    assert queue.lease('worker-b') is None
+    assert queue.counts() == {'pending': 0, 'leased': 0, 'done': 0, 'failed': 1}
@@ -7,8 +7,28 @@ A centralized library for experiment analysis in Hex notebooks.
 from .core.experiment_analyzer import ExperimentAnalyzer
 from .core.config import ExperimentConfig, create_experiment_config
 from .core.metrics import MetricDefinitions
+from .core.significance import SufficientStats, significance_table
+from .core.sequential import SequentialTest
+from .core.power import PowerPlanner
+from .core.batch import analyze_many, get_batch_sufficient_stats
+from .core.manifest import load_manifest, plan_recompute, run_plan, RecomputePlan
+from .core.planner import StagePlan
+from .core.worker import enqueue_analyses, analyze_config
 from .core.secrets import setup_credentials, HexSecrets, LocalSecrets
 from .utils.data_queries import DataQueries
+from .utils.sketches import SketchStore, HyperLogLog
+from .utils.results_store import ResultsStore
+from .utils.result_cache import ResultCache, CacheBackend, LocalBackend
+from .utils.warehouse import Warehouse
+from .utils.credentials import CredentialsProvider, set_credentials, shared_client
+from .utils.limiter import WarehouseLimiter
+from .utils.run_report import RunReport
+from .utils.cost_ledger import CostLedger
+from .utils.checkpoints import CheckpointStore
+from .utils.retry import RetryPolicy
+from .utils.cancellation import CancellationToken, Cancelled, DeadlineExceeded
+from .utils.tracing import Tracer, SpanExporter, JSONLinesExporter, ChromeTraceExporter, enable_tracing, disable_tracing
+from .utils.work_queue import WorkQueue, SQLiteWorkQueue, run_worker
 
 __version__ = "1.0.0"
-__all__ = ["ExperimentAnalyzer", "ExperimentConfig", "create_experiment_config", "MetricDefinitions", "DataQueries", "setup_credentials", "HexSecrets", "LocalSecrets"]
+__all__ = ["ExperimentAnalyzer", "ExperimentConfig", "create_experiment_config", "MetricDefinitions", "SufficientStats", "significance_table", "SequentialTest", "PowerPlanner", "analyze_many", "get_batch_sufficient_stats", "load_manifest", "plan_recompute", "run_plan", "RecomputePlan", "StagePlan", "enqueue_analyses", "analyze_config", "DataQueries", "SketchStore", "HyperLogLog", "ResultsStore", "ResultCache", "CacheBackend", "LocalBackend", "Warehouse", "CredentialsProvider", "set_credentials", "shared_client", "WarehouseLimiter", "RunReport", "CostLedger", "CheckpointStore", "RetryPolicy", "CancellationToken", "Cancelled", "DeadlineExceeded", "Tracer", "SpanExporter", "JSONLinesExporter", "ChromeTraceExporter", "enable_tracing", "disable_tracing", "WorkQueue", "SQLiteWorkQueue", "run_worker", "setup_credentials", "HexSecrets", "LocalSecrets"]
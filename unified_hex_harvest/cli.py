@@ -0,0 +1,315 @@
+"""
+Command line entry point for scheduled and parallel runs outside Hex.
+
+Usage:
+    unified-hex run experiments.toml --jobs 4 --no-render --json
+    unified-hex estimate-cost experiments.toml
+    unified-hex warm-cache experiments.toml --jobs 4
+    unified-hex export experiments.toml --format csv --output results.csv
+    unified-hex enqueue experiments.toml --queue /shared/queue.sqlite
+    unified-hex worker --queue /shared/queue.sqlite
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from .core.config import ExperimentConfig
+from .core.manifest import RecomputePlan, load_manifest, plan_recompute, run_plan
+from .utils.cost_ledger import USD_PER_TIB
+from .utils.results_store import ResultsStore
+from .utils.warehouse import Warehouse
+
+
+def _setup_environment(helpers: bool = False):
+    """Make the query builder, bsp helpers and credentials available without a notebook."""
+    # DataQueries and ExperimentAnalyzer look up these names in the callers' globals, as in Hex
+    try:
+        from bsp_query_builder.dialects.big_query.common import Query
+    except ImportError:
+        raise SystemExit("bsp_query_builder is required to build queries: install it from Artifactory")
+    globals()['Query'] = Query
+    
+    if helpers:
+        try:
+            import bsp_data_analysis.helpers as bsp_helpers
+        except ImportError:
+            raise SystemExit("bsp_data_analysis is required to run full analyses: install it from Artifactory")
+        globals().update({name: getattr(bsp_helpers, name) for name in dir(bsp_helpers) if not name.startswith('_')})
+    
+    if os.environ.get('HARVEST_CREDENTIALS'):
+        from .core.secrets import setup_credentials
+        setup_credentials(use_hex_secrets=True, application_default=True)
+
+
+def _plan(configs: List[ExperimentConfig], store: ResultsStore, force: bool) -> RecomputePlan:
+    """Plan the recompute, or everything when forced."""
+    plan = plan_recompute(configs, store)
+    if force:
+        for name, fingerprints in plan.metric_fingerprints.items():
+            if fingerprints:
+                plan.metrics[name] = list(fingerprints)
+                plan.reasons.setdefault(name, 'forced')
+        plan.up_to_date = [name for name in plan.up_to_date if name not in plan.metrics]
+    return plan
+
+
+def _run_chunk(plan: RecomputePlan, configs: List[ExperimentConfig], store: ResultsStore) -> Dict[str, pd.DataFrame]:
+    """Run one chunk of the plan (keeps this module's globals on the worker's stack)."""
+    # Scheduled refreshes yield warehouse slots to interactive notebook work
+    return run_plan(plan, configs, store, Warehouse.from_config(configs[0], execution_mode='batch'))
+
+
+def _execute(configs: List[ExperimentConfig], store: ResultsStore, jobs: int, force: bool) -> RecomputePlan:
+    """Recompute the stale experiments, ``jobs`` batches at a time."""
+    plan = _plan(configs, store, force)
+    plan.summary()
+    planned = [config for config in configs if config.experiment_name in plan.metrics]
+    if not planned:
+        return plan
+    
+    chunks = [planned[i::jobs] for i in range(min(jobs, len(planned)))]
+    with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+        list(executor.map(lambda chunk: _run_chunk(plan, chunk, store), chunks))
+    return plan
+
+
+def _significance(configs: List[ExperimentConfig], store: ResultsStore) -> Dict[str, pd.DataFrame]:
+    """Significance tables from the stored statistics."""
+    from .core.experiment_analyzer import ExperimentAnalyzer
+    
+    tables = {}
+    for config in configs:
+        stats_df = store.load(config.experiment_name, config.metrics_list)
+        if not stats_df.empty:
+            tables[config.experiment_name] = ExperimentAnalyzer(config).get_significance(stats_df=stats_df)
+    return tables
+
+
+def _render(configs: List[ExperimentConfig], tables: Dict[str, pd.DataFrame], output_dir: str) -> List[str]:
+    """Save the significance charts as PNG files."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from .core.experiment_analyzer import ExperimentAnalyzer
+    
+    paths = []
+    for config in configs:
+        table = tables.get(config.experiment_name)
+        if table is None:
+            continue
+        analyzer = ExperimentAnalyzer(config)
+        directory = os.path.join(output_dir, config.experiment_name)
+        os.makedirs(directory, exist_ok=True)
+        for metric_name in table['metric'].unique():
+            analyzer.plot_significance(table, metric_name)
+            path = os.path.join(directory, f'{metric_name}.png')
+            plt.gcf().savefig(path)
+            plt.close('all')
+            paths.append(path)
+    return paths
+
+
+def _last_bin(table: pd.DataFrame) -> pd.DataFrame:
+    """Rows of the last time bin of each metric."""
+    return table[table['time_bin'] == table.groupby('metric')['time_bin'].transform('max')]
+
+
+def _records(df: pd.DataFrame) -> List[Dict]:
+    """JSON-safe records."""
+    return json.loads(df.to_json(orient='records'))
+
+
+def cmd_run(args) -> Dict:
+    """Recompute stale experiments, then report and optionally render the results."""
+    configs = load_manifest(args.path)
+    _setup_environment()
+    store = ResultsStore(args.store)
+    plan = _execute(configs, store, args.jobs, args.force)
+    
+    tables = _significance(configs, store)
+    charts = [] if args.no_render else _render(configs, tables, args.output_dir)
+    
+    if not args.json:
+        for name, table in tables.items():
+            print(f"\n{name}")
+            print(_last_bin(table)[['metric', 'segment_name', 'relative_uplift', 'p_value', 'significant']].to_string(index=False))
+    return {
+        'recomputed': plan.to_dict()['recompute'],
+        'up_to_date': plan.up_to_date,
+        'charts': charts,
+        'results': {name: _records(_last_bin(table)) for name, table in tables.items()},
+    }
+
+
+def cmd_warm_cache(args) -> Dict:
+    """Recompute stale experiments without reporting or rendering."""
+    configs = load_manifest(args.path)
+    _setup_environment()
+    plan = _execute(configs, ResultsStore(args.store), args.jobs, args.force)
+    return {'recomputed': plan.to_dict()['recompute'], 'up_to_date': plan.up_to_date}
+
+
+def cmd_estimate_cost(args) -> Dict:
+    """Dry-run the queries of the stale experiments to estimate the bytes scanned."""
+    from google.cloud import bigquery
+    from .core.batch import get_batch_queries
+    from .utils.credentials import shared_client
+    
+    configs = load_manifest(args.path)
+    _setup_environment()
+    plan = _plan(configs, ResultsStore(args.store), args.force)
+    planned = [config for config in configs if config.experiment_name in plan.metrics]
+    metric_names = list(dict.fromkeys(name for config in planned for name in plan.metrics[config.experiment_name]))
+    
+    client = shared_client()
+    job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+    batches = []
+    for group, query in (get_batch_queries(planned, metric_names) if planned else []):
+        job = client.query(query, job_config=job_config)
+        batches.append({
+            'experiments': [config.experiment_name for config in group],
+            'bytes_processed': job.total_bytes_processed,
+            'estimated_usd': job.total_bytes_processed / 2 ** 40 * USD_PER_TIB,
+        })
+    
+    total_bytes = sum(batch['bytes_processed'] for batch in batches)
+    if not args.json:
+        for batch in batches:
+            print(f"{', '.join(batch['experiments'])}: {batch['bytes_processed'] / 2 ** 30:,.1f} GiB (${batch['estimated_usd']:,.2f})")
+        print(f"Total: {total_bytes / 2 ** 30:,.1f} GiB (${total_bytes / 2 ** 40 * USD_PER_TIB:,.2f}), "
+              f"{len(plan.up_to_date)} experiments up to date")
+    return {
+        'batches': batches,
+        'total_bytes_processed': total_bytes,
+        'estimated_usd': total_bytes / 2 ** 40 * USD_PER_TIB,
+        'up_to_date': plan.up_to_date,
+    }
+
+
+def cmd_export(args) -> Dict:
+    """Export the stored results of a manifest."""
+    configs = load_manifest(args.path)
+    tables = _significance(configs, ResultsStore(args.store))
+    df = pd.concat(
+        [table.assign(experiment_name=name) for name, table in tables.items()], ignore_index=True
+    ) if tables else pd.DataFrame()
+    
+    if args.format == 'csv':
+        df.to_csv(args.output or sys.stdout, index=False)
+    else:
+        df.to_json(args.output or sys.stdout, orient='records', indent=2)
+        if not args.output:
+            print()
+    return {'rows': len(df), 'output': args.output}
+
+
+def cmd_enqueue(args) -> Dict:
+    """Enqueue a full analysis per experiment of a manifest."""
+    from .core.worker import enqueue_analyses
+    from .utils.work_queue import SQLiteWorkQueue
+    
+    queue = SQLiteWorkQueue(args.queue)
+    added = enqueue_analyses(queue, load_manifest(args.path, batch=False), max_attempts=args.max_attempts)
+    counts = queue.counts()
+    if not args.json:
+        print(f"📥 {added} tasks added, queue: {counts}")
+    return {'added': added, 'queue': counts}
+
+
+def cmd_worker(args) -> Dict:
+    """Consume full analyses from a queue."""
+    from functools import partial
+    from .core.worker import analyze_config
+    from .utils.work_queue import SQLiteWorkQueue, run_worker
+    
+    _setup_environment(helpers=True)
+    queue = SQLiteWorkQueue(args.queue)
+    completed = run_worker(
+        queue,
+        partial(analyze_config, output_dir=args.output_dir),
+        lease_seconds=args.lease_seconds,
+        max_tasks=args.max_tasks,
+        stop_when_empty=not args.wait
+    )
+    return {'completed': completed, 'queue': queue.counts()}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser."""
+    parser = argparse.ArgumentParser(prog='unified-hex', description='Run Harvest experiment analyses headlessly.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    def add_common(subparser, jobs: bool = False):
+        subparser.add_argument('path', help='Manifest (.toml, .yaml, .json) or single config (.json)')
+        subparser.add_argument('--store', default='.results', help='Results store directory')
+        subparser.add_argument('--json', action='store_true', help='Print a machine-readable JSON summary')
+        subparser.add_argument('--force', action='store_true', help='Recompute even if results are up to date')
+        if jobs:
+            subparser.add_argument('--jobs', type=int, default=1, help='Number of experiment batches run in parallel')
+    
+    run = subparsers.add_parser('run', help='Run a config or manifest')
+    add_common(run, jobs=True)
+    run.add_argument('--no-render', action='store_true', help='Skip chart rendering')
+    run.add_argument('--output-dir', default='charts', help='Directory for rendered charts')
+    run.set_defaults(handler=cmd_run)
+    
+    estimate = subparsers.add_parser('estimate-cost', help='Estimate the warehouse cost of a run')
+    add_common(estimate)
+    estimate.set_defaults(handler=cmd_estimate_cost)
+    
+    warm = subparsers.add_parser('warm-cache', help='Recompute stale results without reporting')
+    add_common(warm, jobs=True)
+    warm.set_defaults(handler=cmd_warm_cache)
+    
+    export = subparsers.add_parser('export', help='Export stored results')
+    export.add_argument('path', help='Manifest (.toml, .yaml, .json) or single config (.json)')
+    export.add_argument('--store', default='.results', help='Results store directory')
+    export.add_argument('--format', choices=['csv', 'json'], default='csv', help='Output format')
+    export.add_argument('--output', help='Output file (defaults to stdout)')
+    export.set_defaults(handler=cmd_export, json=False)
+    
+    enqueue = subparsers.add_parser('enqueue', help='Queue full analyses of a manifest for workers')
+    enqueue.add_argument('path', help='Manifest (.toml, .yaml, .json) or single config (.json)')
+    enqueue.add_argument('--queue', default='.work_queue.sqlite', help='Work queue database')
+    enqueue.add_argument('--max-attempts', type=int, default=3, help='Attempts per task before it fails')
+    enqueue.add_argument('--json', action='store_true', help='Print a machine-readable JSON summary')
+    enqueue.set_defaults(handler=cmd_enqueue)
+    
+    worker = subparsers.add_parser('worker', help='Run queued full analyses')
+    worker.add_argument('--queue', default='.work_queue.sqlite', help='Work queue database')
+    worker.add_argument('--output-dir', default='charts', help='Directory for rendered charts')
+    worker.add_argument('--lease-seconds', type=float, default=1800, help='Lease duration, renewed while running')
+    worker.add_argument('--max-tasks', type=int, help='Stop after this many tasks')
+    worker.add_argument('--wait', action='store_true', help='Keep polling when the queue is empty')
+    worker.add_argument('--json', action='store_true', help='Print a machine-readable JSON summary')
+    worker.set_defaults(handler=cmd_worker)
+    
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the command line interface."""
+    args = build_parser().parse_args(argv)
+    if getattr(args, 'jobs', 1) < 1:
+        raise SystemExit('--jobs must be at least 1')
+    try:
+        # Keep stdout for the JSON summary only
+        with contextlib.redirect_stdout(sys.stderr if args.json else sys.stdout):
+            summary = args.handler(args)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(summary, indent=2, default=str))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
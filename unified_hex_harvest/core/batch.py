@@ -0,0 +1,183 @@
+"""
+Batch analysis of several experiments sharing warehouse scans.
+
+All experiments of a batch are read from one exposure scan into a single user
+base tagged by experiment and segment. Each metric is then computed once for the
+whole batch, so the bookings, sessions and exposure tables are scanned once per
+metric instead of once per metric and experiment. Results are split back per
+experiment.
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .config import ExperimentConfig
+from .experiment_analyzer import ExperimentAnalyzer
+from .metrics import MetricDefinitions
+from .significance import METRIC_TESTS
+from ..utils.data_queries import DataQueries
+from ..utils.warehouse import Warehouse
+
+
+def get_batch_queries(
+    configs: List[ExperimentConfig],
+    metric_names: Optional[List[str]] = None
+) -> List[Tuple[List[ExperimentConfig], str]]:
+    """
+    Get the statistics queries of a batch, one per granularity.
+    
+    Args:
+        configs: Experiment configurations
+        metric_names: Metrics to include (defaults to the union of the configured metrics)
+    
+    Returns:
+        List of (experiments covered, SQL string) pairs
+    """
+    names = [config.experiment_name for config in configs]
+    duplicated = sorted({name for name in names if names.count(name) > 1})
+    if duplicated:
+        raise ValueError(f"Experiments can only appear once in a batch: {duplicated}")
+    
+    if metric_names is None:
+        metric_names = list(dict.fromkeys(name for config in configs for name in config.metrics_list))
+    metric_names = [name for name in metric_names if name in METRIC_TESTS]
+    
+    sample_rates = {config.sample_rate for config in configs}
+    if len(sample_rates) > 1:
+        raise ValueError(f"All experiments of a batch must use the same sample_rate, got: {sorted(sample_rates)}")
+    # The batch query has no pre-period covariates and is not sharded
+    unsupported = [config.experiment_name for config in configs if config.cuped or config.shards > 1]
+    if unsupported:
+        raise ValueError(f"Batches do not support cuped or shards, analyze these experiments on their own: {unsupported}")
+    
+    groups = defaultdict(list)
+    for config in configs:
+        groups[config.granularity_in_days].append(config)
+    
+    data_queries = DataQueries()
+    queries = []
+    for granularity_in_days, group in groups.items():
+        start_date = min(config.start_date for config in group)
+        actions_end_date = max(config.actions_end_date for config in group)
+        # Bins are counted from each experiment's start, so the longest experiment sets the count
+        longest = max(group, key=lambda config: config.horizon_in_days)
+        last_date = (
+            pd.Timestamp(start_date) + pd.Timedelta(days=longest.horizon_in_days)
+        ).strftime('%Y-%m-%d')
+        
+        user_base = data_queries.get_batch_user_base(
+            [
+                {
+                    'experiment_name': config.experiment_name,
+                    'segments': config.experiment_segments,
+                    'start_date': config.start_date,
+                    'end_date': config.end_date,
+                }
+                for config in group
+            ],
+            sample_rate=group[0].sample_rate
+        )
+        metrics = MetricDefinitions(start_date, actions_end_date)
+        stats_queries = [
+            data_queries.get_sufficient_stats(
+                metric_name=metric_name,
+                user_base=user_base,
+                target_query=metrics.get_target_query(metric_name),
+                start_date=start_date,
+                end_date=last_date,
+                granularity_in_days=granularity_in_days,
+                value=METRIC_TESTS[metric_name].value,
+                bin_origin_column='experiment_start'
+            )
+            for metric_name in metric_names
+        ]
+        queries.append((group, data_queries.union_all(stats_queries)))
+    
+    return queries
+
+
+def get_batch_sufficient_stats(
+    configs: List[ExperimentConfig],
+    metric_names: Optional[List[str]] = None,
+    warehouse: Optional[Warehouse] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Get the sufficient statistics of several experiments with one query per granularity.
+    
+    Time bins are relative to each experiment's own start date. Experiments with
+    different granularities are queried in separate batches.
+    
+    Args:
+        configs: Experiment configurations
+        metric_names: Metrics to include (defaults to the union of the configured metrics)
+        warehouse: Warehouse client (defaults to the one configured for the first experiment)
+    
+    Returns:
+        Dict mapping experiment name to its statistics, as from ``ExperimentAnalyzer.get_sufficient_stats``
+    """
+    from datetime import datetime
+    
+    warehouse = warehouse or Warehouse.from_config(configs[0])
+    results = {}
+    for group, query in get_batch_queries(configs, metric_names):
+        print(f"📦 Querying {len(group)} experiments in one batch...")
+        df = warehouse.read_gbq(query, {
+            'experiment': ','.join(config.experiment_name for config in group),
+            'metric': ','.join(metric_names) if metric_names else None,
+            'stage': 'batch',
+        })
+        
+        tags = df['segment_name'].str.split('|', n=1, expand=True)
+        df = df.assign(experiment_name=tags[0], segment_name=tags[1])
+        for config in group:
+            n_bins = (
+                datetime.strptime(config.actions_end_date, '%Y-%m-%d') - datetime.strptime(config.start_date, '%Y-%m-%d')
+            ).days // config.granularity_in_days + 1
+            stats_df = df[(df['experiment_name'] == config.experiment_name) & (df['time_bin'] < n_bins)]
+            results[config.experiment_name] = stats_df.drop(columns='experiment_name').reset_index(drop=True)
+    
+    return results
+
+
+def analyze_many(
+    configs: List[ExperimentConfig],
+    metric_names: Optional[List[str]] = None,
+    plot: bool = True,
+    execution_mode: str = 'interactive'
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Analyze several experiments, sharing the metric scans across the batch.
+    
+    Args:
+        configs: Experiment configurations
+        metric_names: Metrics to analyze (defaults to the union of the configured metrics)
+        plot: Whether to plot the significance of each metric
+        execution_mode: 'interactive' or 'batch' (see ``ExperimentAnalyzer``)
+    
+    Returns:
+        Dict mapping experiment name to a dict with the ``analyzer``, its sufficient
+        ``stats`` and the ``significance`` table
+    """
+    warehouse = Warehouse.from_config(configs[0], execution_mode)
+    stats_by_experiment = get_batch_sufficient_stats(configs, metric_names, warehouse)
+    
+    results = {}
+    for config in configs:
+        analyzer = ExperimentAnalyzer(config, execution_mode)
+        stats_df = stats_by_experiment[config.experiment_name]
+        stats_df = stats_df[stats_df['metric'].isin(metric_names or config.metrics_list)].reset_index(drop=True)
+        significance_df = analyzer.get_significance(stats_df=stats_df)
+        
+        if plot:
+            print(f"Experiment: {config.experiment_name}")
+            for metric_name in significance_df['metric'].unique():
+                analyzer.plot_significance(significance_df, metric_name)
+        
+        results[config.experiment_name] = {
+            'analyzer': analyzer,
+            'stats': stats_df,
+            'significance': significance_df,
+        }
+    return results
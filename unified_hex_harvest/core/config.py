@@ -2,7 +2,7 @@
 Configuration system for experiment analysis.
 """
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from typing import List, Optional, Dict, Any
 from datetime import datetime, date
 
@@ -25,6 +25,66 @@ class ExperimentConfig:
     include_conversions_at_target_paywall_profiles: bool = True
     include_engagement_model: bool = False
     include_projections: bool = True
+    include_significance: bool = False
+    
+    # Deterministic user sampling for quick looks (1.0 = all users)
+    sample_rate: float = 1.0
+    
+    # Split the user base into hash shards queried in parallel (1 = no sharding)
+    shards: int = 1
+    max_concurrent_jobs: int = 4
+    
+    # Significance testing
+    control_segment: Optional[str] = None
+    significance_level: float = 0.05
+    
+    # Sequential testing (always-valid results for daily peeking)
+    sequential_testing: bool = False
+    sequential_tau: float = 0.1
+    sequential_state_dir: str = '.sequential_state'
+    
+    # CUPED variance reduction with a pre-exposure covariate
+    cuped: bool = False
+    cuped_covariate: str = 'bookings'
+    cuped_lookback_days: int = 28
+    
+    # Reach from locally merged HyperLogLog sketches
+    reach_sketches: bool = False
+    reach_sketch_path: str = '.reach_sketches.sqlite'
+    
+    # Shared cache of query results (point result_cache_dir at a shared mount for the team)
+    result_cache: bool = False
+    result_cache_dir: str = '.result_cache'
+    result_cache_max_age_hours: Optional[float] = 12
+    
+    # Limit of concurrent warehouse jobs shared by every process using the same slots file (None = no limit)
+    warehouse_slots: Optional[int] = None
+    warehouse_slots_path: str = '.warehouse_slots.sqlite'
+    interactive_reserved_slots: int = 1
+    
+    # Local ledger of the cost of every warehouse job
+    cost_ledger: bool = False
+    cost_ledger_path: str = '.cost_ledger.sqlite'
+    
+    # Memory profiling of each stage, and warning size of a single query result (None = no warning)
+    profile_memory: bool = False
+    memory_warning_mb: Optional[float] = 1024
+    
+    # Stage checkpoints of run_full_analysis, so an interrupted run resumes where it stopped
+    checkpoints: bool = False
+    checkpoint_dir: str = '.checkpoints'
+    
+    # Retries of transient warehouse errors (exponential backoff with jitter)
+    query_retries: int = 4
+    retry_initial_delay_seconds: float = 1.0
+    retry_max_delay_seconds: float = 60.0
+    
+    # Timeouts of each stage and of run_full_analysis (None = no timeout); in-flight jobs are cancelled
+    stage_timeout_seconds: Optional[float] = None
+    run_timeout_seconds: Optional[float] = None
+    
+    # Independent stages of run_full_analysis running at the same time (1 = one after the other)
+    max_concurrent_stages: int = 4
     
     # Metrics to analyze
     metrics_list: List[str] = field(default_factory=lambda: [
@@ -66,6 +126,28 @@ class ExperimentConfig:
             
         if not self.experiment_segments:
             self.experiment_segments = ['control_segment', 'treatment_segment']
+            
+        if self.control_segment is None:
+            self.control_segment = self.experiment_segments[0]
+            
+        if not 0 < self.sample_rate <= 1:
+            raise ValueError(f"sample_rate must be in (0, 1], got: {self.sample_rate}")
+            
+        if self.shards < 1 or self.max_concurrent_jobs < 1:
+            raise ValueError(f"shards and max_concurrent_jobs must be at least 1, got: {self.shards}, {self.max_concurrent_jobs}")
+            
+        if self.max_concurrent_stages < 1:
+            raise ValueError(f"max_concurrent_stages must be at least 1, got: {self.max_concurrent_stages}")
+            
+        if self.warehouse_slots is not None and not 0 <= self.interactive_reserved_slots < self.warehouse_slots:
+            raise ValueError(f"interactive_reserved_slots must be in [0, warehouse_slots), got: {self.interactive_reserved_slots}")
+            
+        if self.query_retries < 0:
+            raise ValueError(f"query_retries must be at least 0, got: {self.query_retries}")
+            
+        for timeout in (self.stage_timeout_seconds, self.run_timeout_seconds):
+            if timeout is not None and timeout <= 0:
+                raise ValueError(f"stage_timeout_seconds and run_timeout_seconds must be positive, got: {timeout}")
     
     @property
     def horizon_in_days(self) -> int:
@@ -79,6 +161,11 @@ class ExperimentConfig:
         """Determine granularity based on horizon."""
         return 1 if self.horizon_in_days < 40 else 7
     
+    @property
+    def is_sampled(self) -> bool:
+        """Whether the analysis runs on a sample of users."""
+        return self.sample_rate < 1
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert config to dictionary."""
         return {
@@ -93,6 +180,38 @@ class ExperimentConfig:
             'include_conversions_at_target_paywall_profiles': self.include_conversions_at_target_paywall_profiles,
             'include_engagement_model': self.include_engagement_model,
             'include_projections': self.include_projections,
+            'include_significance': self.include_significance,
+            'sample_rate': self.sample_rate,
+            'shards': self.shards,
+            'max_concurrent_jobs': self.max_concurrent_jobs,
+            'control_segment': self.control_segment,
+            'significance_level': self.significance_level,
+            'sequential_testing': self.sequential_testing,
+            'sequential_tau': self.sequential_tau,
+            'sequential_state_dir': self.sequential_state_dir,
+            'cuped': self.cuped,
+            'cuped_covariate': self.cuped_covariate,
+            'cuped_lookback_days': self.cuped_lookback_days,
+            'reach_sketches': self.reach_sketches,
+            'reach_sketch_path': self.reach_sketch_path,
+            'result_cache': self.result_cache,
+            'result_cache_dir': self.result_cache_dir,
+            'result_cache_max_age_hours': self.result_cache_max_age_hours,
+            'warehouse_slots': self.warehouse_slots,
+            'warehouse_slots_path': self.warehouse_slots_path,
+            'interactive_reserved_slots': self.interactive_reserved_slots,
+            'cost_ledger': self.cost_ledger,
+            'cost_ledger_path': self.cost_ledger_path,
+            'profile_memory': self.profile_memory,
+            'memory_warning_mb': self.memory_warning_mb,
+            'checkpoints': self.checkpoints,
+            'checkpoint_dir': self.checkpoint_dir,
+            'query_retries': self.query_retries,
+            'retry_initial_delay_seconds': self.retry_initial_delay_seconds,
+            'retry_max_delay_seconds': self.retry_max_delay_seconds,
+            'stage_timeout_seconds': self.stage_timeout_seconds,
+            'run_timeout_seconds': self.run_timeout_seconds,
+            'max_concurrent_stages': self.max_concurrent_stages,
             'metrics_list': self.metrics_list,
             'breakdowns': self.breakdowns,
             'metrics_for_breakdowns': self.metrics_for_breakdowns,
@@ -103,6 +222,23 @@ class ExperimentConfig:
             'horizon_in_days': self.horizon_in_days,
             'granularity_in_days': self.granularity_in_days
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ExperimentConfig':
+        """
+        Create a config from ``to_dict()`` output.
+        
+        Derived values (``horizon_in_days``, ``granularity_in_days``) are recomputed,
+        not passed back.
+        
+        Args:
+            data: Dictionary of config values
+        
+        Returns:
+            ExperimentConfig object
+        """
+        names = {config_field.name for config_field in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
 
 
 def create_experiment_config(
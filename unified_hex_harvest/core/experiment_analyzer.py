@@ -2,31 +2,56 @@
 Main experiment analyzer class.
 """
 
+import functools
+
+import numpy as np
 import pandas as pd
 import plotly.express as px
-from typing import List, Optional, Dict, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
 # Note: These classes come from bsp_data_analysis.helpers which should be imported in Hex notebook
 # App, StartDate, EndDate, ActionsEndDate, GranularityInDays, UserBaseBigQuery, OnTableExistence, Label
 # request_multiple_metrics, plot_profiles
 
 from .config import ExperimentConfig
 from .metrics import MetricDefinitions
+from .significance import METRIC_TESTS, SufficientStats, significance_table
+from .sequential import SequentialTest
+from .planner import StagePlan
+from ..utils.bsp_helpers import find_helper, resolve_helpers, using_helpers
+from ..utils.cancellation import CancellationToken
+from ..utils.checkpoints import CheckpointStore
 from ..utils.data_queries import DataQueries
+from ..utils.sketches import SketchStore
+from ..utils.run_report import RunReport
+from ..utils.tracing import span
+from ..utils.warehouse import Warehouse
 
 
 class ExperimentAnalyzer:
     """Main class for analyzing experiments."""
     
-    def __init__(self, config: ExperimentConfig):
+    def __init__(
+        self,
+        config: ExperimentConfig,
+        execution_mode: str = 'interactive',
+        cancellation: Optional[CancellationToken] = None
+    ):
         """
         Initialize the experiment analyzer.
         
         Args:
             config: Experiment configuration
+            execution_mode: 'interactive' to submit jobs for low latency (notebook work), or
+                'batch' to let them wait for idle warehouse capacity (scheduled refreshes)
+            cancellation: Optional token to cancel the analyzer's calls from another thread
         """
         self.config = config
         self.data_queries = DataQueries()
         self.metrics = MetricDefinitions(config.start_date, config.end_date)
+        self.warehouse = Warehouse.from_config(config, execution_mode, cancellation)
+        
+        # Per-stage latency and warehouse usage (reset by each full analysis)
+        self.report = self.warehouse.report = RunReport(config.experiment_name, config.profile_memory)
         
         # Build common parameters (will be created when needed)
         self.common_params = None
@@ -34,24 +59,48 @@ class ExperimentAnalyzer:
         # Build segments parameters (will be created when needed)
         self.segments_params_all = None
         self.segments_params_noft = None
+        
+        # Sequential test state (loaded when needed)
+        self.sequential_test = None
+        
+        # Sufficient statistics of the sample bands, by exclude_converted (reset by each full analysis)
+        self._sample_stats: Dict[bool, Tuple[List[str], pd.DataFrame]] = {}
+        
+        # Stage checkpoints of the running full analysis
+        self._checkpoints: Optional[CheckpointStore] = None
+        
+        # bsp helpers of the caller, resolved on the calling thread for the stages of a full analysis
+        self.helpers: Dict[str, Any] = {}
+    
+    @property
+    def execution_mode(self) -> str:
+        """Mode of the jobs issued by the analyzer ('interactive' or 'batch')."""
+        return self.warehouse.execution_mode
+    
+    @property
+    def cancellation(self) -> CancellationToken:
+        """Token honoured by every warehouse call of the analyzer."""
+        return self.warehouse.cancellation
+    
+    def cancel(self, reason: str = 'cancelled'):
+        """
+        Cancel the analyzer's calls in progress and their warehouse jobs (e.g. from another thread).
+        
+        The token stays cancelled until ``self.cancellation.reset()``.
+        
+        Args:
+            reason: Message of the ``Cancelled`` error raised by the calls
+        """
+        self.cancellation.cancel(reason)
     
     def _build_common_params(self):
         """Build common parameters when needed."""
         if self.common_params is None:
             # Dynamically get App, StartDate, etc. from global namespace
-            import sys
-            frame = sys._getframe(2) # Go up 2 levels to get to the caller
-            while frame:
-                if 'App' in frame.f_globals:
-                    App = frame.f_globals['App']
-                    StartDate = frame.f_globals['StartDate']
-                    EndDate = frame.f_globals['EndDate']
-                    ActionsEndDate = frame.f_globals['ActionsEndDate']
-                    GranularityInDays = frame.f_globals['GranularityInDays']
-                    break
-                frame = frame.f_back
-            else:
+            helpers = [find_helper(name) for name in ('App', 'StartDate', 'EndDate', 'ActionsEndDate', 'GranularityInDays')]
+            if any(helper is None for helper in helpers):
                 raise NameError("Required bsp_data_analysis.helpers classes (App, StartDate, EndDate, ActionsEndDate, GranularityInDays) not found in global namespace. Make sure to import them in your Hex notebook with: from bsp_data_analysis.helpers import *")
+            App, StartDate, EndDate, ActionsEndDate, GranularityInDays = helpers
             
             self.common_params = [
                 App("HarvestWeb"),
@@ -66,22 +115,16 @@ class ExperimentAnalyzer:
         """Build segments parameters when needed."""
         if self.segments_params_all is None or self.segments_params_noft is None:
             # Dynamically get UserBaseBigQuery, OnTableExistence, Label from global namespace
-            import sys
-            frame = sys._getframe(2) # Go up 2 levels to get to the caller
-            while frame:
-                if 'UserBaseBigQuery' in frame.f_globals:
-                    UserBaseBigQuery = frame.f_globals['UserBaseBigQuery']
-                    OnTableExistence = frame.f_globals['OnTableExistence']
-                    Label = frame.f_globals['Label']
-                    break
-                frame = frame.f_back
-            else:
+            helpers = [find_helper(name) for name in ('UserBaseBigQuery', 'OnTableExistence', 'Label')]
+            if any(helper is None for helper in helpers):
                 raise NameError("Required bsp_data_analysis.helpers classes (UserBaseBigQuery, OnTableExistence, Label) not found in global namespace. Make sure to import them in your Hex notebook with: from bsp_data_analysis.helpers import *")
+            UserBaseBigQuery, OnTableExistence, Label = helpers
             
             custom_user_base_common_params = {
                 "experiment_name": self.config.experiment_name,
                 "start_date": self.config.start_date,
-                "end_date": self.config.end_date
+                "end_date": self.config.end_date,
+                "sample_rate": self.config.sample_rate
             }
             
             # Segments with all users
@@ -134,34 +177,118 @@ class ExperimentAnalyzer:
             exclude_converted: Whether to exclude converted users
         """
         metric = self.metrics.get_metric_by_name(metric_name)
+        title = self._metric_title(metric) if title is None else title
+        
+        # Request metrics
+        stage = self._metric_stage(metric_name, exclude_converted)
+        with span(metric_name, 'metric', exclude_converted=exclude_converted):
+            results, stats_df = self._checkpointed(
+                stage, lambda cancellation: self._request_metric_results(
+                    metric_name, exclude_converted, cancellation=cancellation
+                )
+            )
+            
+            with self.report.stage(f'render:{stage}', 'render'):
+                self._plot_metric_profiles(metric_name, results, stats_df, title, exclude_converted)
         
-        # Build segments params if needed
-        self._build_segments_params()
+        # Handle uplift calculation
+        if uplift_vs:
+            self._plot_uplift(results, uplift_vs, metric.name)
+    
+    def _metric_title(self, metric) -> str:
+        """Default chart title of a metric."""
+        title = f"<b>{metric.name}</b><br>StartDate={self.config.start_date} EndDate={self.config.end_date} ActionsEndDate={self.config.actions_end_date}"
+        if self.config.is_sampled:
+            title += f" Sample={self.config.sample_rate:.0%}"
+        return title
+    
+    @staticmethod
+    def _metric_stage(metric_name: str, exclude_converted: bool = False) -> str:
+        """Stage name of a metric in the run report."""
+        return f"metric:{metric_name}" + (':non_converted' if exclude_converted else '')
+    
+    def _request_metric_results(self, metric_name: str, exclude_converted: bool = False,
+                                stats_df: Optional[pd.DataFrame] = None,
+                                cancellation: Optional[CancellationToken] = None):
+        """
+        Request the per-segment profiles of a metric.
         
-        # Use appropriate segments params
-        segments_params = self.segments_params_noft if exclude_converted else self.segments_params_all
+        Args:
+            metric_name: Name of the metric
+            exclude_converted: Whether to exclude converted users
+            stats_df: Sufficient statistics already fetched for several metrics (e.g. for
+                significance), used instead of querying the metric's own
+            cancellation: Token of the warehouse calls (defaults to the analyzer's)
         
-        # Build default title
-        default_title = f"<b>{metric.name}</b><br>StartDate={self.config.start_date} EndDate={self.config.end_date} ActionsEndDate={self.config.actions_end_date}"
-        title = default_title if title is None else title
+        Returns:
+            Tuple of (results as returned by request_multiple_metrics, sufficient statistics or None)
+        """
+        metric = self.metrics.get_metric_by_name(metric_name)
+        cancellation = cancellation or self.cancellation
         
-        # Dynamically get request_multiple_metrics from global namespace
-        import sys
-        frame = sys._getframe(1) # Go up 1 level to get to the caller
-        while frame:
-            if 'request_multiple_metrics' in frame.f_globals:
-                request_multiple_metrics = frame.f_globals['request_multiple_metrics']
-                break
-            frame = frame.f_back
+        if stats_df is not None:
+            stats_df = stats_df[stats_df['metric'] == metric_name]
+        if self.config.shards > 1 and metric_name in METRIC_TESTS:
+            # Sharded jobs, merged exactly through sufficient statistics
+            if stats_df is None:
+                stats_df = self.get_sufficient_stats([metric_name], exclude_converted=exclude_converted,
+                                                     cancellation=cancellation)
+            results = self._profiles_from_stats(stats_df)
         else:
-            raise NameError("Required bsp_data_analysis.helpers function (request_multiple_metrics) not found in global namespace. Make sure to import it in your Hex notebook with: from bsp_data_analysis.helpers import *")
+            # Dynamically get request_multiple_metrics from global namespace
+            request_multiple_metrics = find_helper('request_multiple_metrics')
+            if request_multiple_metrics is None:
+                raise NameError("Required bsp_data_analysis.helpers function (request_multiple_metrics) not found in global namespace. Make sure to import it in your Hex notebook with: from bsp_data_analysis.helpers import *")
+            
+            # Build segments params if needed
+            self._build_segments_params()
+            
+            # Use appropriate segments params
+            segments_params = self.segments_params_noft if exclude_converted else self.segments_params_all
+            
+            def request(attempt: int):
+                cancellation.check()
+                with self.warehouse.slot(cancellation), span('request_multiple_metrics', 'query', metric=metric_name, attempt=attempt):
+                    return request_multiple_metrics(
+                        common_params=self._build_common_params() + metric.metric,
+                        segments_params=segments_params,
+                    )
+            
+            results = self.warehouse.retry_policy.call(
+                request, f'request_multiple_metrics for {metric_name}', cancellation
+            )
+        return results, stats_df
+    
+    def _checkpointed(self, stage: str, compute: Callable[[CancellationToken], Any]) -> Any:
+        """
+        Run a stage, or load its result from the checkpoint of the running full analysis.
         
-        # Request metrics
-        results = request_multiple_metrics(
-            common_params=self._build_common_params() + metric.metric,
-            segments_params=segments_params,
-        )
+        The stage gets its own child of the analyzer's token, whose warehouse calls are
+        cancelled after ``stage_timeout_seconds``, so the timeout of one stage does not
+        apply to the stages running concurrently.
+        
+        Args:
+            stage: Stage name
+            compute: Function computing the stage result from the stage's cancellation token
+        
+        Returns:
+            Stage result
+        """
+        checkpoints = self._checkpoints
+        if checkpoints is not None and checkpoints.has(stage):
+            print(f"⏭️ {stage} resumed from checkpoint")
+            return checkpoints.load(stage)
         
+        cancellation = self.cancellation.child()
+        with cancellation.deadline(self.config.stage_timeout_seconds, stage), self.report.stage(stage):
+            result = compute(cancellation)
+        if checkpoints is not None:
+            checkpoints.save(stage, result)
+        return result
+    
+    def _plot_metric_profiles(self, metric_name: str, results: List, stats_df: Optional[pd.DataFrame],
+                              title: str, exclude_converted: bool = False):
+        """Plot the per-segment profiles of a metric."""
         # Create beautiful plot using matplotlib
         import matplotlib.pyplot as plt
         import pandas as pd
@@ -192,6 +319,14 @@ class ExperimentAnalyzer:
                        markerfacecolor='white', markeredgewidth=2, markeredgecolor=colors[i % len(colors)],
                        alpha=0.9)
         
+        # Always-valid boundaries from the sequential test
+        if self.config.sequential_testing:
+            self._plot_sequential_boundary(ax, metric_name, results, colors)
+        
+        # Sampling uncertainty of each profile
+        if self.config.is_sampled and metric_name in METRIC_TESTS:
+            self._plot_sample_bands(ax, metric_name, results, colors, exclude_converted, stats_df)
+        
         # Customize the plot
         ax.set_title(title.replace('<b>', '').replace('</b>', '').replace('<br>', '\n'), 
                     fontsize=16, fontweight='bold', pad=20, color='#2C3E50')
@@ -220,10 +355,6 @@ class ExperimentAnalyzer:
         
         plt.tight_layout()
         plt.show()
-        
-        # Handle uplift calculation
-        if uplift_vs:
-            self._plot_uplift(results, uplift_vs, metric.name)
     
     def _plot_uplift(self, results: List, uplift_vs: str, metric_name: str):
         """Plot uplift against a baseline segment."""
@@ -391,15 +522,193 @@ class ExperimentAnalyzer:
         
         return segmentation_by_client, segmentation_by_segment
     
+    def get_reach_query(self) -> str:
+        """
+        Get the whole reach section as a single query.
+        
+        One scan of ``service_improvement`` returns hourly per-client counts, per-segment
+        totals and per-segment-per-client counts through GROUPING SETS. Each user is
+        counted once, at its first exposure, so the cumulative distinct counts are
+        computed exactly in the warehouse with a running sum.
+        
+        Returns:
+            SQL string
+        """
+        segmented_users = self.data_queries.get_segmented_users_subquery(
+            experiment_name=self.config.experiment_name,
+            start_date=self.config.start_date,
+            end_date=self.config.end_date,
+            sample_rate=self.config.sample_rate
+        )
+        
+        return f"""
+        WITH
+      segmented_users AS ({segmented_users.to_sql()}),
+      users AS (
+      SELECT
+        uid,
+        segment_name,
+        TIMESTAMP_TRUNC(origin_timestamp, HOUR) AS time,
+        CASE 
+            WHEN segmentation_client = "harvest_ios" THEN "ios"
+            WHEN segmentation_client = "harvest_android" THEN "android"
+            WHEN segmentation_client = "harvest_web" THEN "web"
+            WHEN segmentation_client IN ("harvest_mac_store", "harvest_windows_store") THEN "desktop"
+        END AS segmentation_client
+      FROM
+        segmented_users ),
+      grouped AS (
+      SELECT
+        time,
+        segment_name,
+        segmentation_client,
+        GROUPING(time) AS all_times,
+        GROUPING(segment_name) AS all_segments,
+        GROUPING(segmentation_client) AS all_clients,
+        COUNT(DISTINCT uid) AS users
+      FROM
+        users
+      GROUP BY
+        GROUPING SETS (
+          (time, segmentation_client),
+          (segment_name),
+          (segment_name, segmentation_client) ) )
+    SELECT
+      *,
+      IF(all_times = 0,
+        SUM(users) OVER (PARTITION BY all_times, all_segments, all_clients, segment_name, segmentation_client ORDER BY time),
+        NULL) AS users_cumulative
+    FROM
+      grouped
+        """
+    
+    def get_reach_breakdowns(self, cancellation: Optional[CancellationToken] = None):
+        """
+        Get the reach section data with a single query.
+        
+        Args:
+            cancellation: Token of the warehouse call (defaults to the analyzer's)
+        
+        Returns:
+            Tuple of DataFrames (by_client, by_segment, by_segment_client). ``by_client``
+            has hourly and cumulative distinct users per client. On a sample, user counts
+            are rescaled to the full population.
+        """
+        df = self.warehouse.read_gbq(self.get_reach_query(), {'stage': 'reach'}, cancellation)
+        if self.config.is_sampled:
+            df[['users', 'users_cumulative']] = df[['users', 'users_cumulative']] / self.config.sample_rate
+        
+        by_client = (
+            df[(df['all_times'] == 0) & (df['all_clients'] == 0)]
+            [['time', 'segmentation_client', 'users', 'users_cumulative']]
+            .sort_values('time')
+            .reset_index(drop=True)
+        )
+        by_segment = (
+            df[(df['all_segments'] == 0) & (df['all_clients'] == 1)]
+            [['segment_name', 'users']]
+            .reset_index(drop=True)
+        )
+        by_segment_client = (
+            df[(df['all_segments'] == 0) & (df['all_clients'] == 0)]
+            [['segment_name', 'segmentation_client', 'users']]
+            .reset_index(drop=True)
+        )
+        return by_client, by_segment, by_segment_client
+    
+    def update_reach_sketches(self, cancellation: Optional[CancellationToken] = None) -> SketchStore:
+        """
+        Bring the local reach sketches up to date.
+        
+        Only hours from the last stored hour on are queried; that hour is replaced
+        since it may have been incomplete when it was stored.
+        
+        Args:
+            cancellation: Token of the warehouse call (defaults to the analyzer's)
+        
+        Returns:
+            SketchStore object
+        """
+        store = SketchStore(self.config.reach_sketch_path)
+        since = store.last_hour(self.config.experiment_name)
+        
+        df = self.warehouse.read_gbq(self.data_queries.get_exposure_sketch_registers(
+            experiment_name=self.config.experiment_name,
+            start_date=self.config.start_date,
+            end_date=self.config.end_date,
+            since=since,
+            precision=store.precision
+        ), {'stage': 'reach_sketches'}, cancellation)
+        written = store.add_registers(self.config.experiment_name, df)
+        print(f"🧮 Stored {written} reach sketches" + (f" since {since}" if since else ""))
+        return store
+    
+    def get_sketch_reach(
+        self,
+        by: Optional[List[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        cumulative: bool = True,
+        update: bool = True,
+        cancellation: Optional[CancellationToken] = None
+    ) -> pd.DataFrame:
+        """
+        Get approximate distinct reach for any window and rollup from the local sketches.
+        
+        Args:
+            by: Dimensions to keep ('segment_name', 'segmentation_client')
+            start: Optional first hour (inclusive)
+            end: Optional last hour (inclusive)
+            cumulative: Return the running reach per hour instead of the window total
+            update: Fetch the new hours before merging
+            cancellation: Token of the warehouse call (defaults to the analyzer's)
+        
+        Returns:
+            DataFrame with the ``by`` columns, ``time`` (when cumulative) and ``users``
+        """
+        if update:
+            store = self.update_reach_sketches(cancellation)
+        else:
+            store = SketchStore(self.config.reach_sketch_path)
+        return store.reach(
+            self.config.experiment_name,
+            by=by,
+            start=start,
+            end=end,
+            segments=self.config.experiment_segments,
+            cumulative=cumulative
+        )
+    
+    def _get_reach_section(self, cancellation: Optional[CancellationToken] = None):
+        """
+        Get the data of the reach section charts.
+        
+        Args:
+            cancellation: Token of the warehouse calls (defaults to the analyzer's)
+        
+        Returns:
+            Tuple of DataFrames (cumulative users by client, users by segment)
+        """
+        if self.config.reach_sketches:
+            # Distinct users over all exposures, merged from the hourly sketches
+            df_seg_client = self.get_sketch_reach(by=['segmentation_client'], cancellation=cancellation)
+            df_seg_client = df_seg_client.rename(columns={'users': 'users_cumulative'})
+            df_seg_segment = self.get_sketch_reach(by=['segment_name'], cumulative=False, update=False)
+        else:
+            df_seg_client, df_seg_segment, _ = self.get_reach_breakdowns(cancellation)
+        return df_seg_client, df_seg_segment
+    
     def plot_segmentation_breakdowns(self):
         """Plot segmentation breakdowns."""
-        segmentation_by_client, segmentation_by_segment = self.get_segmentation_breakdowns()
+        df_seg_client, df_seg_segment = self._checkpointed('reach', self._get_reach_section)
         
+        with self.report.stage('render:reach', 'render'):
+            self._plot_reach_section(df_seg_client, df_seg_segment)
+    
+    def _plot_reach_section(self, df_seg_client: pd.DataFrame, df_seg_segment: pd.DataFrame):
+        """Plot cumulative users by client and users by segment."""
         # Plot by client
-        import pandas_gbq
-        df_seg_client = pandas_gbq.read_gbq(segmentation_by_client.to_sql())
-        df = df_seg_client.copy().sort_values('time')
-        df['users_cumulative'] = df.groupby('segmentation_client')['users'].transform('cumsum')
+        df = df_seg_client
         
         import matplotlib.pyplot as plt
         
@@ -420,8 +729,7 @@ class ExperimentAnalyzer:
         plt.show()
         
         # Plot by segment
-        df_seg_segment = pandas_gbq.read_gbq(segmentation_by_segment.to_sql())
-        df = df_seg_segment.copy()
+        df = df_seg_segment
         
         plt.figure(figsize=(10, 6))
         
@@ -444,12 +752,36 @@ class ExperimentAnalyzer:
         plt.tight_layout()
         plt.show()
     
-    def get_conversion_breakdowns(self):
-        """Get conversion breakdowns if enabled."""
+    def get_conversion_breakdowns(self, row_level: bool = False, cancellation: Optional[CancellationToken] = None):
+        """
+        Get conversion breakdowns if enabled.
+        
+        By default conversions are aggregated in the warehouse with GROUPING SETS:
+        conversions, distinct users and revenue per segment x client x event_type x
+        periodicity x seat bucket, plus the per-dimension subtotals. The ``all_*``
+        columns are 1 on rows where that dimension is rolled up.
+        
+        Args:
+            row_level: Pull every conversion row instead of the aggregates
+            cancellation: Token of the warehouse call (defaults to the analyzer's)
+            
+        Returns:
+            DataFrame with conversion breakdowns (aggregates rescaled when sampling)
+        """
         if not self.config.include_conversion_breakdowns:
-            return pd.DataFrame(columns=['segment_name', 'global_user_id', 'offer_group', 'plan', 'periodicity', 'net_revenues_usd'])
+            if row_level:
+                return pd.DataFrame(columns=['uid', 'segment_name', 'client', 'event_type', 'purchase_timestamp',
+                                             'product_periodicity', 'bookings_net_of_platform_fees_usd'])
+            return pd.DataFrame(columns=['segment_name', 'client', 'event_type', 'product_periodicity', 'seat_bucket',
+                                         'all_clients', 'all_event_types', 'all_periodicities', 'all_seat_buckets',
+                                         'conversions', 'users', 'net_revenues_usd'])
+        
+        sample_filter = ''
+        if self.config.is_sampled:
+            uid = "JSON_EXTRACT_SCALAR(identifiers, '$.harvest_account_id')"
+            sample_filter = f"\n        AND {self.data_queries.sample_filter(uid, self.config.sample_rate)}"
         
-        conversion_breakdown_query = f"""
+        conversions_cte = f"""
         WITH
       first_segmentation AS (
       SELECT
@@ -462,7 +794,7 @@ class ExperimentAnalyzer:
       WHERE
         JSON_VALUE(payload, '$.experiment_name') = '{self.config.experiment_name}'
         AND DATE(event_timestamp) >= '{self.config.start_date}'
-        AND DATE(event_timestamp) <= '{self.config.end_date}'
+        AND DATE(event_timestamp) <= '{self.config.end_date}'{sample_filter}
       GROUP BY
         1 ),
       conversions AS (
@@ -497,7 +829,10 @@ class ExperimentAnalyzer:
             (0)]) = 'additional_user')
             
              )
-
+        """
+        
+        if row_level:
+            conversion_breakdown_query = conversions_cte + """
             SELECT
         conversions.uid,
         conversions.segment_name,
@@ -506,43 +841,605 @@ class ExperimentAnalyzer:
         conversions.purchase_timestamp,
         conversions.product_periodicity,
         conversions.bookings_net_of_platform_fees_usd,
-        conversions.product_periodicity,
         FROM conversions
         """
+        else:
+            conversion_breakdown_query = conversions_cte + """
+            SELECT
+        segment_name,
+        client,
+        event_type,
+        product_periodicity,
+        seat_bucket,
+        GROUPING(client) AS all_clients,
+        GROUPING(event_type) AS all_event_types,
+        GROUPING(product_periodicity) AS all_periodicities,
+        GROUPING(seat_bucket) AS all_seat_buckets,
+        COUNT(*) AS conversions,
+        COUNT(DISTINCT uid) AS users,
+        SUM(bookings_net_of_platform_fees_usd) AS net_revenues_usd
+        FROM (
+          SELECT
+            *,
+            CASE
+              WHEN seat_number IS NULL OR seat_number < 1 THEN 'Unknown'
+              WHEN seat_number < 3 THEN 'Personal (1-2)'
+              WHEN seat_number < 10 THEN 'Small Team (3-9)'
+              WHEN seat_number < 50 THEN 'Medium Team (10-49)'
+              WHEN seat_number < 100 THEN 'Large Team (50-99)'
+              ELSE 'XL Team (100+)'
+            END AS seat_bucket
+          FROM conversions )
+        GROUP BY
+        GROUPING SETS (
+          (segment_name, client, event_type, product_periodicity, seat_bucket),
+          (segment_name, client, event_type),
+          (segment_name, event_type, product_periodicity),
+          (segment_name, event_type, seat_bucket),
+          (segment_name, event_type),
+          (segment_name) )
+        """
+        
+        df = self.warehouse.read_gbq(conversion_breakdown_query, {'stage': 'conversion_breakdowns'}, cancellation)
+        if self.config.is_sampled and not row_level:
+            # Scale sampled totals to the full population
+            counts = ['conversions', 'users', 'net_revenues_usd']
+            df[counts] = df[counts] / self.config.sample_rate
+        return df
+    
+    def get_sufficient_stats(
+        self,
+        metric_names: Optional[List[str]] = None,
+        exclude_converted: bool = False,
+        granularity_in_days: Optional[int] = None,
+        end_date: Optional[str] = None,
+        first_bin: int = 0,
+        cancellation: Optional[CancellationToken] = None
+    ) -> pd.DataFrame:
+        """
+        Get per-segment, per-time-bin sufficient statistics for several metrics in one query.
+        
+        Args:
+            metric_names: Metrics to include (defaults to the configured metrics)
+            exclude_converted: Whether to exclude converted users
+            granularity_in_days: Width of each time bin (defaults to the configured granularity)
+            end_date: Last date covered by the time bins (defaults to ``actions_end_date``)
+            first_bin: First time bin to compute
+            cancellation: Token of the warehouse calls (defaults to the analyzer's)
+            
+        Returns:
+            DataFrame with metric, time_bin, segment_name, n, sum_x, sum_x2, sum_y, sum_y2, sum_xy
+        """
+        metric_names = metric_names or self.config.metrics_list
+        unknown = [name for name in metric_names if name not in METRIC_TESTS]
+        if unknown:
+            raise ValueError(f"No significance test defined for: {unknown}. Available metrics: {list(METRIC_TESTS.keys())}")
+        
+        shards = range(self.config.shards) if self.config.shards > 1 else [None]
+        queries = []
+        for shard in shards:
+            user_base = self.data_queries.get_experiment_user_base(
+                experiment_name=self.config.experiment_name,
+                segment_name=self.config.experiment_segments,
+                start_date=self.config.start_date,
+                end_date=self.config.end_date,
+                exclude_converted=exclude_converted,
+                sample_rate=self.config.sample_rate,
+                shard=shard,
+                n_shards=self.config.shards
+            )
+            
+            stats_queries = [
+                self.data_queries.get_sufficient_stats(
+                    metric_name=metric_name,
+                    user_base=user_base,
+                    target_query=self.metrics.get_target_query(metric_name),
+                    start_date=self.config.start_date,
+                    end_date=end_date or self.config.actions_end_date,
+                    granularity_in_days=granularity_in_days or self.config.granularity_in_days,
+                    value=METRIC_TESTS[metric_name].value,
+                    first_bin=first_bin,
+                    covariate=self.config.cuped_covariate if self.config.cuped else None,
+                    covariate_lookback_days=self.config.cuped_lookback_days
+                )
+                for metric_name in metric_names
+            ]
+            queries.append(self.data_queries.union_all(stats_queries))
+        
+        labels = {'metric': ','.join(metric_names)}
+        if len(queries) == 1:
+            return self.warehouse.read_gbq(queries[0], labels, cancellation)
+        return self._run_shards(queries, labels, cancellation)
+    
+    def _run_shards(
+        self,
+        queries: List[str],
+        labels: Optional[Dict[str, str]] = None,
+        cancellation: Optional[CancellationToken] = None
+    ) -> pd.DataFrame:
+        """
+        Run shard queries with bounded concurrency and merge their statistics.
+        
+        Shards hold disjoint users, so summing the sufficient statistics gives
+        exactly the result of the unsharded query.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        # Cancelled on its own when a shard fails or the call is interrupted, so the other shards stop too
+        cancellation = (cancellation or self.cancellation).child()
+        stage = self.report.current_stage
+        
+        def run_shard(query: str) -> pd.DataFrame:
+            with self.report.within(stage):
+                return self.warehouse.read_gbq(query, labels, cancellation)
+        
+        print(f"🧩 Running {len(queries)} shards, {self.config.max_concurrent_jobs} at a time...")
+        with ThreadPoolExecutor(max_workers=self.config.max_concurrent_jobs) as executor:
+            futures = [executor.submit(run_shard, query) for query in queries]
+            try:
+                frames = [future.result() for future in futures]
+            except BaseException as e:
+                cancellation.cancel(f'another shard stopped: {type(e).__name__}')
+                raise
+        
+        df = pd.concat(frames, ignore_index=True)
+        keys = ['metric', 'time_bin', 'segment_name']
+        return df.groupby(keys, as_index=False, sort=True).sum(numeric_only=True)
+    
+    def _profiles_from_stats(self, stats_df: pd.DataFrame) -> List:
+        """
+        Build per-segment profiles (as returned by request_multiple_metrics) from sufficient statistics.
+        
+        The profile is the metric as defined for ``request_multiple_metrics``: the bsp
+        metrics are all ``estimator='cumulated'``, i.e. per exposed user and cumulative
+        from the start date. That is ``sum_x / n`` for every metric: the share of users
+        with a target event (``CustomFirstSuccessRateMetric``) or the cumulative value or
+        count per user (``CustomValuedMetric``, ``CustomCountMetric``). It is not the test
+        estimate of ratio metrics: ``SubscriptionArps`` is plotted per exposed user, as
+        without shards, while its significance test compares revenue per paying user.
+        """
+        from types import SimpleNamespace
+        
+        sufficient = SufficientStats.from_frame(stats_df, segments=self.config.experiment_segments)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            estimate = sufficient.sum_x / sufficient.n
+        time_bins = self._bin_timestamps(sufficient.time_bins)
+        return [
+            SimpleNamespace(profile={'time_bin': time_bins, 'value': list(estimate[0, i])})
+            for i in range(len(self.config.experiment_segments))
+        ]
+    
+    def get_significance(
+        self,
+        metric_names: Optional[List[str]] = None,
+        control_segment: Optional[str] = None,
+        exclude_converted: bool = False,
+        stats_df: Optional[pd.DataFrame] = None,
+        cancellation: Optional[CancellationToken] = None
+    ) -> pd.DataFrame:
+        """
+        Test every segment against the control for all metrics and cumulative time bins.
+        
+        Args:
+            metric_names: Metrics to test (defaults to the configured metrics)
+            control_segment: Control segment (defaults to ``config.control_segment``)
+            exclude_converted: Whether to exclude converted users
+            stats_df: Pre-fetched sufficient statistics; queried when not provided
+            cancellation: Token of the warehouse calls (defaults to the analyzer's)
+            
+        Returns:
+            DataFrame with one row per metric, treatment segment and time bin
+        """
+        if stats_df is None:
+            stats_df = self.get_sufficient_stats(metric_names, exclude_converted=exclude_converted,
+                                                 cancellation=cancellation)
+        
+        stats = SufficientStats.from_frame(stats_df, segments=self.config.experiment_segments)
+        return significance_table(
+            stats,
+            control_segment=control_segment or self.config.control_segment,
+            alpha=self.config.significance_level
+        )
+    
+    def plot_significance(self, significance_df: pd.DataFrame, metric_name: str):
+        """
+        Plot relative uplift with confidence intervals for one metric.
+        
+        Args:
+            significance_df: Output of ``get_significance``
+            metric_name: Metric to plot
+        """
+        import matplotlib.pyplot as plt
+        
+        df = significance_df[significance_df['metric'] == metric_name]
+        
+        plt.style.use('default')
+        plt.rcParams['figure.facecolor'] = 'white'
+        plt.rcParams['axes.facecolor'] = 'white'
+        plt.rcParams['font.size'] = 11
+        plt.rcParams['axes.linewidth'] = 0.8
+        
+        fig, ax = plt.subplots(figsize=(14, 8))
+        
+        colors = ['#2E86AB', '#A23B72', '#F18F01', '#C73E1D', '#7209B7', '#048A81', '#F77F00', '#D62828', '#023047', '#219EBC']
+        
+        for i, (segment, segment_df) in enumerate(df.groupby('segment_name', sort=False)):
+            color = colors[i % len(colors)]
+            ax.plot(segment_df['time_bin'], segment_df['relative_uplift'],
+                   marker='o', linewidth=3, markersize=8, label=segment, color=color,
+                   markerfacecolor='white', markeredgewidth=2, markeredgecolor=color, alpha=0.9)
+            ax.fill_between(segment_df['time_bin'], segment_df['relative_ci_low'], segment_df['relative_ci_high'],
+                           color=color, alpha=0.15)
+        
+        confidence = 1 - self.config.significance_level
+        ax.set_title(f'{metric_name} - Uplift vs {self.config.control_segment} ({confidence:.0%} CI)',
+                    fontsize=16, fontweight='bold', pad=20, color='#2C3E50')
+        ax.set_xlabel('Time Bin', fontsize=12, fontweight='bold', color='#34495E')
+        ax.set_ylabel('Uplift', fontsize=12, fontweight='bold', color='#34495E')
+        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda y, _: f'{y:.1%}'))
+        
+        legend = ax.legend(title='Segment', frameon=True, fancybox=True, shadow=True,
+                          loc='best', fontsize=11, title_fontsize=12)
+        legend.get_frame().set_facecolor('#F8F9FA')
+        legend.get_frame().set_edgecolor('#DEE2E6')
+        
+        ax.grid(True, alpha=0.3, linestyle='-', linewidth=0.5, color='#BDC3C7')
+        ax.set_axisbelow(True)
+        ax.axhline(y=0, color='#E74C3C', linestyle='-', linewidth=2, alpha=0.7, zorder=0)
+        
+        for spine in ax.spines.values():
+            spine.set_edgecolor('#BDC3C7')
+            spine.set_linewidth(0.8)
+        
+        plt.tight_layout()
+        plt.show()
+    
+    def update_sequential(self, cancellation: Optional[CancellationToken] = None) -> SequentialTest:
+        """
+        Bring the persisted sequential test up to date with the latest complete days.
+        
+        Only days not yet ingested are queried, so a daily refresh costs one new time
+        bin regardless of how long the experiment has been running.
+        
+        Args:
+            cancellation: Token of the warehouse call (defaults to the analyzer's)
+        
+        Returns:
+            SequentialTest object with the updated state
+        """
+        from datetime import datetime, date, timedelta
+        
+        # Keep sampled runs from mixing with the full-population state
+        experiment_key = self.config.experiment_name
+        if self.config.is_sampled:
+            experiment_key += f'__sample_{self.config.sample_rate:g}'
+        
+        test = SequentialTest.load(
+            experiment_key,
+            self.config.experiment_segments,
+            control_segment=self.config.control_segment,
+            alpha=self.config.significance_level,
+            tau=self.config.sequential_tau,
+            state_dir=self.config.sequential_state_dir
+        )
+        
+        # Only ingest complete days
+        start = datetime.strptime(self.config.start_date, '%Y-%m-%d').date()
+        last_day = min(datetime.strptime(self.config.actions_end_date, '%Y-%m-%d').date(),
+                       date.today() - timedelta(days=1))
+        last_bin = (last_day - start).days
+        
+        # From the first bin missing for any metric (a metric added later starts at bin 0)
+        metric_names = [name for name in self.config.metrics_list if name in METRIC_TESTS]
+        first_bin = min((test.last_time_bin(name) for name in metric_names), default=last_bin) + 1
+        if last_bin >= first_bin:
+            stats_df = self.get_sufficient_stats(
+                metric_names,
+                granularity_in_days=1,
+                end_date=last_day.strftime('%Y-%m-%d'),
+                first_bin=first_bin,
+                cancellation=cancellation
+            )
+            test.update(SufficientStats.from_frame(stats_df, segments=self.config.experiment_segments))
+            test.save()
         
-        import pandas_gbq
-        return pandas_gbq.read_gbq(conversion_breakdown_query)
+        self.sequential_test = test
+        return test
+    
+    def _bin_timestamps(self, time_bins) -> List[pd.Timestamp]:
+        """Chart times of sufficient-statistics bins (bin ``b`` is ``b * granularity_in_days`` days after the start)."""
+        start = pd.Timestamp(self.config.start_date)
+        return [start + pd.Timedelta(days=int(b) * self.config.granularity_in_days) for b in time_bins]
+    
+    @staticmethod
+    def _profile_frame(result) -> pd.DataFrame:
+        """Profile of a segment as a DataFrame of ``time_bin`` timestamps and values."""
+        df = pd.DataFrame(result.profile)
+        df['time_bin'] = pd.to_datetime(df['time_bin'])
+        return df
+    
+    def _plot_sequential_boundary(self, ax, metric_name: str, results: List, colors: List[str]):
+        """Shade the always-valid confidence band of each segment around the control profile."""
+        if self.sequential_test is None:
+            self.update_sequential()
+        
+        history = self.sequential_test.history_frame(metric_name)
+        if history.empty:
+            return
+        
+        # Daily state, keep the days closing a chart bin and key them by the bin's chart time
+        granularity = self.config.granularity_in_days
+        history = history[(history['time_bin'] + 1) % granularity == 0]
+        history = history.assign(time_bin=self._bin_timestamps((history['time_bin'] + 1) // granularity - 1))
+        control_index = self.config.experiment_segments.index(self.config.control_segment)
+        control_df = self._profile_frame(results[control_index])
+        
+        for i, segment in enumerate(self.config.experiment_segments):
+            # The profile and the state may not cover the same bins, align them on time
+            band = control_df.merge(history[history['segment_name'] == segment], on='time_bin')
+            if band.empty:
+                continue
+            ax.fill_between(
+                band['time_bin'], band['value'] + band['ci_low'], band['value'] + band['ci_high'],
+                color=colors[i % len(colors)], alpha=0.12,
+                label=f'{segment} always-valid {1 - self.config.significance_level:.0%} CI'
+            )
     
-    def run_full_analysis(self, metrics_to_analyze: Optional[List[str]] = None):
+    def _get_sample_stats(self, metric_name: str, exclude_converted: bool) -> pd.DataFrame:
+        """
+        Sufficient statistics of a sampled metric, for its chart bands.
+        
+        The statistics of every configured metric are fetched in one query, and kept for
+        the charts of the other metrics until the next full analysis.
+        """
+        cached = self._sample_stats.get(exclude_converted)
+        if cached is None or metric_name not in cached[0]:
+            metric_names = [name for name in self.config.metrics_list if name in METRIC_TESTS]
+            if metric_name not in metric_names:
+                metric_names.append(metric_name)
+            cached = self._sample_stats[exclude_converted] = (
+                metric_names, self.get_sufficient_stats(metric_names, exclude_converted=exclude_converted)
+            )
+        stats_df = cached[1]
+        return stats_df[stats_df['metric'] == metric_name]
+    
+    def _plot_sample_bands(self, ax, metric_name: str, results: List, colors: List[str], exclude_converted: bool,
+                           stats_df: Optional[pd.DataFrame] = None):
+        """Shade the confidence band of each profile, widened by the smaller sampled population."""
+        import numpy as np
+        from scipy import stats
+        from .significance import arm_moments
+        
+        if stats_df is None:
+            stats_df = self._get_sample_stats(metric_name, exclude_converted)
+        sufficient = SufficientStats.from_frame(stats_df, segments=self.config.experiment_segments)
+        _, variance = arm_moments(sufficient, sufficient.kinds(), adjust=False)
+        z = stats.norm.ppf(1 - self.config.significance_level / 2)
+        half_width = z * np.sqrt(variance[0])
+        time_bins = self._bin_timestamps(sufficient.time_bins)
+        
+        for i, segment in enumerate(self.config.experiment_segments):
+            if i >= len(results):
+                continue
+            # The profile and the statistics may not cover the same bins, align them on time
+            band = self._profile_frame(results[i]).merge(
+                pd.DataFrame({'time_bin': time_bins, 'half_width': half_width[i]}), on='time_bin'
+            )
+            if band.empty:
+                continue
+            ax.fill_between(
+                band['time_bin'], band['value'] - band['half_width'], band['value'] + band['half_width'],
+                color=colors[i % len(colors)], alpha=0.1,
+                label=f'{segment} {1 - self.config.significance_level:.0%} CI ({self.config.sample_rate:.0%} sample)'
+            )
+    
+    def run_full_analysis(self, metrics_to_analyze: Optional[List[str]] = None, resume: bool = True):
         """
         Run the complete experiment analysis.
         
+        Wall time and warehouse usage of each stage (and memory, with ``profile_memory``)
+        are recorded in ``self.report`` (``self.report.to_frame()``, ``self.report.to_json(path)``).
+        
+        With ``checkpoints``, the result of each stage is saved under ``checkpoint_dir`` in
+        a run directory keyed by the analysis settings, the requested metrics and the data
+        version (operational settings such as timeouts, retries and concurrency can change
+        between an interrupted run and its resume).
+        If the run is interrupted, running it again loads the completed stages and
+        resumes from the first incomplete one. The checkpoints are removed once the
+        analysis completes.
+        
+        Stages taking longer than ``stage_timeout_seconds``, or a run longer than
+        ``run_timeout_seconds``, raise ``DeadlineExceeded``. A timeout, an interrupted
+        cell or ``cancel()`` cancels the warehouse jobs in flight; the completed stages
+        stay checkpointed.
+        
         Args:
             metrics_to_analyze: Optional list of specific metrics to analyze. 
                                If None, analyzes all configured metrics.
+            resume: Whether to resume from the checkpoints of an interrupted run;
+                    False discards them and starts over
+        """
+        from .manifest import checkpoint_fingerprint
+        
+        run_id = None
+        if self.config.checkpoints:
+            fingerprint = checkpoint_fingerprint(self.config, metrics_to_analyze or self.config.metrics_list)
+            self._checkpoints = CheckpointStore(self.config.checkpoint_dir, self.config.experiment_name, fingerprint)
+            completed = self._checkpoints.completed()
+            if not resume:
+                self._checkpoints.clear()
+            elif completed:
+                print(f"♻️ Resuming interrupted run ({len(completed)} stages checkpointed)")
+            run_id = self._checkpoints.run_id()
+        
+        # Start a fresh run report (a resumed run keeps its run ID, and so its warehouse job IDs)
+        self.report = self.warehouse.report = RunReport(
+            self.config.experiment_name, self.config.profile_memory, run_id=run_id
+        )
+        self._sample_stats = {}
+        
+        try:
+            with self.warehouse.run(self.report.run_id), self.cancellation.deadline(self.config.run_timeout_seconds, 'run'):
+                self._run_stages(metrics_to_analyze)
+        finally:
+            checkpoints, self._checkpoints = self._checkpoints, None
+        
+        if checkpoints is not None:
+            checkpoints.clear()
+    
+    def _metrics_to_run(self, metrics_to_analyze: Optional[List[str]] = None) -> List[str]:
+        """Metrics of a full analysis: the requested ones that are configured, or all configured metrics."""
+        if not metrics_to_analyze:
+            return list(self.config.metrics_list)
+        for metric_name in metrics_to_analyze:
+            if metric_name not in self.config.metrics_list:
+                print(f"⚠️  Metric '{metric_name}' not found in available metrics: {self.config.metrics_list}")
+        return [metric_name for metric_name in metrics_to_analyze if metric_name in self.config.metrics_list]
+    
+    def build_plan(self, metrics_to_analyze: Optional[List[str]] = None) -> StagePlan:
         """
-        print(f"Starting analysis for experiment: {self.config.experiment_name}")
-        print(f"Date range: {self.config.start_date} to {self.config.end_date}")
-        print(f"Segments: {', '.join(self.config.experiment_segments)}")
-        print("-" * 50)
+        Build the stage graph of ``run_full_analysis``.
+        
+        Data stages query the warehouse (or load their checkpoint) and can run in parallel;
+        ``render:`` stages draw on the main thread. Reach, each metric and the conversion
+        breakdowns are independent branches. The sufficient statistics of every metric are
+        fetched once, by ``sufficient_stats``, for both the significance tests and the metric
+        charts, and metric charts wait for the sequential test when it is enabled.
+        
+        Args:
+            metrics_to_analyze: Optional list of specific metrics to analyze
+        
+        Returns:
+            StagePlan object (``plan.summary()``, ``plan.to_frame()``, ``plan.to_json(path)``, ``plan.to_dot()``)
+        """
+        plan = StagePlan(self.config.experiment_name)
         
-        # Plot segmentation breakdowns
         if self.config.include_reach_section:
-            print("Plotting segmentation breakdowns...")
-            self.plot_segmentation_breakdowns()
+            plan.add('reach', lambda inputs: self._checkpointed('reach', self._get_reach_section),
+                     description='Reach by client and by segment')
+            plan.add('render:reach', lambda inputs: self._render_reach(*inputs['reach']), ['reach'],
+                     main_thread=True, description='Reach charts')
         
-        # Analyze metrics
-        if metrics_to_analyze:
-            print(f"Analyzing specific metrics: {', '.join(metrics_to_analyze)}")
-            self.analyze_specific_metrics(metrics_to_analyze)
-        else:
-            print("Analyzing all configured metrics...")
-            self.analyze_all_metrics()
+        if self.config.sequential_testing:
+            plan.add('sequential', lambda inputs: self._update_sequential_stage(),
+                     description='Sequential test update (persisted incrementally)')
+        
+        if self.config.include_significance:
+            plan.add('sufficient_stats',
+                     lambda inputs: self._checkpointed(
+                         'sufficient_stats',
+                         lambda cancellation: self.get_sufficient_stats(metrics_to_analyze, cancellation=cancellation)
+                     ),
+                     description='Sufficient statistics of every metric, in one query')
+        
+        for metric_name in self._metrics_to_run(metrics_to_analyze):
+            stage = self._metric_stage(metric_name)
+            inputs = ['sufficient_stats'] if self.config.include_significance and metric_name in METRIC_TESTS else []
+            plan.add(stage, functools.partial(self._fetch_metric, metric_name), inputs,
+                     description=f'{metric_name} profiles')
+            render_inputs = [stage] + (['sequential'] if self.config.sequential_testing else [])
+            plan.add(f'render:{stage}', functools.partial(self._render_metric, metric_name), render_inputs,
+                     main_thread=True, description=f'{metric_name} chart')
         
-        # Get conversion breakdowns
         if self.config.include_conversion_breakdowns:
-            print("Getting conversion breakdowns...")
-            conversion_breakdown_df = self.get_conversion_breakdowns()
-            print(f"Conversion breakdown data shape: {conversion_breakdown_df.shape}")
+            plan.add('conversion_breakdowns', lambda inputs: self._fetch_conversion_breakdowns(),
+                     description='Conversion breakdowns')
+        
+        if self.config.include_significance:
+            plan.add('significance',
+                     lambda inputs: self._checkpointed(
+                         'significance',
+                         lambda cancellation: self.get_significance(
+                             metrics_to_analyze, stats_df=inputs['sufficient_stats'], cancellation=cancellation
+                         )
+                     ),
+                     ['sufficient_stats'], description='Significance tests')
+            plan.add('render:significance', lambda inputs: self._render_significance(inputs['significance']),
+                     ['significance'], main_thread=True, description='Significance table and uplift charts')
         
-        print("Analysis complete!")
+        return plan
+    
+    def _render_reach(self, df_seg_client: pd.DataFrame, df_seg_segment: pd.DataFrame):
+        """Plan stage: draw the reach charts."""
+        print("Plotting segmentation breakdowns...")
+        with self.report.stage('render:reach', 'render'):
+            self._plot_reach_section(df_seg_client, df_seg_segment)
+    
+    def _update_sequential_stage(self) -> SequentialTest:
+        """Plan stage: bring the sequential test up to date."""
+        print("Updating sequential tests...")
+        cancellation = self.cancellation.child()
+        with cancellation.deadline(self.config.stage_timeout_seconds, 'sequential'), \
+                self.report.stage('sequential'):
+            return self.update_sequential(cancellation)
+    
+    def _fetch_metric(self, metric_name: str, inputs: Dict[str, Any]):
+        """Plan stage: request the profiles of a metric."""
+        print(f"Analyzing {metric_name}...")
+        return self._checkpointed(
+            self._metric_stage(metric_name),
+            lambda cancellation: self._request_metric_results(
+                metric_name, stats_df=inputs.get('sufficient_stats'), cancellation=cancellation
+            )
+        )
+    
+    def _render_metric(self, metric_name: str, inputs: Dict[str, Any]):
+        """Plan stage: draw the chart of a metric."""
+        stage = self._metric_stage(metric_name)
+        results, stats_df = inputs[stage]
+        title = self._metric_title(self.metrics.get_metric_by_name(metric_name))
+        with span(metric_name, 'metric', exclude_converted=False), self.report.stage(f'render:{stage}', 'render'):
+            self._plot_metric_profiles(metric_name, results, stats_df, title)
+    
+    def _fetch_conversion_breakdowns(self) -> pd.DataFrame:
+        """Plan stage: get the conversion breakdowns."""
+        print("Getting conversion breakdowns...")
+        conversion_breakdown_df = self._checkpointed(
+            'conversion_breakdowns', lambda cancellation: self.get_conversion_breakdowns(cancellation=cancellation)
+        )
+        print(f"Conversion breakdown data shape: {conversion_breakdown_df.shape}")
+        return conversion_breakdown_df
+    
+    def _render_significance(self, significance_df: pd.DataFrame):
+        """Plan stage: print the last time bin of the significance tests and draw the uplift charts."""
+        print("Computing statistical significance...")
+        last_bin = significance_df[significance_df['time_bin'] == significance_df['time_bin'].max()]
+        summary_columns = ['metric', 'segment_name', 'relative_uplift', 'relative_ci_low',
+                           'relative_ci_high', 'p_value', 'significant']
+        if 'variance_reduction' in last_bin.columns:
+            summary_columns.append('variance_reduction')
+        print(last_bin[summary_columns].to_string(index=False))
+        with self.report.stage('render:significance', 'render'):
+            for metric_name in significance_df['metric'].unique():
+                self.plot_significance(significance_df, metric_name)
+    
+    def _run_stages(self, metrics_to_analyze: Optional[List[str]] = None):
+        """Run the stage plan of the full analysis."""
+        with span('run', 'run', experiment=self.config.experiment_name, execution_mode=self.execution_mode), \
+                self.report.profiling():
+            print(f"Starting analysis for experiment: {self.config.experiment_name}")
+            print(f"Date range: {self.config.start_date} to {self.config.end_date}")
+            print(f"Segments: {', '.join(self.config.experiment_segments)}")
+            if self.config.is_sampled:
+                print(f"🎲 Quick look on a {self.config.sample_rate:.0%} user sample")
+            print("-" * 50)
+            
+            plan = self.build_plan(metrics_to_analyze)
+            
+            # Worker stages have no notebook frames to look the bsp helpers up in
+            self.helpers = resolve_helpers()
+            
+            # Memory is attributed per stage, so stages run one at a time while profiling it
+            max_workers = 1 if self.config.profile_memory else self.config.max_concurrent_stages
+            
+            # A failing stage cancels the other running stages without cancelling the analyzer's token
+            cancellation = self.warehouse.cancellation
+            self.warehouse.cancellation = cancellation.child()
+            try:
+                with using_helpers(self.helpers):
+                    plan.run(max_workers, self.warehouse.cancellation)
+            finally:
+                self.warehouse.cancellation = cancellation
+            
+            print(self.report.summary())
+            print("Analysis complete!")
@@ -0,0 +1,342 @@
+"""
+Declarative experiment manifests and fingerprint-based recompute planning.
+
+A manifest (TOML or YAML) lists many experiment configurations, with optional
+shared ``defaults``. Every config and every metric gets a stable fingerprint
+built from the analysis settings, the library version and the data version
+(the last complete day covered). Comparing those against the results store
+gives the minimal set of experiments and metrics to recompute.
+"""
+
+import copy
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field, fields
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from .config import ExperimentConfig
+from .significance import METRIC_TESTS
+from ..utils.results_store import ResultsStore
+from ..utils.warehouse import Warehouse
+
+CONFIG_FIELDS = {f.name for f in fields(ExperimentConfig)}
+REQUIRED_FIELDS = ['experiment_name', 'start_date', 'end_date']
+
+# Settings that change the statistics of a metric (presentation options are left out)
+METRIC_FINGERPRINT_FIELDS = [
+    'experiment_name', 'start_date', 'end_date', 'actions_end_date', 'experiment_segments',
+    'only_free_users', 'sample_rate', 'cuped', 'cuped_covariate', 'cuped_lookback_days',
+]
+
+# Settings that change the result of a run_full_analysis stage (timeouts, retries, concurrency and
+# other operational settings are left out, so changing them keeps the checkpoints of a run)
+CHECKPOINT_FINGERPRINT_FIELDS = METRIC_FINGERPRINT_FIELDS + [
+    'include_significance', 'shards', 'control_segment', 'significance_level', 'reach_sketches',
+    'action_engagement_model', 'action_engagement_model_2',
+    'target_paywall_display_event', 'target_paywall_conversion_event',
+]
+
+
+def _read_manifest_file(path: str) -> Dict[str, Any]:
+    """Parse a TOML, YAML or JSON manifest file."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.toml':
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ImportError("Reading TOML manifests on Python < 3.11 requires tomli: pip install tomli")
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    if extension in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("Reading YAML manifests requires PyYAML: pip install pyyaml")
+        with open(path) as f:
+            return yaml.safe_load(f) or {}
+    if extension == '.json':
+        with open(path) as f:
+            data = json.load(f)
+        # A single config is a manifest with one experiment
+        return data if 'experiments' in data else {'experiments': [data]}
+    raise ValueError(f"Unsupported manifest format: {extension}. Use .toml, .yaml, .yml or .json")
+
+
+def load_manifest(path: str, batch: bool = True) -> List[ExperimentConfig]:
+    """
+    Load and validate an experiment manifest.
+    
+    The manifest has an optional ``defaults`` table applied to every experiment and
+    an ``experiments`` list of ``ExperimentConfig`` fields. All problems are reported
+    at once.
+    
+    Args:
+        path: Path to a .toml, .yaml, .yml or .json manifest (a JSON file may hold a single config)
+        batch: Whether the experiments are recomputed in batches (``run_plan``), which
+            do not support ``cuped`` or ``shards``
+    
+    Returns:
+        List of ExperimentConfig objects
+    
+    Raises:
+        ValueError: If the manifest is invalid
+    """
+    manifest = _read_manifest_file(path)
+    defaults = manifest.get('defaults', {})
+    experiments = manifest.get('experiments', [])
+    
+    errors = []
+    unknown = sorted(set(manifest) - {'defaults', 'experiments'})
+    if unknown:
+        errors.append(f"unknown top-level keys: {unknown}")
+    if not experiments:
+        errors.append("no experiments listed")
+    
+    configs = []
+    seen = set()
+    for i, experiment in enumerate(experiments):
+        entry = {**copy.deepcopy(defaults), **experiment}
+        label = entry.get('experiment_name', f'experiments[{i}]')
+        
+        unknown = sorted(set(entry) - CONFIG_FIELDS)
+        if unknown:
+            errors.append(f"{label}: unknown fields {unknown}")
+            continue
+        missing = [name for name in REQUIRED_FIELDS if name not in entry]
+        if missing:
+            errors.append(f"{label}: missing fields {missing}")
+            continue
+        if label in seen:
+            errors.append(f"{label}: listed more than once")
+            continue
+        seen.add(label)
+        
+        for name in ('start_date', 'end_date', 'actions_end_date'):
+            if entry.get(name) is not None:
+                try:
+                    datetime.strptime(str(entry[name]), '%Y-%m-%d')
+                except ValueError:
+                    errors.append(f"{label}: {name} must be YYYY-MM-DD, got {entry[name]!r}")
+                entry[name] = str(entry[name])
+        unknown_metrics = [name for name in entry.get('metrics_list', []) if name not in METRIC_TESTS]
+        if unknown_metrics:
+            errors.append(f"{label}: unknown metrics {unknown_metrics}. Available metrics: {list(METRIC_TESTS.keys())}")
+        
+        try:
+            config = ExperimentConfig(**entry)
+        except (TypeError, ValueError) as e:
+            errors.append(f"{label}: {e}")
+            continue
+        # The batch query has no pre-period covariates and is not sharded
+        if batch and (config.cuped or config.shards > 1):
+            errors.append(f"{label}: cuped and shards are not supported in batches")
+            continue
+        configs.append(config)
+    
+    if errors:
+        raise ValueError(f"Invalid manifest {path}:\n- " + '\n- '.join(errors))
+    return configs
+
+
+def data_version(config: ExperimentConfig, today: Optional[date] = None) -> str:
+    """
+    Get the last complete day of data covered by an experiment.
+    
+    Finished experiments keep the same version; running ones change every day.
+    
+    Args:
+        config: Experiment configuration
+        today: Reference date (defaults to today)
+    
+    Returns:
+        Date string
+    """
+    today = today or date.today()
+    last_day = min(datetime.strptime(config.actions_end_date, '%Y-%m-%d').date(), today - timedelta(days=1))
+    return last_day.strftime('%Y-%m-%d')
+
+
+def _fingerprint(payload: Dict[str, Any]) -> str:
+    """Stable short hash of a JSON-serializable payload."""
+    from .. import __version__
+    
+    data = json.dumps({**payload, 'library_version': __version__}, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+
+def config_fingerprint(config: ExperimentConfig, today: Optional[date] = None) -> str:
+    """
+    Fingerprint of a whole experiment configuration and its data version.
+    
+    Args:
+        config: Experiment configuration
+        today: Reference date (defaults to today)
+    
+    Returns:
+        Hex string
+    """
+    return _fingerprint({'config': config.to_dict(), 'data_version': data_version(config, today)})
+
+
+def metric_fingerprint(config: ExperimentConfig, metric_name: str, today: Optional[date] = None) -> str:
+    """
+    Fingerprint of one metric of an experiment.
+    
+    Only the settings that change the metric's statistics are included, so
+    presentation changes do not trigger a recompute.
+    
+    Args:
+        config: Experiment configuration
+        metric_name: Name of the metric
+        today: Reference date (defaults to today)
+    
+    Returns:
+        Hex string
+    """
+    settings = config.to_dict()
+    return _fingerprint({
+        'settings': {name: settings[name] for name in METRIC_FINGERPRINT_FIELDS},
+        'granularity_in_days': config.granularity_in_days,
+        'metric': metric_name,
+        'test': list(METRIC_TESTS[metric_name]),
+        'data_version': data_version(config, today),
+    })
+
+
+def checkpoint_fingerprint(config: ExperimentConfig, metric_names: List[str], today: Optional[date] = None) -> str:
+    """
+    Fingerprint of the stage results of a full analysis, keying its checkpoints.
+    
+    Only the settings that change a stage's result are included, so an interrupted
+    run can be resumed with e.g. a longer timeout, while another metric list gives
+    another run (the shared sufficient statistics cover the requested metrics).
+    
+    Args:
+        config: Experiment configuration
+        metric_names: Metrics requested from the analysis
+        today: Reference date (defaults to today)
+    
+    Returns:
+        Hex string
+    """
+    settings = config.to_dict()
+    return _fingerprint({
+        'settings': {name: settings[name] for name in CHECKPOINT_FINGERPRINT_FIELDS},
+        'granularity_in_days': config.granularity_in_days,
+        'metrics': sorted(metric_names),
+        'data_version': data_version(config, today),
+    })
+
+
+@dataclass
+class RecomputePlan:
+    """Experiments and metrics whose stored results are missing or stale."""
+    
+    metrics: Dict[str, List[str]] = field(default_factory=dict)
+    reasons: Dict[str, str] = field(default_factory=dict)
+    config_fingerprints: Dict[str, str] = field(default_factory=dict)
+    metric_fingerprints: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    up_to_date: List[str] = field(default_factory=list)
+    
+    @property
+    def is_empty(self) -> bool:
+        """Whether nothing needs to be recomputed."""
+        return not self.metrics
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the plan to a dictionary."""
+        return {
+            'recompute': {name: {'metrics': metrics, 'reason': self.reasons[name]} for name, metrics in self.metrics.items()},
+            'up_to_date': self.up_to_date,
+        }
+    
+    def summary(self):
+        """Print the plan."""
+        print(f"🗂️  {len(self.metrics)} experiments to recompute, {len(self.up_to_date)} up to date")
+        for name, metrics in self.metrics.items():
+            print(f"  - {name}: {', '.join(metrics)} ({self.reasons[name]})")
+
+
+def plan_recompute(
+    configs: List[ExperimentConfig],
+    store: ResultsStore,
+    today: Optional[date] = None
+) -> RecomputePlan:
+    """
+    Diff the manifest fingerprints against the results store.
+    
+    Args:
+        configs: Experiment configurations
+        store: Results of previous runs
+        today: Reference date (defaults to today)
+    
+    Returns:
+        RecomputePlan object
+    """
+    plan = RecomputePlan()
+    for config in configs:
+        name = config.experiment_name
+        metric_names = [metric_name for metric_name in config.metrics_list if metric_name in METRIC_TESTS]
+        fingerprints = {metric_name: metric_fingerprint(config, metric_name, today) for metric_name in metric_names}
+        plan.config_fingerprints[name] = config_fingerprint(config, today)
+        plan.metric_fingerprints[name] = fingerprints
+        
+        stored = store.fingerprints(name)
+        stale = [metric_name for metric_name in metric_names if stored.get('metrics', {}).get(metric_name) != fingerprints[metric_name]]
+        if not stale:
+            plan.up_to_date.append(name)
+            continue
+        
+        plan.metrics[name] = stale
+        if not stored:
+            plan.reasons[name] = 'new experiment'
+        elif len(stale) < len(metric_names):
+            plan.reasons[name] = 'new or changed metrics'
+        elif stored.get('config') != plan.config_fingerprints[name]:
+            plan.reasons[name] = 'config or data changed'
+        else:
+            plan.reasons[name] = 'metric definitions changed'
+    return plan
+
+
+def run_plan(
+    plan: RecomputePlan,
+    configs: List[ExperimentConfig],
+    store: ResultsStore,
+    warehouse: Optional[Warehouse] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Recompute the planned experiments and metrics in one batch and store the results.
+    
+    Args:
+        plan: Output of ``plan_recompute``
+        configs: Experiment configurations
+        store: Results store to update
+        warehouse: Warehouse client (defaults to the one configured for the first planned experiment)
+    
+    Returns:
+        Dict mapping experiment name to its full sufficient statistics (stored and recomputed)
+    """
+    from .batch import get_batch_sufficient_stats
+    
+    planned = [config for config in configs if config.experiment_name in plan.metrics]
+    if planned:
+        metric_names = list(dict.fromkeys(name for config in planned for name in plan.metrics[config.experiment_name]))
+        stats_by_experiment = get_batch_sufficient_stats(planned, metric_names, warehouse)
+        for config in planned:
+            name = config.experiment_name
+            store.save(
+                name,
+                plan.config_fingerprints[name],
+                {metric_name: plan.metric_fingerprints[name][metric_name] for metric_name in plan.metrics[name]},
+                stats_by_experiment[name]
+            )
+    
+    return {config.experiment_name: store.load(config.experiment_name, config.metrics_list) for config in configs}
@@ -6,7 +6,9 @@ from collections import namedtuple
 from typing import List, Dict, Any
 # Note: These classes come from bsp_data_analysis.helpers which should be imported in Hex notebook
 # CustomFirstSuccessRateMetric, CustomValuedMetric, CustomCountMetric
+from ..utils.bsp_helpers import find_helper
 from ..utils.data_queries import DataQueries
+from ..utils.tracing import traced
 
 Metric = namedtuple('Metric', ['name', 'metric'])
 
@@ -28,14 +30,10 @@ class MetricDefinitions:
     
     def _get_bsp_class(self, class_name: str):
         """Get bsp_data_analysis class from global namespace."""
-        import sys
-        frame = sys._getframe(2)  # Go up 2 levels to get to the caller
-        while frame:
-            if class_name in frame.f_globals:
-                return frame.f_globals[class_name]
-            frame = frame.f_back
-        else:
-            raise NameError(f"{class_name} not found in global namespace. Make sure to import it in your Hex notebook with: from bsp_data_analysis.helpers import *")
+        bsp_class = find_helper(class_name)
+        if bsp_class is not None:
+            return bsp_class
+        raise NameError(f"{class_name} not found in global namespace. Make sure to import it in your Hex notebook with: from bsp_data_analysis.helpers import *")
     
     def get_conversion_to_subscription(self) -> Metric:
         """Get conversion to subscription metric - matches original notebook."""
@@ -150,6 +148,7 @@ class MetricDefinitions:
             )]
         )
     
+    @traced('metric')
     def get_metric_by_name(self, metric_name: str) -> Metric:
         """
         Get a metric by its name.
@@ -180,6 +179,37 @@ class MetricDefinitions:
         
         return metric_map[metric_name]()
     
+    @traced('metric')
+    def get_target_query(self, metric_name: str) -> Any:
+        """
+        Get the raw target query behind a metric.
+        
+        Args:
+            metric_name: Name of the metric
+            
+        Returns:
+            Query object or SQL string with uid, event_timestamp and optionally event_value
+            
+        Raises:
+            ValueError: If metric name is not recognized
+        """
+        target_map = {
+            'ConversionToSubscription': lambda: self._data_queries.get_conversions(self.start_date, self.end_date),
+            'ConversionToPaySubscription': lambda: self._data_queries.get_conversions(self.start_date, self.end_date, only_paid=True),
+            'SubscriptionArpu': lambda: self._data_queries.get_conversions(self.start_date, self.end_date, only_paid=False),
+            'SubscriptionArps': lambda: self._data_queries.get_conversions(self.start_date, self.end_date, only_paid=True),
+            'Retention': lambda: self._data_queries.get_sessions(self.start_date, self.end_date),
+            'AutoRenewOff': lambda: self._data_queries.get_aro(self.start_date, self.end_date),
+            'QualifiedActivityDaily': lambda: self._data_queries.get_activity_rate_qualified(self.start_date, self.end_date),
+            'Sessions': lambda: self._data_queries.get_sessions(self.start_date, self.end_date),
+            'HoursTracked': lambda: self._data_queries.get_time_entries(self.start_date, self.end_date),
+        }
+        
+        if metric_name not in target_map:
+            raise ValueError(f"Unknown metric: {metric_name}. Available metrics: {list(target_map.keys())}")
+        
+        return target_map[metric_name]()
+    
     def get_metrics_list(self, metric_names: List[str]) -> List[Metric]:
         """
         Get a list of metrics by their names.
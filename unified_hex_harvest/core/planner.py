@@ -0,0 +1,242 @@
+"""
+Stage graph of an analysis run and its scheduler.
+
+Each stage declares the stages whose results it takes as inputs. The plan is
+scheduled topologically: a stage runs once all of its inputs are available,
+each result is computed once and handed to every stage that depends on it,
+and independent branches (e.g. the reach query and each metric) run
+concurrently in worker threads, each in a copy of the calling thread's
+context. Stages marked ``main_thread`` (rendering) run on the calling
+thread, in plan order, so charts keep their order.
+"""
+
+import contextvars
+import json
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from ..utils.cancellation import CancellationToken
+
+
+@dataclass
+class Stage:
+    """A node of the plan."""
+    
+    name: str
+    function: Callable[[Dict[str, Any]], Any]
+    inputs: List[str] = field(default_factory=list)
+    main_thread: bool = False
+    description: str = ''
+
+
+class StagePlan:
+    """Directed acyclic graph of stages, run in topological order with parallel branches."""
+    
+    def __init__(self, name: Optional[str] = None):
+        """
+        Initialize an empty plan.
+        
+        Args:
+            name: Name of the plan (e.g. the experiment name)
+        """
+        self.name = name
+        self.stages: Dict[str, Stage] = {}
+    
+    def add(
+        self,
+        name: str,
+        function: Callable[[Dict[str, Any]], Any],
+        inputs: Optional[List[str]] = None,
+        main_thread: bool = False,
+        description: str = ''
+    ) -> Stage:
+        """
+        Add a stage.
+        
+        Args:
+            name: Unique stage name
+            function: Function taking a dict of the input stages' results
+            inputs: Names of the stages whose results the stage needs
+            main_thread: Whether the stage must run on the calling thread (e.g. rendering)
+            description: What the stage does, for the printed plan
+        
+        Returns:
+            Stage object
+        """
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        stage = Stage(name, function, list(inputs or []), main_thread, description)
+        self.stages[name] = stage
+        return stage
+    
+    def order(self) -> List[str]:
+        """
+        Topological order of the stages, keeping the order they were added in among ready stages.
+        
+        Raises:
+            ValueError: If a stage has an unknown input or the stages form a cycle
+        """
+        for stage in self.stages.values():
+            unknown = [name for name in stage.inputs if name not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} has unknown inputs: {unknown}")
+        
+        order: List[str] = []
+        done = set()
+        while len(order) < len(self.stages):
+            ready = [
+                stage.name for stage in self.stages.values()
+                if stage.name not in done and all(name in done for name in stage.inputs)
+            ]
+            if not ready:
+                cycle = [name for name in self.stages if name not in done]
+                raise ValueError(f"Stages form a cycle: {cycle}")
+            order.append(ready[0])
+            done.add(ready[0])
+        return order
+    
+    def levels(self) -> Dict[str, int]:
+        """Depth of each stage: 0 without inputs, else one more than its deepest input."""
+        levels: Dict[str, int] = {}
+        for name in self.order():
+            inputs = self.stages[name].inputs
+            levels[name] = 1 + max(levels[input_name] for input_name in inputs) if inputs else 0
+        return levels
+    
+    def to_frame(self) -> pd.DataFrame:
+        """One row per stage, in topological order, with its level, inputs and thread."""
+        levels = self.levels()
+        return pd.DataFrame(
+            [
+                {
+                    'stage': name,
+                    'level': levels[name],
+                    'inputs': ', '.join(self.stages[name].inputs),
+                    'thread': 'main' if self.stages[name].main_thread else 'worker',
+                    'description': self.stages[name].description,
+                }
+                for name in self.order()
+            ],
+            columns=['stage', 'level', 'inputs', 'thread', 'description']
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Plan as a JSON-serializable dict."""
+        levels = self.levels()
+        return {
+            'name': self.name,
+            'stages': [
+                {
+                    'name': name,
+                    'level': levels[name],
+                    'inputs': self.stages[name].inputs,
+                    'main_thread': self.stages[name].main_thread,
+                    'description': self.stages[name].description,
+                }
+                for name in self.order()
+            ],
+        }
+    
+    def to_json(self, path: Optional[str] = None) -> str:
+        """
+        Serialize the plan to JSON.
+        
+        Args:
+            path: Optional file to write the JSON to
+        
+        Returns:
+            JSON string
+        """
+        data = json.dumps(self.to_dict(), indent=2)
+        if path:
+            with open(path, 'w') as f:
+                f.write(data)
+        return data
+    
+    def to_dot(self) -> str:
+        """Plan as a Graphviz DOT graph (render with ``dot -Tpng``)."""
+        lines = [f'digraph "{self.name or "plan"}" {{', '  rankdir=LR;']
+        for name in self.order():
+            shape = 'note' if self.stages[name].main_thread else 'box'
+            lines.append(f'  "{name}" [shape={shape}];')
+            lines.extend(f'  "{input_name}" -> "{name}";' for input_name in self.stages[name].inputs)
+        lines.append('}')
+        return '\n'.join(lines)
+    
+    def summary(self):
+        """Print the plan."""
+        levels = self.levels()
+        print(f"🗺️  {len(self.stages)} stages in {max(levels.values(), default=-1) + 1} levels")
+        for name in self.order():
+            stage = self.stages[name]
+            inputs = f" ← {', '.join(stage.inputs)}" if stage.inputs else ''
+            thread = ' (main thread)' if stage.main_thread else ''
+            print(f"  {levels[name]}  {name}{inputs}{thread}")
+    
+    def run(self, max_workers: int = 1, cancellation: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """
+        Run every stage once its inputs are available.
+        
+        With one worker, stages run one after the other on the calling thread, in
+        ``order()``. With more, ready worker stages run concurrently, each in a copy of
+        the calling thread's context, while the calling thread runs the main-thread
+        stages in plan order. If a stage fails, no new stage
+        is started, ``cancellation`` is cancelled to stop the running ones, and the
+        error is raised.
+        
+        Args:
+            max_workers: Maximum number of stages running at the same time in worker threads
+            cancellation: Token cancelled when a stage fails, to stop the other running stages
+        
+        Returns:
+            Dict of the result of every stage
+        """
+        order = self.order()
+        results: Dict[str, Any] = {}
+        
+        def inputs_of(name: str) -> Dict[str, Any]:
+            return {input_name: results[input_name] for input_name in self.stages[name].inputs}
+        
+        if max_workers <= 1:
+            for name in order:
+                results[name] = self.stages[name].function(inputs_of(name))
+            return results
+        
+        main_queue = [name for name in order if self.stages[name].main_thread]
+        started = set()
+        running: Dict[Future, str] = {}
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stage') as executor:
+            try:
+                while len(results) < len(self.stages):
+                    for name in order:
+                        stage = self.stages[name]
+                        if (name not in started and not stage.main_thread and len(running) < max_workers
+                                and all(input_name in results for input_name in stage.inputs)):
+                            started.add(name)
+                            # Worker stages see the context variables of the caller (e.g. the resolved bsp helpers)
+                            context = contextvars.copy_context()
+                            running[executor.submit(context.run, stage.function, inputs_of(name))] = name
+                    
+                    if main_queue and all(input_name in results for input_name in self.stages[main_queue[0]].inputs):
+                        name = main_queue.pop(0)
+                        started.add(name)
+                        results[name] = self.stages[name].function(inputs_of(name))
+                    elif running:
+                        finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            results[running.pop(future)] = future.result()
+                    else:
+                        break
+                    
+                    # Collect the stages finished meanwhile, so their dependents can start
+                    for future in [future for future in running if future.done()]:
+                        results[running.pop(future)] = future.result()
+            except BaseException as e:
+                if cancellation is not None:
+                    cancellation.cancel(f'stage failed: {type(e).__name__}: {e}')
+                raise
+        return results
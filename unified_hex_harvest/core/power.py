@@ -0,0 +1,217 @@
+"""
+Power analysis and sample-size planning for experiments before launch.
+
+Baselines (rate or mean, per-user variance and daily exposure) come from a
+single-bin sufficient statistics query on a reference experiment, or from a
+cached statistics frame. The whole grid of MDE x arm count x allocation x
+duration is then evaluated in one NumPy broadcast.
+"""
+
+from datetime import datetime
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from .config import ExperimentConfig
+from .metrics import MetricDefinitions
+from .significance import METRIC_TESTS, STAT_COLUMNS, COVARIATE_COLUMNS, SufficientStats, arm_moments
+from ..utils.data_queries import DataQueries
+from ..utils.warehouse import Warehouse
+
+
+class PowerPlanner:
+    """Plan the runtime of an experiment from historical baselines."""
+    
+    def __init__(self, config: ExperimentConfig):
+        """
+        Initialize the power planner.
+        
+        Args:
+            config: Draft experiment configuration
+        """
+        self.config = config
+        self.data_queries = DataQueries()
+        self.warehouse = Warehouse.from_config(config)
+    
+    def get_baselines(
+        self,
+        reference_experiment: str,
+        start_date: str,
+        end_date: str,
+        stats_df: Optional[pd.DataFrame] = None
+    ) -> pd.DataFrame:
+        """
+        Get baseline estimates, per-user variances and daily exposure for the draft's metrics.
+        
+        All segments of the reference experiment are pooled into a single arm. When
+        ``stats_df`` is given (e.g. from ``ExperimentAnalyzer.get_sufficient_stats``),
+        its last cumulative bin is used and no query is run.
+        
+        Args:
+            reference_experiment: Past experiment whose users represent the target population
+            start_date: Start date of the reference window
+            end_date: End date of the reference window
+            stats_df: Optional cached sufficient statistics for the reference window
+        
+        Returns:
+            DataFrame with metric, kind, baseline, unit_variance and daily_users
+        """
+        days = (datetime.strptime(end_date, '%Y-%m-%d') - datetime.strptime(start_date, '%Y-%m-%d')).days + 1
+        metric_names = [name for name in self.config.metrics_list if name in METRIC_TESTS]
+        
+        if stats_df is None:
+            user_base = self.data_queries.get_experiment_user_base(
+                experiment_name=reference_experiment,
+                start_date=start_date,
+                end_date=end_date
+            )
+            metrics = MetricDefinitions(start_date, end_date)
+            # One bin covering the whole window keeps the query cheap
+            stats_queries = [
+                self.data_queries.get_sufficient_stats(
+                    metric_name=metric_name,
+                    user_base=user_base,
+                    target_query=metrics.get_target_query(metric_name),
+                    start_date=start_date,
+                    end_date=end_date,
+                    granularity_in_days=days,
+                    value=METRIC_TESTS[metric_name].value,
+                    covariate=self.config.cuped_covariate if self.config.cuped else None,
+                    covariate_lookback_days=self.config.cuped_lookback_days
+                )
+                for metric_name in metric_names
+            ]
+            
+            stats_df = self.warehouse.read_gbq(
+                self.data_queries.union_all(stats_queries),
+                {'experiment': reference_experiment, 'metric': ','.join(metric_names), 'stage': 'power'}
+            )
+        
+        stats_df = stats_df[stats_df['metric'].isin(metric_names)]
+        last_bin = stats_df['time_bin'] == stats_df.groupby('metric')['time_bin'].transform('max')
+        # CUPED-adjusted variances are used when the stats carry a covariate
+        columns = STAT_COLUMNS + [column for column in COVARIATE_COLUMNS if self.config.cuped and column in stats_df.columns]
+        pooled = stats_df[last_bin].groupby('metric', sort=False)[columns].sum()
+        
+        pooled_stats = SufficientStats(
+            list(pooled.index), ['all'], [0],
+            {column: pooled[column].to_numpy(dtype=float)[:, None, None] for column in columns}
+        )
+        estimate, variance = arm_moments(pooled_stats, pooled_stats.kinds())
+        n = pooled_stats.n
+        
+        return pd.DataFrame({
+            'metric': pooled_stats.metrics,
+            'kind': pooled_stats.kinds().ravel(),
+            'baseline': estimate.ravel(),
+            'unit_variance': (variance * n).ravel(),
+            'daily_users': (n / days).ravel(),
+        })
+    
+    def _grid(
+        self,
+        baselines: pd.DataFrame,
+        mde: Sequence[float],
+        n_arms: Optional[Sequence[int]],
+        control_share: Optional[Sequence[float]]
+    ):
+        """Broadcast inputs to (metric, mde, arms, control_share, duration) arrays."""
+        n_arms = np.asarray(n_arms if n_arms is not None else [len(self.config.experiment_segments)], dtype=float)
+        if np.any(n_arms < 2):
+            raise ValueError(f"Arm counts must include control and at least one treatment, got: {list(n_arms)}")
+        
+        baseline = baselines['baseline'].to_numpy(dtype=float)[:, None, None, None, None]
+        unit_variance = baselines['unit_variance'].to_numpy(dtype=float)[:, None, None, None, None]
+        daily_users = baselines['daily_users'].to_numpy(dtype=float)[:, None, None, None, None]
+        mde = np.asarray(mde, dtype=float)[None, :, None, None, None]
+        arms = n_arms[None, None, :, None, None]
+        if control_share is None:
+            # Equal allocation across arms
+            share_c = 1 / arms
+        else:
+            share_c = np.asarray(control_share, dtype=float)[None, None, None, :, None]
+        share_t = (1 - share_c) / (arms - 1)
+        
+        # Bonferroni correction across treatment-vs-control comparisons
+        z_alpha = stats.norm.ppf(1 - self.config.significance_level / (2 * (arms - 1)))
+        delta = np.abs(mde * baseline)
+        return baseline, unit_variance, daily_users, mde, arms, share_c, share_t, z_alpha, delta
+    
+    def required_runtime(
+        self,
+        baselines: pd.DataFrame,
+        mde: Sequence[float] = (0.01, 0.02, 0.05, 0.1),
+        n_arms: Optional[Sequence[int]] = None,
+        control_share: Optional[Sequence[float]] = None,
+        power: float = 0.8
+    ) -> pd.DataFrame:
+        """
+        Get the runtime needed to detect each relative MDE.
+        
+        Args:
+            baselines: Output of ``get_baselines``
+            mde: Relative minimum detectable effects
+            n_arms: Arm counts including control (defaults to the draft's segment count)
+            control_share: Shares of traffic allocated to control (defaults to equal allocation)
+            power: Target power
+        
+        Returns:
+            DataFrame with metric, mde, n_arms, control_share, required_users and required_days
+        """
+        baseline, unit_variance, daily_users, mde, arms, share_c, share_t, z_alpha, delta = self._grid(
+            baselines, mde, n_arms, control_share
+        )
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            required_users = (z_alpha + stats.norm.ppf(power)) ** 2 * unit_variance * (1 / share_t + 1 / share_c) / delta ** 2
+            required_days = np.ceil(required_users / daily_users)
+        
+        columns = np.broadcast_arrays(
+            np.asarray(baselines['metric'])[:, None, None, None, None], mde, arms, share_c,
+            required_users, required_days
+        )
+        names = ['metric', 'mde', 'n_arms', 'control_share', 'required_users', 'required_days']
+        df = pd.DataFrame({name: column[..., 0].ravel() for name, column in zip(names, columns)})
+        return df.astype({'mde': float, 'n_arms': int, 'control_share': float,
+                          'required_users': float, 'required_days': float})
+    
+    def power_grid(
+        self,
+        baselines: pd.DataFrame,
+        mde: Sequence[float] = (0.01, 0.02, 0.05, 0.1),
+        n_arms: Optional[Sequence[int]] = None,
+        control_share: Optional[Sequence[float]] = None,
+        durations: Sequence[int] = (7, 14, 21, 28, 42, 56)
+    ) -> pd.DataFrame:
+        """
+        Get the power of every metric for a grid of designs and durations.
+        
+        Args:
+            baselines: Output of ``get_baselines``
+            mde: Relative minimum detectable effects
+            n_arms: Arm counts including control (defaults to the draft's segment count)
+            control_share: Shares of traffic allocated to control (defaults to equal allocation)
+            durations: Experiment durations in days
+        
+        Returns:
+            DataFrame with metric, mde, n_arms, control_share, duration_days and power
+        """
+        baseline, unit_variance, daily_users, mde, arms, share_c, share_t, z_alpha, delta = self._grid(
+            baselines, mde, n_arms, control_share
+        )
+        durations = np.asarray(durations, dtype=float)[None, None, None, None, :]
+        
+        total_users = daily_users * durations
+        with np.errstate(divide='ignore', invalid='ignore'):
+            se = np.sqrt(unit_variance * (1 / (total_users * share_t) + 1 / (total_users * share_c)))
+            power = stats.norm.cdf(delta / se - z_alpha)
+        
+        columns = np.broadcast_arrays(
+            np.asarray(baselines['metric'])[:, None, None, None, None], mde, arms, share_c, durations, power
+        )
+        names = ['metric', 'mde', 'n_arms', 'control_share', 'duration_days', 'power']
+        df = pd.DataFrame({name: column.ravel() for name, column in zip(names, columns)})
+        return df.astype({'mde': float, 'n_arms': int, 'control_share': float,
+                          'duration_days': int, 'power': float})
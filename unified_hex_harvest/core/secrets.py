@@ -2,9 +2,13 @@
 Secrets management for Hex integration.
 """
 
+import atexit
 import os
+import tempfile
 from typing import Optional
 
+from ..utils.credentials import set_credentials
+
 
 class HexSecrets:
     """Handle secrets from Hex environment."""
@@ -45,10 +49,14 @@ class HexSecrets:
         return os.environ.get('ARTIFACTORY_URL', '')
     
     @staticmethod
-    def setup_credentials():
+    def setup_credentials(application_default: bool = False):
         """
         Setup credentials for BigQuery access.
         This should be called at the beginning of each Hex notebook.
+        
+        Args:
+            application_default: Also expose the credentials to clients the library
+                does not create, through ``GOOGLE_APPLICATION_CREDENTIALS``
         """
         harvest_credentials = HexSecrets.get_harvest_credentials()
         
@@ -58,12 +66,10 @@ class HexSecrets:
                 "Please add it to your Hex project secrets."
             )
         
-        # Write credentials to temporary file for BigQuery
-        with open('credentials.json', 'w') as f:
-            f.write(harvest_credentials)
-        
-        # Set environment variable for BigQuery
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = 'credentials.json'
+        # Credentials are kept in memory and shared by the library's warehouse clients
+        set_credentials(harvest_credentials)
+        if application_default:
+            _export_application_default(harvest_credentials)
         
         print("✅ Credentials setup complete")
 
@@ -72,8 +78,14 @@ class LocalSecrets:
     """Handle secrets for local development (when not in Hex)."""
     
     @classmethod
-    def setup_credentials(cls):
-        """Setup credentials for local development."""
+    def setup_credentials(cls, application_default: bool = False):
+        """
+        Setup credentials for local development.
+        
+        Args:
+            application_default: Also expose the credentials to clients the library
+                does not create, through ``GOOGLE_APPLICATION_CREDENTIALS``
+        """
         try:
             # Try to import from local_secrets_actual.py
             from local_secrets_actual import HARVEST_CREDENTIALS
@@ -91,21 +103,41 @@ class LocalSecrets:
                 "Please add your actual credentials."
             )
         
-        with open('credentials.json', 'w') as f:
-            f.write(HARVEST_CREDENTIALS)
-        
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = 'credentials.json'
+        set_credentials(HARVEST_CREDENTIALS)
+        if application_default:
+            _export_application_default(HARVEST_CREDENTIALS)
         print("✅ Local credentials setup complete")
 
 
-def setup_credentials(use_hex_secrets: bool = True):
+def _export_application_default(credentials_json: str):
+    """
+    Write the key to a private temporary file for ``GOOGLE_APPLICATION_CREDENTIALS``.
+    
+    The file is readable by the current user only, lives outside the working
+    directory and is removed when the process exits.
+    """
+    fd, path = tempfile.mkstemp(prefix='harvest_credentials_', suffix='.json')
+    with os.fdopen(fd, 'w') as f:
+        f.write(credentials_json)
+    atexit.register(lambda: os.path.exists(path) and os.remove(path))
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = path
+
+
+def setup_credentials(use_hex_secrets: bool = True, application_default: bool = False):
     """
     Setup credentials based on environment.
     
+    The credentials are held in memory and used by the library's shared warehouse
+    client and by ``pandas_gbq``; no ``credentials.json`` is written.
+    
     Args:
         use_hex_secrets: Whether to use Hex secrets (True) or local secrets (False)
+        application_default: Also expose the credentials to other clients (the bsp
+            helpers' ``UserBaseBigQuery`` and ``request_multiple_metrics``, or a
+            ``bigquery.Client()`` created in the notebook) through
+            ``GOOGLE_APPLICATION_CREDENTIALS``, pointing at a private temporary file
     """
     if use_hex_secrets:
-        HexSecrets.setup_credentials()
+        HexSecrets.setup_credentials(application_default)
     else:
-        LocalSecrets.setup_credentials()
+        LocalSecrets.setup_credentials(application_default)
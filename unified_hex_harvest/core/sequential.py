@@ -0,0 +1,217 @@
+"""
+Always-valid sequential testing for experiments that are checked every day.
+
+Implements the mixture sequential probability ratio test (mSPRT) with a normal
+mixing distribution. The running p-value and confidence interval remain valid
+no matter how often the results are looked at. State is persisted locally per
+experiment, so each daily refresh only has to ingest the new days of each
+metric. A state whose segments, control or significance level differ from the
+requested ones is discarded, since its running results do not apply.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .significance import SufficientStats, arm_moments
+
+HISTORY_COLUMNS = ['metric', 'segment_name', 'time_bin', 'estimate', 'control_estimate',
+                   'diff', 'p_value', 'ci_low', 'ci_high', 'significant']
+
+
+class SequentialTest:
+    """mSPRT state for one experiment, updated incrementally per time bin."""
+    
+    def __init__(
+        self,
+        experiment_name: str,
+        segments: List[str],
+        control_segment: Optional[str] = None,
+        alpha: float = 0.05,
+        tau: float = 0.1,
+        state_dir: str = '.sequential_state'
+    ):
+        """
+        Initialize an empty sequential test.
+        
+        Args:
+            experiment_name: Name of the experiment
+            segments: Segment names, in the order used for the stat arrays
+            control_segment: Control segment (defaults to the first segment)
+            alpha: Significance level
+            tau: Mixing scale as a fraction of the control estimate (expected relative effect)
+            state_dir: Directory where the state file is stored
+        """
+        self.experiment_name = experiment_name
+        self.segments = list(segments)
+        self.control_segment = control_segment or self.segments[0]
+        self.alpha = alpha
+        self.tau = tau
+        self.state_dir = state_dir
+        
+        # Last ingested time bin per metric, so a metric added later starts from the first bin
+        self.last_time_bins: Dict[str, int] = {}
+        # Mixing variance per metric, fixed once chosen so the test stays valid
+        self.tau2 = {}
+        # Running p-value and confidence interval per "metric|segment"
+        self.running = {}
+        self.history = []
+    
+    @property
+    def path(self) -> str:
+        """Location of the persisted state file."""
+        return os.path.join(self.state_dir, f'{self.experiment_name}.json')
+    
+    def last_time_bin(self, metric_name: str) -> int:
+        """Last time bin ingested for a metric (-1 if none)."""
+        return self.last_time_bins.get(metric_name, -1)
+    
+    @classmethod
+    def load(cls, experiment_name: str, segments: List[str], **kwargs) -> 'SequentialTest':
+        """
+        Load the persisted state for an experiment, or start a new one.
+        
+        The persisted state is discarded when it was built for other segments, another
+        control segment or another significance level.
+        
+        Args:
+            experiment_name: Name of the experiment
+            segments: Segment names
+            **kwargs: Options forwarded to the constructor
+        
+        Returns:
+            SequentialTest object
+        """
+        test = cls(experiment_name, segments, **kwargs)
+        if os.path.exists(test.path):
+            with open(test.path) as f:
+                state = json.load(f)
+            settings = {'segments': test.segments, 'control_segment': test.control_segment, 'alpha': test.alpha}
+            changed = [name for name, value in settings.items() if state.get(name, value) != value]
+            if changed:
+                print(f"⚠️  Sequential test state of {experiment_name} was built with another {', '.join(changed)}: starting over")
+                return test
+            if isinstance(state['last_time_bin'], int):
+                # State written before bins were tracked per metric: every metric reached the same bin
+                metrics = {key.split('|')[0] for key in state['running']}
+                state['last_time_bin'] = {metric: state['last_time_bin'] for metric in metrics}
+            test.last_time_bins = state['last_time_bin']
+            test.tau2 = state['tau2']
+            test.running = state['running']
+            test.history = state['history']
+        return test
+    
+    def save(self):
+        """Persist the state atomically."""
+        os.makedirs(self.state_dir, exist_ok=True)
+        state = {
+            'experiment_name': self.experiment_name,
+            'segments': self.segments,
+            'control_segment': self.control_segment,
+            'alpha': self.alpha,
+            'tau': self.tau,
+            'last_time_bin': self.last_time_bins,
+            'tau2': self.tau2,
+            'running': self.running,
+            'history': self.history,
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+    
+    def update(self, stats: SufficientStats) -> pd.DataFrame:
+        """
+        Ingest the cumulative statistics of new time bins.
+        
+        Bins that were already ingested for a metric are ignored, so the cost of an
+        update only depends on the number of new bins, not on the length of the
+        experiment, and a metric added later is ingested from its first bin.
+        
+        Args:
+            stats: Cumulative sufficient statistics for the new time bins
+        
+        Returns:
+            DataFrame with the new history rows
+        """
+        # Bins not yet ingested, per metric
+        new = np.array([[time_bin > self.last_time_bin(metric) for time_bin in stats.time_bins]
+                        for metric in stats.metrics], dtype=bool).reshape(len(stats.metrics), len(stats.time_bins))
+        new_bins = [i for i in range(len(stats.time_bins)) if new[:, i].any()]
+        if not new_bins:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        
+        control = stats.segments.index(self.control_segment)
+        estimate, variance = arm_moments(stats, stats.kinds())
+        estimate, variance = estimate[..., new_bins], variance[..., new_bins]
+        time_bins = [stats.time_bins[i] for i in new_bins]
+        new = new[:, None, new_bins]
+        
+        est_c, var_c = estimate[:, control:control + 1], variance[:, control:control + 1]
+        diff = estimate - est_c
+        v = variance + var_c
+        
+        # Fix the mixing variance per metric the first time the control has data
+        for m, metric in enumerate(stats.metrics):
+            if metric not in self.tau2:
+                finite = est_c[m, 0][new[m, 0] & np.isfinite(est_c[m, 0]) & (est_c[m, 0] > 0)]
+                if finite.size:
+                    self.tau2[metric] = float((self.tau * finite[0]) ** 2)
+        tau2 = np.array([self.tau2.get(metric, np.nan) for metric in stats.metrics])[:, None, None]
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_lambda = 0.5 * np.log(v / (v + tau2)) + tau2 * diff ** 2 / (2 * v * (v + tau2))
+            half_width = np.sqrt(2 * v * (v + tau2) / tau2 * (np.log(1 / self.alpha) + 0.5 * np.log((v + tau2) / v)))
+        
+        # Bins already ingested for a metric leave its running results unchanged
+        valid = np.isfinite(log_lambda) & np.isfinite(half_width) & (v > 0) & new
+        p_value = np.where(valid, np.minimum(1.0, np.exp(-np.where(valid, log_lambda, 0))), 1.0)
+        ci_low = np.where(valid, diff - half_width, -np.inf)
+        ci_high = np.where(valid, diff + half_width, np.inf)
+        
+        # Prepend the running state so the accumulations continue where they left off
+        previous = np.array([
+            [self.running.get(f'{metric}|{segment}', [1.0, -np.inf, np.inf]) for segment in stats.segments]
+            for metric in stats.metrics
+        ], dtype=float)
+        p_value = np.minimum.accumulate(np.concatenate([previous[..., 0:1], p_value], axis=-1), axis=-1)[..., 1:]
+        ci_low = np.maximum.accumulate(np.concatenate([previous[..., 1:2], ci_low], axis=-1), axis=-1)[..., 1:]
+        ci_high = np.minimum.accumulate(np.concatenate([previous[..., 2:3], ci_high], axis=-1), axis=-1)[..., 1:]
+        
+        rows = []
+        for m, metric in enumerate(stats.metrics):
+            if not new[m].any():
+                continue
+            self.last_time_bins[metric] = int(max(np.asarray(time_bins)[new[m, 0]]))
+            for a, segment in enumerate(stats.segments):
+                if a == control:
+                    continue
+                self.running[f'{metric}|{segment}'] = [float(p_value[m, a, -1]), float(ci_low[m, a, -1]),
+                                                       float(ci_high[m, a, -1])]
+                for b, time_bin in enumerate(time_bins):
+                    if not new[m, 0, b]:
+                        continue
+                    rows.append([metric, segment, int(time_bin), float(estimate[m, a, b]), float(est_c[m, 0, b]),
+                                 float(diff[m, a, b]), float(p_value[m, a, b]), float(ci_low[m, a, b]),
+                                 float(ci_high[m, a, b]), bool(p_value[m, a, b] < self.alpha)])
+        
+        self.history.extend(rows)
+        return pd.DataFrame(rows, columns=HISTORY_COLUMNS)
+    
+    def history_frame(self, metric_name: Optional[str] = None) -> pd.DataFrame:
+        """
+        Get the full history of running p-values and confidence intervals.
+        
+        Args:
+            metric_name: Optional metric to filter on
+        
+        Returns:
+            DataFrame with one row per metric, treatment segment and time bin
+        """
+        df = pd.DataFrame(self.history, columns=HISTORY_COLUMNS)
+        if metric_name is not None:
+            df = df[df['metric'] == metric_name].reset_index(drop=True)
+        return df
@@ -0,0 +1,247 @@
+"""
+Statistical significance testing for experiment metrics.
+
+All tests are computed from per-bin sufficient statistics (user counts, sums,
+sums of squares and cross-products), so every metric, arm and cumulative time
+bin is evaluated in a single NumPy broadcast instead of per-cell loops.
+"""
+
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+PROPORTION = 'proportion'
+MEAN = 'mean'
+RATIO = 'ratio'
+
+# Test family and per-user value aggregation for each metric
+MetricTest = namedtuple('MetricTest', ['kind', 'value'])
+
+METRIC_TESTS = {
+    'ConversionToSubscription': MetricTest(PROPORTION, 'indicator'),
+    'ConversionToPaySubscription': MetricTest(PROPORTION, 'indicator'),
+    'AutoRenewOff': MetricTest(PROPORTION, 'indicator'),
+    'SubscriptionArpu': MetricTest(MEAN, 'sum'),
+    'SubscriptionArps': MetricTest(RATIO, 'sum'),
+    'Retention': MetricTest(MEAN, 'count'),
+    'QualifiedActivityDaily': MetricTest(MEAN, 'count'),
+    'Sessions': MetricTest(MEAN, 'count'),
+    'HoursTracked': MetricTest(MEAN, 'sum'),
+}
+
+STAT_COLUMNS = ['n', 'sum_x', 'sum_x2', 'sum_y', 'sum_y2', 'sum_xy']
+
+# Pre-exposure covariate sums used for CUPED
+COVARIATE_COLUMNS = ['sum_c', 'sum_c2', 'sum_xc']
+
+
+class SufficientStats:
+    """
+    Sufficient statistics arranged as (metric, segment, time_bin) arrays.
+    
+    For every user exposed before the end of a bin, ``x`` is the user's
+    cumulative metric value and ``y`` is 1 if the user has any target event
+    (the denominator of ratio metrics such as ARPS). When CUPED is enabled,
+    ``c`` is the user's pre-exposure covariate.
+    """
+    
+    def __init__(self, metrics: List[str], segments: List[str], time_bins: List,
+                 arrays: Dict[str, np.ndarray]):
+        self.metrics = list(metrics)
+        self.segments = list(segments)
+        self.time_bins = list(time_bins)
+        self.has_covariate = all(column in arrays for column in COVARIATE_COLUMNS)
+        for column in self.columns:
+            setattr(self, column, np.asarray(arrays[column], dtype=float))
+    
+    @property
+    def columns(self) -> List[str]:
+        """Stat columns held by this object."""
+        return STAT_COLUMNS + (COVARIATE_COLUMNS if self.has_covariate else [])
+    
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, segments: Optional[List[str]] = None) -> 'SufficientStats':
+        """
+        Build arrays from a long DataFrame as returned by ``DataQueries.get_sufficient_stats``.
+        
+        Args:
+            df: DataFrame with columns metric, segment_name, time_bin and STAT_COLUMNS
+            segments: Segment order to use (defaults to the order found in ``df``)
+        
+        Returns:
+            SufficientStats object
+        """
+        metrics = list(pd.unique(df['metric']))
+        segments = list(segments) if segments else list(pd.unique(df['segment_name']))
+        time_bins = sorted(pd.unique(df['time_bin']))
+        columns = STAT_COLUMNS + [column for column in COVARIATE_COLUMNS if column in df.columns]
+        
+        index = pd.MultiIndex.from_product([metrics, segments, time_bins],
+                                           names=['metric', 'segment_name', 'time_bin'])
+        shape = (len(metrics), len(segments), len(time_bins))
+        full = (
+            df.groupby(['metric', 'segment_name', 'time_bin'])[columns].sum()
+            .reindex(index, fill_value=0)
+        )
+        arrays = {column: full[column].to_numpy(dtype=float).reshape(shape) for column in columns}
+        return cls(metrics, segments, time_bins, arrays)
+    
+    def to_frame(self) -> pd.DataFrame:
+        """Convert the arrays back to a long DataFrame."""
+        index = pd.MultiIndex.from_product([self.metrics, self.segments, self.time_bins],
+                                           names=['metric', 'segment_name', 'time_bin'])
+        return pd.DataFrame(
+            {column: getattr(self, column).ravel() for column in self.columns},
+            index=index
+        ).reset_index()
+    
+    def kinds(self) -> np.ndarray:
+        """Test family of each metric, shaped for broadcasting against the stat arrays."""
+        return np.array([METRIC_TESTS[m].kind if m in METRIC_TESTS else MEAN for m in self.metrics])[:, None, None]
+
+
+def arm_moments(s: SufficientStats, kind: np.ndarray, adjust: bool = True):
+    """
+    Per-arm point estimate and the variance of that estimate.
+    
+    When the stats carry a pre-exposure covariate and ``adjust`` is set, proportion
+    and mean metrics are CUPED-adjusted with a coefficient pooled across arms.
+    """
+    n = s.n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_x = s.sum_x / n
+        mean_y = s.sum_y / n
+        var_x = (s.sum_x2 - n * mean_x ** 2) / (n - 1)
+        var_y = (s.sum_y2 - n * mean_y ** 2) / (n - 1)
+        cov_xy = (s.sum_xy - n * mean_x * mean_y) / (n - 1)
+        
+        # Proportions: binomial variance
+        var_prop = mean_x * (1 - mean_x) / n
+        # Means: sample variance of the per-user value
+        var_mean = var_x / n
+        # Ratios of means: delta method
+        ratio = s.sum_x / s.sum_y
+        var_ratio = (var_x - 2 * ratio * cov_xy + ratio ** 2 * var_y) / (n * mean_y ** 2)
+    
+    estimate = np.where(kind == RATIO, ratio, mean_x)
+    variance = np.select([kind == PROPORTION, kind == RATIO], [var_prop, var_ratio], default=var_mean)
+    
+    if s.has_covariate and adjust:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_c = s.sum_c / n
+            var_c = (s.sum_c2 - n * mean_c ** 2) / (n - 1)
+            cov_xc = (s.sum_xc - n * mean_x * mean_c) / (n - 1)
+            
+            # theta = cov(x, c) / var(c), pooled across arms for each metric and bin
+            total = {column: getattr(s, column).sum(axis=1, keepdims=True) for column in ['n', 'sum_x', 'sum_c', 'sum_c2', 'sum_xc']}
+            theta = (
+                (total['sum_xc'] - total['sum_x'] * total['sum_c'] / total['n'])
+                / (total['sum_c2'] - total['sum_c'] ** 2 / total['n'])
+            )
+            theta = np.where(np.isfinite(theta), theta, 0)
+            
+            adjusted_mean = mean_x - theta * (mean_c - total['sum_c'] / total['n'])
+            adjusted_variance = (var_x - 2 * theta * cov_xc + theta ** 2 * var_c) / n
+        
+        # Ratio metrics are left unadjusted
+        estimate = np.where(kind == RATIO, estimate, adjusted_mean)
+        variance = np.where(kind == RATIO, variance, adjusted_variance)
+    
+    return estimate, np.clip(variance, 0, None)
+
+
+def compare_to_control(
+    s: SufficientStats,
+    control_segment: Optional[str] = None,
+    alpha: float = 0.05
+) -> Dict[str, np.ndarray]:
+    """
+    Test every arm against the control arm for all metrics and time bins at once.
+    
+    Proportions use a pooled two-proportion z-test, means a Welch t-test and
+    ratio metrics a delta-method z-test. Confidence intervals are unpooled.
+    With a CUPED covariate, proportions and means are tested on the adjusted
+    estimates (unpooled z-test for proportions).
+    
+    Args:
+        s: Sufficient statistics
+        control_segment: Control segment name (defaults to the first segment)
+        alpha: Significance level
+    
+    Returns:
+        Dictionary of (metric, segment, time_bin) arrays
+    """
+    control = s.segments.index(control_segment) if control_segment else 0
+    kind = s.kinds()
+    estimate, variance = arm_moments(s, kind)
+    
+    c = slice(control, control + 1)
+    est_c, var_c, n_c = estimate[:, c], variance[:, c], s.n[:, c]
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diff = estimate - est_c
+        se = np.sqrt(variance + var_c)
+        
+        # Pooled standard error for the proportion z-test
+        p_pool = (s.sum_x + s.sum_x[:, c]) / (s.n + n_c)
+        se_pool = np.sqrt(p_pool * (1 - p_pool) * (1 / s.n + 1 / n_c))
+        stat = diff / np.where((kind == PROPORTION) & (not s.has_covariate), se_pool, se)
+        
+        # Welch-Satterthwaite degrees of freedom
+        dof = (variance + var_c) ** 2 / (variance ** 2 / (s.n - 1) + var_c ** 2 / (n_c - 1))
+        
+        relative = diff / est_c
+        se_relative = np.sqrt(variance / est_c ** 2 + estimate ** 2 * var_c / est_c ** 4)
+    
+    use_t = (kind == MEAN) & np.isfinite(dof)
+    p_value = np.where(use_t, 2 * stats.t.sf(np.abs(stat), np.where(use_t, dof, 1)), 2 * stats.norm.sf(np.abs(stat)))
+    critical = np.where(use_t, stats.t.ppf(1 - alpha / 2, np.where(use_t, dof, 1)), stats.norm.ppf(1 - alpha / 2))
+    
+    results = {
+        'n': s.n,
+        'estimate': estimate,
+        'control_estimate': np.broadcast_to(est_c, estimate.shape),
+        'diff': diff,
+        'ci_low': diff - critical * se,
+        'ci_high': diff + critical * se,
+        'relative_uplift': relative,
+        'relative_ci_low': relative - critical * se_relative,
+        'relative_ci_high': relative + critical * se_relative,
+        'statistic': stat,
+        'p_value': p_value,
+        'significant': p_value < alpha,
+    }
+    
+    if s.has_covariate:
+        _, raw_variance = arm_moments(s, kind, adjust=False)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            results['variance_reduction'] = 1 - variance / raw_variance
+    
+    return results
+
+
+def significance_table(
+    s: SufficientStats,
+    control_segment: Optional[str] = None,
+    alpha: float = 0.05
+) -> pd.DataFrame:
+    """
+    Run ``compare_to_control`` and return a long DataFrame without the control rows.
+    
+    Args:
+        s: Sufficient statistics
+        control_segment: Control segment name (defaults to the first segment)
+        alpha: Significance level
+    
+    Returns:
+        DataFrame with one row per metric, treatment segment and time bin
+    """
+    results = compare_to_control(s, control_segment, alpha)
+    index = pd.MultiIndex.from_product([s.metrics, s.segments, s.time_bins],
+                                       names=['metric', 'segment_name', 'time_bin'])
+    df = pd.DataFrame({key: np.asarray(value).ravel() for key, value in results.items()}, index=index).reset_index()
+    control = control_segment or s.segments[0]
+    return df[df['segment_name'] != control].reset_index(drop=True)
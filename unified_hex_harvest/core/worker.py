@@ -0,0 +1,79 @@
+"""
+Distributed full analyses: enqueue experiment configs and run them on worker processes.
+"""
+
+import os
+from datetime import datetime
+from typing import Any, Dict, List
+
+from .config import ExperimentConfig
+from .manifest import config_fingerprint
+from ..utils.work_queue import WorkQueue
+
+
+def enqueue_analyses(queue: WorkQueue, configs: List[ExperimentConfig], max_attempts: int = 3) -> int:
+    """
+    Enqueue a full analysis per experiment.
+    
+    Task ids include the config fingerprint, so enqueueing the same manifest twice
+    on a day adds nothing, while a changed config or new data adds a new task.
+    
+    Args:
+        queue: Work queue
+        configs: Experiment configurations
+        max_attempts: Attempts per task before it is marked failed
+    
+    Returns:
+        Number of tasks added
+    """
+    added = 0
+    for config in configs:
+        task_id = f'{config.experiment_name}:{config_fingerprint(config)}'
+        added += queue.put(task_id, config.to_dict(), max_attempts=max_attempts)
+    return added
+
+
+def analyze_config(payload: Dict[str, Any], output_dir: str = 'charts') -> Dict[str, Any]:
+    """
+    Run ``run_full_analysis`` for a queued config and save every chart it draws.
+    
+    Charts and the run report (``run_report.json``) are written atomically under
+    ``output_dir/<experiment_name>``, so a retried task overwrites the same files.
+    
+    Args:
+        payload: ``ExperimentConfig.to_dict()`` output
+        output_dir: Directory for the rendered charts
+    
+    Returns:
+        Dict with the experiment name, chart and report paths and completion time
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from .experiment_analyzer import ExperimentAnalyzer
+    
+    config = ExperimentConfig.from_dict(payload)
+    plt.close('all')
+    analyzer = ExperimentAnalyzer(config, execution_mode='batch')
+    analyzer.run_full_analysis()
+    
+    directory = os.path.join(output_dir, config.experiment_name)
+    os.makedirs(directory, exist_ok=True)
+    report_path = os.path.join(directory, 'run_report.json')
+    analyzer.report.to_json(report_path + '.tmp')
+    os.replace(report_path + '.tmp', report_path)
+    paths = []
+    for number in plt.get_fignums():
+        path = os.path.join(directory, f'figure_{number:02d}.png')
+        tmp_path = path + '.tmp'
+        plt.figure(number).savefig(tmp_path, format='png')
+        os.replace(tmp_path, path)
+        paths.append(path)
+    plt.close('all')
+    
+    return {
+        'experiment_name': config.experiment_name,
+        'charts': paths,
+        'run_report': report_path,
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+    }
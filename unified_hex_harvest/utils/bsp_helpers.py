@@ -0,0 +1,87 @@
+"""
+Lookup of the bsp_data_analysis and bsp_query_builder helpers.
+
+The library does not import the bsp packages: their classes and functions
+(``Query``, ``App``, ``request_multiple_metrics``...) are looked up in the
+globals of the calling frames, i.e. the notebook or the command line module.
+Stages running in worker threads have no such frames, so the helpers are
+resolved once on the calling thread with ``resolve_helpers`` and handed to the
+stages with ``using_helpers``, whose context is copied into each stage.
+"""
+
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+BSP_HELPERS = (
+    'Query',
+    'App',
+    'StartDate',
+    'EndDate',
+    'ActionsEndDate',
+    'GranularityInDays',
+    'UserBaseBigQuery',
+    'OnTableExistence',
+    'Label',
+    'request_multiple_metrics',
+    'CustomFirstSuccessRateMetric',
+    'CustomValuedMetric',
+    'CustomCountMetric',
+)
+
+_helpers: ContextVar = ContextVar('bsp_helpers', default=None)
+
+
+def resolve_helpers() -> Dict[str, Any]:
+    """
+    Get the bsp helpers visible from the caller.
+    
+    Returns:
+        Dict of each helper found, taken from the innermost frame defining it
+    """
+    helpers: Dict[str, Any] = {}
+    frame = sys._getframe(1)
+    while frame is not None:
+        for name in BSP_HELPERS:
+            if name not in helpers and name in frame.f_globals:
+                helpers[name] = frame.f_globals[name]
+        frame = frame.f_back
+    return helpers
+
+
+@contextmanager
+def using_helpers(helpers: Dict[str, Any]) -> Iterator[None]:
+    """
+    Make resolved helpers visible to ``find_helper`` inside the block, including
+    from threads running a copy of the context (``contextvars.copy_context()``).
+    
+    Args:
+        helpers: Output of ``resolve_helpers``
+    """
+    token = _helpers.set(helpers)
+    try:
+        yield
+    finally:
+        _helpers.reset(token)
+
+
+def find_helper(name: str) -> Optional[Any]:
+    """
+    Get a bsp helper: the resolved one in context, else from the caller's frames.
+    
+    Args:
+        name: Name of the helper (e.g. ``'Query'``)
+    
+    Returns:
+        Helper, or None if it is not found
+    """
+    helpers = _helpers.get()
+    if helpers is not None and name in helpers:
+        return helpers[name]
+    frame = sys._getframe(1)
+    while frame is not None:
+        if name in frame.f_globals:
+            return frame.f_globals[name]
+        frame = frame.f_back
+    return None
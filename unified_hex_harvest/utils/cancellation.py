@@ -0,0 +1,138 @@
+"""
+Cooperative cancellation and timeouts of warehouse work.
+
+Library calls check a ``CancellationToken`` before submitting work and while
+waiting for warehouse slots, jobs and retries. When the token is cancelled,
+or a deadline entered with ``deadline()`` passes, the waiting calls raise
+``Cancelled`` and cancel the jobs they have in flight, so nothing keeps
+running (and billing) after an interrupted or timed-out analysis.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+
+class Cancelled(Exception):
+    """Raised by library calls whose cancellation token was cancelled."""
+
+
+class DeadlineExceeded(Cancelled):
+    """Raised by library calls when a stage or run exceeds its timeout."""
+
+
+class CancellationToken:
+    """Cancellation flag and deadlines shared by the calls of an analysis."""
+    
+    def __init__(self, parent: Optional['CancellationToken'] = None):
+        """
+        Initialize the token.
+        
+        Args:
+            parent: Token whose cancellation and deadlines also apply to this one
+        """
+        self.parent = parent
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._deadlines: List[Tuple[float, str, float]] = []
+        self._lock = threading.Lock()
+    
+    def child(self) -> 'CancellationToken':
+        """Token that can be cancelled on its own and is also cancelled with this one."""
+        return CancellationToken(self)
+    
+    def cancel(self, reason: str = 'cancelled'):
+        """
+        Cancel the calls using this token (and its children).
+        
+        Args:
+            reason: Message of the ``Cancelled`` error raised by the calls
+        """
+        self.reason = reason
+        self._event.set()
+    
+    def reset(self):
+        """Clear a cancellation, so the token can be used again."""
+        self.reason = None
+        self._event.clear()
+    
+    @property
+    def cancelled(self) -> bool:
+        """Whether this token or one of its parents was cancelled."""
+        return self._event.is_set() or (self.parent is not None and self.parent.cancelled)
+    
+    @contextmanager
+    def deadline(self, seconds: Optional[float], name: str) -> Iterator[None]:
+        """
+        Make the calls inside the block raise ``DeadlineExceeded`` after a timeout.
+        
+        Args:
+            seconds: Timeout (None for no timeout)
+            name: What is timed, for the error message (e.g. a stage name)
+        """
+        if seconds is None:
+            yield
+            return
+        entry = (time.monotonic() + seconds, name, seconds)
+        with self._lock:
+            self._deadlines.append(entry)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._deadlines.remove(entry)
+    
+    def remaining(self) -> Optional[float]:
+        """Seconds until the nearest deadline of this token or its parents, if any."""
+        with self._lock:
+            expires = [expires_at for expires_at, _, _ in self._deadlines]
+        remaining = min(expires) - time.monotonic() if expires else None
+        if self.parent is not None:
+            parent_remaining = self.parent.remaining()
+            if parent_remaining is not None:
+                remaining = parent_remaining if remaining is None else min(remaining, parent_remaining)
+        return remaining
+    
+    def check(self):
+        """Raise ``Cancelled`` if the token was cancelled, or ``DeadlineExceeded`` if a deadline passed."""
+        token = self
+        while token is not None:
+            if token._event.is_set():
+                raise Cancelled(token.reason)
+            now = time.monotonic()
+            with token._lock:
+                expired = [(name, seconds) for expires_at, name, seconds in token._deadlines if expires_at <= now]
+            if expired:
+                name, seconds = expired[0]
+                raise DeadlineExceeded(f"{name} exceeded its timeout of {seconds:g}s")
+            token = token.parent
+    
+    def wait_time(self, interval: float) -> float:
+        """
+        Time to block before checking the token again.
+        
+        Args:
+            interval: Polling interval
+        
+        Returns:
+            The interval, shortened to the nearest deadline
+        """
+        remaining = self.remaining()
+        return interval if remaining is None else max(0.01, min(interval, remaining))
+    
+    def sleep(self, seconds: float, interval: float = 0.5):
+        """
+        Sleep, waking up to raise as soon as the token is cancelled or a deadline passes.
+        
+        Args:
+            seconds: Time to sleep
+            interval: Polling interval
+        """
+        end = time.monotonic() + seconds
+        while True:
+            self.check()
+            left = end - time.monotonic()
+            if left <= 0:
+                return
+            self._event.wait(self.wait_time(min(interval, left)))
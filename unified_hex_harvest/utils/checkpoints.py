@@ -0,0 +1,82 @@
+"""
+Stage checkpoints of a full analysis, so an interrupted run resumes where it stopped.
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+import uuid
+from typing import Any, List
+
+
+class CheckpointStore:
+    """Pickled stage results in a run directory keyed by experiment and config fingerprint."""
+    
+    def __init__(self, root: str, experiment_name: str, fingerprint: str):
+        """
+        Initialize the store.
+        
+        Args:
+            root: Checkpoint directory
+            experiment_name: Name of the experiment
+            fingerprint: Config fingerprint; a changed config or new data gets a new run directory
+        """
+        self.path = os.path.join(root, experiment_name, fingerprint)
+    
+    def _file(self, stage: str) -> str:
+        """Checkpoint file of a stage."""
+        return os.path.join(self.path, stage.replace(os.sep, '_').replace(':', '__') + '.pkl')
+    
+    def run_id(self) -> str:
+        """ID of the checkpointed run, created on first use and kept until the checkpoints are cleared."""
+        path = os.path.join(self.path, 'run_id')
+        if os.path.exists(path):
+            with open(path) as f:
+                return f.read().strip()
+        run_id = uuid.uuid4().hex[:12]
+        os.makedirs(self.path, exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(run_id)
+        return run_id
+    
+    def has(self, stage: str) -> bool:
+        """Whether a stage has a checkpoint."""
+        return os.path.exists(self._file(stage))
+    
+    def load(self, stage: str) -> Any:
+        """Result of a checkpointed stage."""
+        with open(self._file(stage), 'rb') as f:
+            return pickle.load(f)
+    
+    def save(self, stage: str, value: Any) -> bool:
+        """
+        Checkpoint the result of a stage.
+        
+        Results that cannot be pickled are not checkpointed; their stage runs again
+        on resume.
+        
+        Returns:
+            Whether the checkpoint was written
+        """
+        try:
+            data = pickle.dumps(value)
+        except Exception as e:
+            print(f"⚠️  Could not checkpoint {stage}: {e}")
+            return False
+        os.makedirs(self.path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._file(stage))
+        return True
+    
+    def completed(self) -> List[str]:
+        """Checkpointed stages, as file names."""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name[:-4] for name in os.listdir(self.path) if name.endswith('.pkl'))
+    
+    def clear(self):
+        """Remove the run directory."""
+        shutil.rmtree(self.path, ignore_errors=True)
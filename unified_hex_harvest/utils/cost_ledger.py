@@ -0,0 +1,185 @@
+"""
+Local, append-only ledger of the warehouse cost of every job run by the library.
+
+Each job is recorded with the experiment, metric, stage, user and execution
+mode it ran for (the same values are set as BigQuery job labels), so the bill
+can be broken down locally: top metrics by bytes this month, cost per daily
+refresh, and so on.
+"""
+
+import getpass
+import os
+import re
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+# On-demand BigQuery price per TiB billed
+USD_PER_TIB = 6.25
+
+LEDGER_COLUMNS = [
+    'created_at', 'run_id', 'job_id', 'experiment_name', 'metric', 'stage', 'user', 'execution_mode',
+    'cache', 'bytes_processed', 'bytes_billed', 'slot_ms', 'cost_usd',
+]
+
+
+def current_user() -> str:
+    """User running the library (``HARVEST_USER`` if set, else the OS user)."""
+    try:
+        return os.environ.get('HARVEST_USER') or getpass.getuser()
+    except Exception:
+        return 'unknown'
+
+
+def label_value(value: Any) -> str:
+    """
+    Make a value valid as a BigQuery label value.
+    
+    Label values are at most 63 lowercase letters, digits, underscores and dashes.
+    """
+    return re.sub(r'[^a-z0-9_-]', '_', str(value).lower())[:63]
+
+
+class CostLedger:
+    """Append-only SQLite ledger of warehouse jobs and their cost."""
+    
+    def __init__(self, path: str = '.cost_ledger.sqlite'):
+        """
+        Initialize the ledger.
+        
+        Args:
+            path: SQLite file path
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                '''CREATE TABLE IF NOT EXISTS jobs (
+                    created_at TEXT,
+                    run_id TEXT,
+                    job_id TEXT,
+                    experiment_name TEXT,
+                    metric TEXT,
+                    stage TEXT,
+                    user TEXT,
+                    execution_mode TEXT,
+                    cache TEXT,
+                    bytes_processed INTEGER,
+                    bytes_billed INTEGER,
+                    slot_ms INTEGER,
+                    cost_usd REAL
+                )'''
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_job_id ON jobs (job_id)')
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection that waits on locks held by other processes."""
+        return sqlite3.connect(self.path, timeout=60)
+    
+    def record(self, **fields):
+        """
+        Append a job to the ledger.
+        
+        A job already recorded (re-attached to by a retry or a resumed run) is not
+        recorded again, so its cost is only counted once.
+        
+        Args:
+            **fields: Values of ``LEDGER_COLUMNS``; ``created_at`` defaults to now and
+                ``cost_usd`` is derived from ``bytes_billed``
+        """
+        row = {column: fields.get(column) for column in LEDGER_COLUMNS}
+        row['created_at'] = row['created_at'] or datetime.now().isoformat(timespec='seconds')
+        row['cost_usd'] = (row['bytes_billed'] or 0) / 2 ** 40 * USD_PER_TIB
+        with self._connect() as conn:
+            if row['job_id'] is not None and conn.execute(
+                'SELECT 1 FROM jobs WHERE job_id = ? LIMIT 1', (row['job_id'],)
+            ).fetchone():
+                return
+            conn.execute(
+                f"INSERT INTO jobs ({', '.join(LEDGER_COLUMNS)}) VALUES ({', '.join('?' * len(LEDGER_COLUMNS))})",
+                [row[column] for column in LEDGER_COLUMNS]
+            )
+    
+    def query(self, sql: str, params: tuple = ()) -> pd.DataFrame:
+        """
+        Run SQL against the ledger (table ``jobs``).
+        
+        Args:
+            sql: SQLite query
+            params: Query parameters
+        
+        Returns:
+            DataFrame with the result
+        """
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+    
+    def jobs(self, since: Optional[str] = None) -> pd.DataFrame:
+        """
+        All recorded jobs.
+        
+        Args:
+            since: Optional first date (YYYY-MM-DD)
+        
+        Returns:
+            DataFrame with one row per job
+        """
+        return self.query('SELECT * FROM jobs WHERE created_at >= ? ORDER BY created_at', (since or '',))
+    
+    def top(self, by: str = 'metric', since: Optional[str] = None, limit: int = 10) -> pd.DataFrame:
+        """
+        Largest cost contributors.
+        
+        Args:
+            by: Column to group by (experiment_name, metric, stage, user or execution_mode)
+            since: Optional first date (YYYY-MM-DD), e.g. the first day of the month
+            limit: Number of rows
+        
+        Returns:
+            DataFrame with jobs, bytes_billed, slot_ms and cost_usd per group, most expensive first
+        """
+        if by not in ('experiment_name', 'metric', 'stage', 'user', 'execution_mode'):
+            raise ValueError(f"Cannot group by: {by}")
+        return self.query(
+            f'SELECT {by}, COUNT(*) AS jobs, SUM(bytes_billed) AS bytes_billed, SUM(slot_ms) AS slot_ms, '
+            f'SUM(cost_usd) AS cost_usd FROM jobs WHERE created_at >= ? '
+            f'GROUP BY {by} ORDER BY bytes_billed DESC LIMIT ?',
+            (since or '', limit)
+        )
+    
+    def daily(self, execution_mode: Optional[str] = None, since: Optional[str] = None) -> pd.DataFrame:
+        """
+        Cost per day, e.g. of the daily batch refresh with ``execution_mode='batch'``.
+        
+        Args:
+            execution_mode: Optional mode to restrict to
+            since: Optional first date (YYYY-MM-DD)
+        
+        Returns:
+            DataFrame with date, runs, jobs, bytes_billed and cost_usd
+        """
+        conditions: List[str] = ['created_at >= ?']
+        params: List[Any] = [since or '']
+        if execution_mode:
+            conditions.append('execution_mode = ?')
+            params.append(execution_mode)
+        return self.query(
+            'SELECT substr(created_at, 1, 10) AS date, COUNT(DISTINCT run_id) AS runs, COUNT(*) AS jobs, '
+            'SUM(bytes_billed) AS bytes_billed, SUM(cost_usd) AS cost_usd '
+            f"FROM jobs WHERE {' AND '.join(conditions)} GROUP BY 1 ORDER BY 1",
+            tuple(params)
+        )
+    
+    def summary(self, since: Optional[str] = None) -> Dict[str, float]:
+        """Total jobs, bytes billed and cost."""
+        row = self.query(
+            'SELECT COUNT(*) AS jobs, COALESCE(SUM(bytes_billed), 0) AS bytes_billed, '
+            'COALESCE(SUM(cost_usd), 0) AS cost_usd FROM jobs WHERE created_at >= ?',
+            (since or '',)
+        ).iloc[0]
+        return row.to_dict()
@@ -0,0 +1,122 @@
+"""
+In-memory warehouse credentials and the BigQuery client shared by the library.
+
+The service account key is parsed once into credentials kept in memory
+(nothing is written to disk), and one thread-safe BigQuery client per
+project is created on first use and shared by every warehouse client, stage
+and shard. Its HTTP session keeps a connection pool sized for concurrent
+stages and shards, so calls reuse authenticated connections and the access
+token is refreshed once for everybody instead of per call.
+"""
+
+import json
+import threading
+from typing import Any, Dict, Optional, Tuple, Union
+
+SCOPES = ['https://www.googleapis.com/auth/cloud-platform']
+
+# Connections kept open to the warehouse API by the shared client
+POOL_SIZE = 32
+
+
+class CredentialsProvider:
+    """Credentials built once from a service account key, or from the application default credentials."""
+    
+    def __init__(self, info: Optional[Union[str, Dict[str, Any]]] = None):
+        """
+        Initialize the provider.
+        
+        Args:
+            info: Service account key, as a JSON string or dict (None for the
+                application default credentials)
+        """
+        self.info = json.loads(info) if isinstance(info, str) else info
+        self._credentials = None
+        self._project: Optional[str] = None
+        self._lock = threading.Lock()
+    
+    def get(self) -> Tuple[Any, Optional[str]]:
+        """
+        Credentials and their project, built on first use.
+        
+        Returns:
+            Tuple of (credentials, project ID)
+        """
+        with self._lock:
+            if self._credentials is None:
+                if self.info is not None:
+                    from google.oauth2 import service_account
+                    self._credentials = service_account.Credentials.from_service_account_info(self.info, scopes=SCOPES)
+                    self._project = self.info.get('project_id')
+                else:
+                    import google.auth
+                    self._credentials, self._project = google.auth.default(scopes=SCOPES)
+            return self._credentials, self._project
+
+
+_provider = CredentialsProvider()
+_clients: Dict[Optional[str], Any] = {}
+_lock = threading.Lock()
+
+
+def set_credentials(info: Union[str, Dict[str, Any]]) -> CredentialsProvider:
+    """
+    Use a service account key for the library's warehouse calls.
+    
+    The shared clients are replaced, and ``pandas_gbq``, if installed, is given the
+    same credentials. Clients built by the bsp helpers still need the application
+    default credentials (``setup_credentials(application_default=True)``).
+    
+    Args:
+        info: Service account key, as a JSON string or dict
+    
+    Returns:
+        CredentialsProvider object
+    """
+    global _provider
+    provider = CredentialsProvider(info)
+    with _lock:
+        _provider = provider
+        _clients.clear()
+    
+    try:
+        import pandas_gbq
+    except ImportError:
+        return provider
+    credentials, project = provider.get()
+    pandas_gbq.context.credentials = credentials
+    pandas_gbq.context.project = project
+    return provider
+
+
+def get_credentials_provider() -> CredentialsProvider:
+    """Provider of the credentials used by the shared clients."""
+    return _provider
+
+
+def shared_client(project: Optional[str] = None):
+    """
+    BigQuery client shared by the library, created on first use.
+    
+    Args:
+        project: Project running the jobs (defaults to the credentials' project)
+    
+    Returns:
+        google.cloud.bigquery.Client object
+    """
+    with _lock:
+        if project not in _clients:
+            _clients[project] = _create_client(_provider, project)
+        return _clients[project]
+
+
+def _create_client(provider: CredentialsProvider, project: Optional[str]):
+    """BigQuery client with an HTTP session pooling up to ``POOL_SIZE`` connections."""
+    from google.auth.transport.requests import AuthorizedSession
+    from google.cloud import bigquery
+    from requests.adapters import HTTPAdapter
+    
+    credentials, default_project = provider.get()
+    session = AuthorizedSession(credentials)
+    session.mount('https://', HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE))
+    return bigquery.Client(project=project or default_project, credentials=credentials, _http=session)
@@ -2,7 +2,10 @@
 Data query functions for experiment analysis.
 """
 
-from typing import Optional, List, Union, Any
+from typing import Optional, List, Dict, Union, Any
+
+from .bsp_helpers import find_helper
+from .tracing import traced
 
 # Query will be available in Hex environment through global imports
 # We'll access it dynamically when needed
@@ -14,12 +17,9 @@ class DataQueries:
     @staticmethod
     def _get_query():
         """Get Query class from global namespace (Hex environment)."""
-        import sys
-        frame = sys._getframe(2)  # Go up 2 levels to get to the caller
-        while frame:
-            if 'Query' in frame.f_globals:
-                return frame.f_globals['Query']
-            frame = frame.f_back
+        Query = find_helper('Query')
+        if Query is not None:
+            return Query
         
         raise NameError(
             "Query not found in global namespace. Make sure to import it in your Hex notebook with:\n"
@@ -29,12 +29,55 @@ class DataQueries:
         )
     
     @staticmethod
+    def sample_filter(uid_expression: str, sample_rate: float) -> str:
+        """
+        Get a deterministic hash-based sampling condition on a user id.
+        
+        The same users are kept for a given rate in every query, so target queries
+        joined on the sampled user base stay consistent.
+        
+        Args:
+            uid_expression: SQL expression of the user id
+            sample_rate: Fraction of users to keep, in (0, 1]
+            
+        Returns:
+            SQL condition
+        """
+        if not 0 < sample_rate <= 1:
+            raise ValueError(f"sample_rate must be in (0, 1], got: {sample_rate}")
+        buckets = 1000000
+        return f"ABS(MOD(FARM_FINGERPRINT({uid_expression}), {buckets})) < {int(round(sample_rate * buckets))}"
+    
+    @staticmethod
+    def shard_filter(uid_expression: str, shard: int, n_shards: int) -> str:
+        """
+        Get the condition selecting one hash shard of users.
+        
+        A salted hash is used so shards are independent of the sampling buckets.
+        
+        Args:
+            uid_expression: SQL expression of the user id
+            shard: Shard index, in [0, n_shards)
+            n_shards: Number of shards
+            
+        Returns:
+            SQL condition
+        """
+        if not 0 <= shard < n_shards:
+            raise ValueError(f"shard must be in [0, {n_shards}), got: {shard}")
+        return f"ABS(MOD(FARM_FINGERPRINT(CONCAT('shard:', {uid_expression})), {n_shards})) = {shard}"
+    
+    @staticmethod
+    @traced('query')
     def get_experiment_user_base(
         experiment_name: str,
         segment_name: Optional[Union[str, List[str]]] = None,
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
-        exclude_converted: Optional[bool] = None
+        exclude_converted: Optional[bool] = None,
+        sample_rate: Optional[float] = None,
+        shard: Optional[int] = None,
+        n_shards: int = 1
     ) -> Any:
         """
         Get user base for an experiment with optional filtering.
@@ -45,6 +88,9 @@ class DataQueries:
             start_date: Start date filter
             end_date: End date filter
             exclude_converted: Whether to exclude converted users
+            sample_rate: Optional fraction of users to keep (hash-based, deterministic)
+            shard: Optional hash shard of users to keep
+            n_shards: Number of hash shards
             
         Returns:
             Query object for the user base
@@ -72,6 +118,10 @@ class DataQueries:
             segmented_users.where(f'DATE(event_timestamp) >= "{start_date}"')
         if end_date:
             segmented_users.where(f'DATE(event_timestamp) <= "{end_date}"')
+        if sample_rate is not None and sample_rate < 1:
+            segmented_users.where(DataQueries.sample_filter("JSON_EXTRACT_SCALAR(identifiers, '$.harvest_account_id')", sample_rate))
+        if shard is not None and n_shards > 1:
+            segmented_users.where(DataQueries.shard_filter("JSON_EXTRACT_SCALAR(identifiers, '$.harvest_account_id')", shard, n_shards))
 
         userbase = (
             Query()
@@ -115,11 +165,70 @@ class DataQueries:
         return userbase
 
     @staticmethod
+    @traced('query')
+    def get_batch_user_base(experiments: List[Dict[str, Any]], sample_rate: Optional[float] = None) -> str:
+        """
+        Get the user base of several experiments from a single exposure scan.
+        
+        Users are tagged by experiment and segment: ``segment_name`` is
+        ``'<experiment_name>|<segment_name>'``, so one statistics query covers the
+        whole batch. A user exposed to several experiments appears once per experiment.
+        
+        Args:
+            experiments: Dicts with experiment_name, segments, start_date and end_date
+            sample_rate: Optional fraction of users to keep (hash-based, deterministic)
+            
+        Returns:
+            SQL string with uid, origin_timestamp, segmentation_client, segment_name and experiment_start
+        """
+        windows = []
+        for experiment in experiments:
+            segments_in_list = '("' + '", "'.join(experiment['segments']) + '")'
+            windows.append(
+                f"(JSON_VALUE(payload, '$.experiment_name') = '{experiment['experiment_name']}'"
+                f" AND JSON_VALUE(payload, '$.segment_name') IN {segments_in_list}"
+                f" AND DATE(event_timestamp) BETWEEN '{experiment['start_date']}' AND '{experiment['end_date']}')"
+            )
+        where = '\n          OR '.join(windows)
+        starts = '\n          '.join(
+            f"WHEN '{experiment['experiment_name']}' THEN TIMESTAMP('{experiment['start_date']}')"
+            for experiment in experiments
+        )
+        uid = "JSON_EXTRACT_SCALAR(identifiers, '$.harvest_account_id')"
+        sample_filter = f"\n        AND {DataQueries.sample_filter(uid, sample_rate)}" if sample_rate is not None and sample_rate < 1 else ''
+        
+        return f'''
+      SELECT
+        uid,
+        origin_timestamp,
+        segmentation_client,
+        CONCAT(experiment_name, '|', segment_name) AS segment_name,
+        CASE experiment_name
+          {starts}
+        END AS experiment_start
+      FROM (
+        SELECT
+          JSON_VALUE(payload, '$.experiment_name') AS experiment_name,
+          {uid} AS uid,
+          MIN(event_timestamp) AS origin_timestamp,
+          MIN_BY(JSON_VALUE(payload, '$.bsp_id'), event_timestamp) AS segmentation_client,
+          MIN_BY(JSON_VALUE(payload, '$.segment_name'), event_timestamp) AS segment_name
+        FROM
+          `harvest-picox-42.harvest_orion.service_improvement`
+        WHERE
+          ({where}){sample_filter}
+        GROUP BY
+          1,
+          2 )'''
+    
+    @staticmethod
+    @traced('query')
     def get_segmented_users_subquery(
         experiment_name: str,
         segment_name: Optional[Union[str, List[str]]] = None,
         start_date: Optional[str] = None,
-        end_date: Optional[str] = None
+        end_date: Optional[str] = None,
+        sample_rate: Optional[float] = None
     ) -> Any:
         """
         Get the segmented users subquery (without the final userbase wrapper).
@@ -129,6 +238,7 @@ class DataQueries:
             segment_name: Segment name(s) to filter by
             start_date: Start date filter
             end_date: End date filter
+            sample_rate: Optional fraction of users to keep (hash-based, deterministic)
             
         Returns:
             Query object for the segmented users subquery
@@ -157,6 +267,8 @@ class DataQueries:
             segmented_users.where(f'DATE(event_timestamp) >= "{start_date}"')
         if end_date:
             segmented_users.where(f'DATE(event_timestamp) <= "{end_date}"')
+        if sample_rate is not None and sample_rate < 1:
+            segmented_users.where(DataQueries.sample_filter("JSON_EXTRACT_SCALAR(identifiers, '$.harvest_account_id')", sample_rate))
 
         return segmented_users
 
@@ -699,3 +811,315 @@ class DataQueries:
         )
 
         return final
+
+    @staticmethod
+    @traced('query')
+    def get_pre_period_covariates(covariate: str, start_date: str, lookback_days: int = 28) -> str:
+        """
+        Get each user's pre-exposure covariate for CUPED.
+
+        The query reads from a ``base_users`` CTE (uid, origin_timestamp) so it can be
+        computed in the same pass as the user base.
+
+        Args:
+            covariate: 'bookings', 'sessions' or 'hours_tracked'
+            start_date: Experiment start date (bounds the scanned partitions)
+            lookback_days: Length of the pre-exposure window in days
+
+        Returns:
+            SQL string returning uid, covariate
+        """
+        covariate_sources = {
+            'bookings': (
+                'SUM(p.bookings_net_of_platform_fees_usd)',
+                '`harvest-lumenx-42.verified.bookings` p',
+                'p.user_id',
+                'p.timestamp'
+            ),
+            'sessions': (
+                'COUNT(DISTINCT p.session_start_time)',
+                '`harvesthq-production.harvest_analytics.sessions` p',
+                'CAST(p.user_id AS STRING)',
+                'p.session_start_time'
+            ),
+            'hours_tracked': (
+                'SUM(p.hours)',
+                '`harvesthq-production.harvest_analytics.time_entries` p',
+                'CAST(p.company_id AS STRING)',
+                'p.created_at'
+            ),
+        }
+        if covariate not in covariate_sources:
+            raise ValueError(f"Unknown covariate: {covariate}. Available: {list(covariate_sources.keys())}")
+
+        aggregate, table, user_column, timestamp_column = covariate_sources[covariate]
+        return f'''
+      SELECT
+        u.uid,
+        {aggregate} AS covariate
+      FROM
+        base_users u
+      INNER JOIN
+        {table}
+      ON
+        {user_column} = u.uid
+        AND TIMESTAMP({timestamp_column}) >= TIMESTAMP_SUB(u.origin_timestamp, INTERVAL {lookback_days} DAY)
+        AND TIMESTAMP({timestamp_column}) < u.origin_timestamp
+      WHERE
+        TIMESTAMP({timestamp_column}) >= TIMESTAMP_SUB(TIMESTAMP('{start_date}'), INTERVAL {lookback_days} DAY)
+      GROUP BY
+        1'''
+
+    @staticmethod
+    @traced('query')
+    def get_sufficient_stats(
+        metric_name: str,
+        user_base: Any,
+        target_query: Any,
+        start_date: str,
+        end_date: str,
+        granularity_in_days: int = 1,
+        value: str = 'indicator',
+        first_bin: int = 0,
+        covariate: Optional[str] = None,
+        covariate_lookback_days: int = 28,
+        bin_origin_column: Optional[str] = None
+    ) -> str:
+        """
+        Get per-segment, per-time-bin sufficient statistics for a metric.
+
+        Each time bin is cumulative from ``start_date``. For every user exposed before
+        the end of a bin, ``x`` is the user's cumulative value (1 for ``indicator``,
+        number of events for ``count``, sum of ``event_value`` for ``sum``) and ``y``
+        is 1 if the user has at least one target event. Only the sums leave the warehouse.
+
+        Args:
+            metric_name: Metric name written to the ``metric`` column
+            user_base: User base query (Query object or SQL string)
+            target_query: Target query with uid, event_timestamp and optionally event_value
+            start_date: Start date of the first time bin
+            end_date: Last date covered by the time bins
+            granularity_in_days: Width of each time bin in days
+            value: Per-user value aggregation: 'indicator', 'count' or 'sum'
+            first_bin: First time bin to compute (earlier bins are skipped)
+            covariate: Optional CUPED covariate (see ``get_pre_period_covariates``)
+            covariate_lookback_days: Length of the pre-exposure window for the covariate
+            bin_origin_column: Optional user base column holding each user's own bin origin
+                (e.g. the start of their experiment in a batch); ``start_date`` is used otherwise
+
+        Returns:
+            SQL string returning metric, time_bin, segment_name, n, sum_x, sum_x2, sum_y, sum_y2, sum_xy
+            and, with a covariate, sum_c, sum_c2, sum_xc
+        """
+        from datetime import datetime
+
+        value_expressions = {
+            'indicator': '1',
+            'count': 'COUNT(*)',
+            'sum': 'SUM(t.event_value)',
+        }
+        if value not in value_expressions:
+            raise ValueError(f"Unknown value aggregation: {value}. Available: {list(value_expressions.keys())}")
+
+        n_bins = (
+            datetime.strptime(end_date, '%Y-%m-%d') - datetime.strptime(start_date, '%Y-%m-%d')
+        ).days // granularity_in_days + 1
+        user_base_sql = user_base if isinstance(user_base, str) else user_base.to_sql()
+        target_sql = target_query if isinstance(target_query, str) else target_query.to_sql()
+
+        if bin_origin_column:
+            bin_end = f'TIMESTAMP_ADD(u.{bin_origin_column}, INTERVAL (b.time_bin + 1) * {granularity_in_days} DAY)'
+        else:
+            bin_end = 'b.bin_end'
+
+        if covariate:
+            users_sql = f'''base_users AS ({user_base_sql}),
+      covariates AS ({DataQueries.get_pre_period_covariates(covariate, start_date, covariate_lookback_days)}),
+      users AS (
+      SELECT
+        b.*,
+        COALESCE(c.covariate, 0) AS covariate
+      FROM
+        base_users b
+      LEFT JOIN
+        covariates c
+      USING
+        (uid) ),'''
+            exposed_covariate = '''
+        SUM(u.covariate) AS sum_c,
+        SUM(u.covariate * u.covariate) AS sum_c2,'''
+            value_covariate = '''
+        ANY_VALUE(u.covariate) AS covariate,'''
+            stats_covariate = '''
+        SUM(x * covariate) AS sum_xc,'''
+            select_covariate = ''',
+      e.sum_c,
+      e.sum_c2,
+      COALESCE(v.sum_xc, 0) AS sum_xc'''
+        else:
+            users_sql = f'users AS ({user_base_sql}),'
+            exposed_covariate = value_covariate = stats_covariate = select_covariate = ''
+
+        return f'''
+      WITH
+      {users_sql}
+      targets AS ({target_sql}),
+      bins AS (
+      SELECT
+        time_bin,
+        TIMESTAMP_ADD(TIMESTAMP('{start_date}'), INTERVAL (time_bin + 1) * {granularity_in_days} DAY) AS bin_end
+      FROM
+        UNNEST(GENERATE_ARRAY({first_bin}, {n_bins - 1})) AS time_bin ),
+      exposed AS (
+      SELECT
+        b.time_bin,
+        u.segment_name,{exposed_covariate}
+        COUNT(*) AS n
+      FROM
+        users u
+      INNER JOIN
+        bins b
+      ON
+        u.origin_timestamp < {bin_end}
+      GROUP BY
+        1,
+        2 ),
+      user_values AS (
+      SELECT
+        b.time_bin,
+        u.segment_name,
+        u.uid,{value_covariate}
+        {value_expressions[value]} AS x
+      FROM
+        users u
+      INNER JOIN
+        targets t
+      ON
+        t.uid = u.uid
+        AND t.event_timestamp >= u.origin_timestamp
+      INNER JOIN
+        bins b
+      ON
+        t.event_timestamp < {bin_end}
+      GROUP BY
+        1,
+        2,
+        3 ),
+      value_stats AS (
+      SELECT
+        time_bin,
+        segment_name,{stats_covariate}
+        SUM(x) AS sum_x,
+        SUM(x * x) AS sum_x2,
+        COUNT(*) AS sum_y
+      FROM
+        user_values
+      GROUP BY
+        1,
+        2 )
+    SELECT
+      '{metric_name}' AS metric,
+      e.time_bin,
+      e.segment_name,
+      e.n,
+      COALESCE(v.sum_x, 0) AS sum_x,
+      COALESCE(v.sum_x2, 0) AS sum_x2,
+      COALESCE(v.sum_y, 0) AS sum_y,
+      COALESCE(v.sum_y, 0) AS sum_y2,
+      COALESCE(v.sum_x, 0) AS sum_xy{select_covariate}
+    FROM
+      exposed e
+    LEFT JOIN
+      value_stats v
+    USING
+      (time_bin, segment_name)'''
+
+    @staticmethod
+    @traced('query')
+    def get_exposure_sketch_registers(
+        experiment_name: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        since: Optional[str] = None,
+        precision: int = 12
+    ) -> str:
+        """
+        Get HyperLogLog registers of exposed users per hour, segment and client.
+
+        Every exposure event counts (not only the first one), so merging hourly sketches
+        gives the distinct users exposed in any window. Only the non-empty registers
+        leave the warehouse: at most ``2 ** precision`` rows per hour, segment and client.
+
+        Args:
+            experiment_name: Name of the experiment
+            start_date: Start date filter
+            end_date: End date filter
+            since: Only include hours from this timestamp on (for incremental updates)
+            precision: Number of hash bits used as register index
+
+        Returns:
+            SQL string returning hour, segment_name, segmentation_client, register, rho
+        """
+        filters = [f"JSON_VALUE(payload, '$.experiment_name') = '{experiment_name}'"]
+        if start_date:
+            filters.append(f'DATE(event_timestamp) >= "{start_date}"')
+        if end_date:
+            filters.append(f'DATE(event_timestamp) <= "{end_date}"')
+        if since:
+            filters.append(f'event_timestamp >= TIMESTAMP("{since}")')
+        where = '\n        AND '.join(filters)
+
+        return f'''
+      WITH
+      exposures AS (
+      SELECT DISTINCT
+        TIMESTAMP_TRUNC(event_timestamp, HOUR) AS hour,
+        JSON_VALUE(payload, '$.segment_name') AS segment_name,
+        CASE 
+            WHEN JSON_VALUE(payload, '$.bsp_id') = "harvest_ios" THEN "ios"
+            WHEN JSON_VALUE(payload, '$.bsp_id') = "harvest_android" THEN "android"
+            WHEN JSON_VALUE(payload, '$.bsp_id') = "harvest_web" THEN "web"
+            WHEN JSON_VALUE(payload, '$.bsp_id') IN ("harvest_mac_store", "harvest_windows_store") THEN "desktop"
+        END AS segmentation_client,
+        FARM_FINGERPRINT(JSON_EXTRACT_SCALAR(identifiers, '$.harvest_account_id')) AS h
+      FROM
+        `harvest-picox-42.harvest_orion.service_improvement`
+      WHERE
+        {where} ),
+      hashed AS (
+      SELECT
+        hour,
+        segment_name,
+        segmentation_client,
+        h & {2 ** precision - 1} AS register,
+        -- Remaining {64 - precision} bits; >> does not sign-extend in BigQuery
+        h >> {precision} AS w
+      FROM
+        exposures )
+    SELECT
+      hour,
+      segment_name,
+      segmentation_client,
+      register,
+      MAX(IF(w = 0, {64 - precision + 1}, {64 - precision} - CAST(FLOOR(LOG(w, 2)) AS INT64))) AS rho
+    FROM
+      hashed
+    GROUP BY
+      1,
+      2,
+      3,
+      4'''
+
+    @staticmethod
+    def union_all(queries: List[Any]) -> str:
+        """
+        Combine queries with identical columns into a single query.
+
+        Args:
+            queries: Query objects or SQL strings
+
+        Returns:
+            SQL string
+        """
+        sql = [query if isinstance(query, str) else query.to_sql() for query in queries]
+        return '\nUNION ALL\n'.join(f'SELECT * FROM ({query})' for query in sql)
@@ -0,0 +1,194 @@
+"""
+Limit of concurrent warehouse jobs shared by every notebook and process on a host.
+
+``WarehouseLimiter`` is a counting semaphore stored in SQLite, so it works
+across processes (and across hosts when the database lives on a shared
+filesystem with working file locks). Waiting jobs are granted slots by
+priority, then arrival: interactive work always goes ahead of queued batch
+work, and a number of slots can be reserved for interactive work so a batch
+refresh never takes all of them. A held slot is renewed in the background, so
+only the slots of processes that died or hung are freed for others.
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from .cancellation import CancellationToken
+from .tracing import span
+
+PRIORITIES = {'interactive': 0, 'batch': 1}
+
+
+class WarehouseLimiter:
+    """Cross-process semaphore with priorities around warehouse jobs."""
+    
+    def __init__(
+        self,
+        path: str = '.warehouse_slots.sqlite',
+        slots: int = 4,
+        interactive_reserved_slots: int = 1,
+        lease_seconds: float = 300,
+        poll_interval: float = 0.5
+    ):
+        """
+        Initialize the limiter.
+        
+        Args:
+            path: SQLite file shared by every process using the limiter
+            slots: Maximum number of concurrent warehouse jobs
+            interactive_reserved_slots: Slots that batch jobs cannot take
+            lease_seconds: Time without renewal after which a slot is considered abandoned
+                (held slots are renewed every third of it)
+            poll_interval: Seconds between attempts while waiting for a slot
+        """
+        if slots < 1:
+            raise ValueError(f"slots must be at least 1, got: {slots}")
+        if not 0 <= interactive_reserved_slots < slots:
+            raise ValueError(f"interactive_reserved_slots must be in [0, slots), got: {interactive_reserved_slots}")
+        self.path = path
+        self.slots = slots
+        self.interactive_reserved_slots = interactive_reserved_slots
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.host = socket.gethostname()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                '''CREATE TABLE IF NOT EXISTS requests (
+                    request_id TEXT PRIMARY KEY,
+                    priority INTEGER,
+                    host TEXT,
+                    pid INTEGER,
+                    requested_at REAL,
+                    seen_at REAL,
+                    granted_at REAL
+                )'''
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection that waits on locks held by other processes."""
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+    
+    def _is_dead(self, host: str, pid: int) -> bool:
+        """Whether a request belongs to a process of this host that no longer runs."""
+        if host != self.host:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+    
+    def _cleanup(self, conn: sqlite3.Connection, now: float):
+        """Drop abandoned slots and waiters (expired, or of processes that died)."""
+        conn.execute(
+            'DELETE FROM requests WHERE (granted_at IS NOT NULL AND seen_at < ?) '
+            'OR (granted_at IS NULL AND seen_at < ?)',
+            (now - self.lease_seconds, now - max(60, 20 * self.poll_interval))
+        )
+        rows = conn.execute('SELECT request_id, host, pid FROM requests').fetchall()
+        dead = [(request_id,) for request_id, host, pid in rows if self._is_dead(host, pid)]
+        conn.executemany('DELETE FROM requests WHERE request_id = ?', dead)
+    
+    def _try_grant(self, request_id: str, priority: int) -> bool:
+        """Grant a slot if one is free and no waiter is ahead of this request."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            self._cleanup(conn, now)
+            conn.execute('UPDATE requests SET seen_at = ? WHERE request_id = ?', (now, request_id))
+            running = conn.execute('SELECT COUNT(*) FROM requests WHERE granted_at IS NOT NULL').fetchone()[0]
+            limit = self.slots if priority == PRIORITIES['interactive'] else self.slots - self.interactive_reserved_slots
+            first = conn.execute(
+                'SELECT request_id FROM requests WHERE granted_at IS NULL '
+                'ORDER BY priority, requested_at LIMIT 1'
+            ).fetchone()
+            granted = running < limit and first is not None and first[0] == request_id
+            if granted:
+                conn.execute('UPDATE requests SET granted_at = ? WHERE request_id = ?', (now, request_id))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return granted
+    
+    def _renew(self, request_id: str):
+        """Mark a held slot as still in use."""
+        with self._connect() as conn:
+            conn.execute('UPDATE requests SET seen_at = ? WHERE request_id = ?', (time.time(), request_id))
+    
+    @contextmanager
+    def slot(self, priority: str = 'interactive', cancellation: Optional[CancellationToken] = None) -> Iterator[None]:
+        """
+        Hold a warehouse slot for the duration of the block, waiting for one if needed.
+        
+        The slot is renewed in the background while the block runs, so jobs running
+        longer than ``lease_seconds`` keep it.
+        
+        Args:
+            priority: 'interactive' or 'batch'
+            cancellation: Optional token that stops the wait when cancelled
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {list(PRIORITIES)}, got: {priority}")
+        request_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO requests (request_id, priority, host, pid, requested_at, seen_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (request_id, PRIORITIES[priority], self.host, os.getpid(), now, now)
+            )
+        try:
+            with span('slot_wait', 'query', priority=priority):
+                waited = False
+                while not self._try_grant(request_id, PRIORITIES[priority]):
+                    if not waited:
+                        print(f"⏳ Waiting for a warehouse slot ({priority})...")
+                        waited = True
+                    if cancellation is not None:
+                        cancellation.sleep(self.poll_interval)
+                    else:
+                        time.sleep(self.poll_interval)
+            
+            done = threading.Event()
+            
+            def heartbeat():
+                while not done.wait(self.lease_seconds / 3):
+                    self._renew(request_id)
+            
+            renewer = threading.Thread(target=heartbeat, daemon=True)
+            renewer.start()
+            try:
+                yield
+            finally:
+                done.set()
+                renewer.join()
+        finally:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM requests WHERE request_id = ?', (request_id,))
+    
+    def usage(self) -> Dict[str, int]:
+        """Number of running and waiting jobs per priority."""
+        names = {value: name for name, value in PRIORITIES.items()}
+        usage = {f'{state}_{name}': 0 for state in ('running', 'waiting') for name in PRIORITIES}
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT priority, granted_at IS NOT NULL, COUNT(*) FROM requests GROUP BY 1, 2'
+            ).fetchall()
+        for priority, granted, count in rows:
+            usage[f"{'running' if granted else 'waiting'}_{names[priority]}"] = count
+        return usage
@@ -0,0 +1,210 @@
+"""
+Team-wide cache of warehouse query results.
+
+Results are stored as content-addressed Parquet blobs keyed by the fingerprint of
+the compiled SQL, through a pluggable backend. ``LocalBackend`` works on a local
+or shared filesystem; an object store backend only needs to implement
+``CacheBackend``. Once one analyst has run a query, everyone pointing at the same
+cache location gets the result without re-scanning the warehouse.
+"""
+
+import hashlib
+import io
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+
+def query_fingerprint(sql: str) -> str:
+    """
+    Fingerprint of a compiled query, insensitive to whitespace changes.
+    
+    Args:
+        sql: Compiled SQL string
+    
+    Returns:
+        Hex string
+    """
+    normalized = re.sub(r'\s+', ' ', sql).strip()
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+class CacheBackend(ABC):
+    """Storage of cache blobs and their metadata."""
+    
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Blob stored under a key, or None."""
+    
+    @abstractmethod
+    def put(self, key: str, data: bytes, metadata: Dict):
+        """Store a blob atomically with its metadata (created_at, rows, bytes, sql)."""
+    
+    @abstractmethod
+    def metadata(self, key: str) -> Optional[Dict]:
+        """Metadata of a stored blob, or None."""
+    
+    @abstractmethod
+    def delete(self, key: str):
+        """Remove a blob and its metadata."""
+    
+    @abstractmethod
+    def entries(self) -> List[Dict]:
+        """Metadata of every stored blob."""
+
+
+class LocalBackend(CacheBackend):
+    """Cache blobs on a local or shared filesystem, indexed in SQLite."""
+    
+    def __init__(self, root: str = '.result_cache'):
+        """
+        Initialize the backend.
+        
+        Args:
+            root: Cache directory (a shared mount makes the cache team-wide)
+        """
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                '''CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    created_at REAL,
+                    rows INTEGER,
+                    bytes INTEGER,
+                    sql TEXT,
+                    hits INTEGER DEFAULT 0
+                )'''
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the index, waiting on locks held by other processes."""
+        return sqlite3.connect(os.path.join(self.root, 'index.sqlite'), timeout=60)
+    
+    def _path(self, key: str) -> str:
+        """Blob location, fanned out by key prefix."""
+        return os.path.join(self.root, key[:2], f'{key}.parquet')
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """Blob stored under a key, or None."""
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        with self._connect() as conn:
+            conn.execute('UPDATE entries SET hits = hits + 1 WHERE key = ?', (key,))
+        return data
+    
+    def put(self, key: str, data: bytes, metadata: Dict):
+        """Store a blob atomically with its metadata."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write next to the target and rename, so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (key, created_at, rows, bytes, sql, hits) VALUES (?, ?, ?, ?, ?, 0)',
+                (key, metadata['created_at'], metadata['rows'], len(data), metadata['sql'])
+            )
+    
+    def metadata(self, key: str) -> Optional[Dict]:
+        """Metadata of a stored blob, or None."""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute('SELECT * FROM entries WHERE key = ?', (key,)).fetchone()
+        return dict(row) if row and os.path.exists(self._path(key)) else None
+    
+    def delete(self, key: str):
+        """Remove a blob and its metadata."""
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+        with self._connect() as conn:
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+    
+    def entries(self) -> List[Dict]:
+        """Metadata of every stored blob."""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute('SELECT * FROM entries ORDER BY created_at')]
+
+
+class ResultCache:
+    """Query result cache on top of a backend."""
+    
+    def __init__(self, backend: Optional[CacheBackend] = None, max_age_hours: Optional[float] = 12):
+        """
+        Initialize the cache.
+        
+        Args:
+            backend: Storage backend (defaults to a local ``.result_cache`` directory)
+            max_age_hours: Age after which results are refreshed, since the source tables
+                keep receiving data (None keeps results forever)
+        """
+        self.backend = backend or LocalBackend()
+        self.max_age_hours = max_age_hours
+    
+    def get(self, sql: str) -> Optional[pd.DataFrame]:
+        """
+        Get the cached result of a query.
+        
+        Args:
+            sql: Compiled SQL string
+        
+        Returns:
+            DataFrame, or None if missing or expired
+        """
+        key = query_fingerprint(sql)
+        metadata = self.backend.metadata(key)
+        if metadata is None:
+            return None
+        if self.max_age_hours is not None and time.time() - metadata['created_at'] > self.max_age_hours * 3600:
+            return None
+        data = self.backend.get(key)
+        return pd.read_parquet(io.BytesIO(data)) if data is not None else None
+    
+    def put(self, sql: str, df: pd.DataFrame):
+        """
+        Store the result of a query.
+        
+        Args:
+            sql: Compiled SQL string
+            df: Query result
+        """
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        self.backend.put(
+            query_fingerprint(sql),
+            buffer.getvalue(),
+            {'created_at': time.time(), 'rows': len(df), 'sql': sql}
+        )
+    
+    def prune(self, max_age_hours: Optional[float] = None) -> int:
+        """
+        Remove expired results.
+        
+        Args:
+            max_age_hours: Age limit (defaults to the cache's own)
+        
+        Returns:
+            Number of removed results
+        """
+        max_age_hours = max_age_hours if max_age_hours is not None else self.max_age_hours
+        if max_age_hours is None:
+            return 0
+        cutoff = time.time() - max_age_hours * 3600
+        expired = [entry['key'] for entry in self.backend.entries() if entry['created_at'] < cutoff]
+        for key in expired:
+            self.backend.delete(key)
+        return len(expired)
@@ -0,0 +1,110 @@
+"""
+Local store of per-experiment, per-metric results with their fingerprints.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+
+class ResultsStore:
+    """Sufficient statistics of past runs, indexed by the fingerprints they were computed with."""
+    
+    # Serializes index updates from parallel runs in the same process
+    _lock = threading.Lock()
+    
+    def __init__(self, path: str = '.results'):
+        """
+        Initialize the store.
+        
+        Args:
+            path: Directory holding the index and the result files
+        """
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+    
+    @property
+    def index_path(self) -> str:
+        """Location of the fingerprint index."""
+        return os.path.join(self.path, 'index.json')
+    
+    def _read_index(self) -> Dict:
+        """Read the fingerprint index."""
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path) as f:
+            return json.load(f)
+    
+    def _write_index(self, index: Dict):
+        """Write the fingerprint index atomically."""
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+    
+    def fingerprints(self, experiment_name: str) -> Dict:
+        """
+        Get the stored fingerprints of an experiment.
+        
+        Args:
+            experiment_name: Name of the experiment
+        
+        Returns:
+            Dict with the ``config`` fingerprint and per-metric ``metrics`` fingerprints
+            (empty if the experiment was never stored)
+        """
+        return self._read_index().get(experiment_name, {})
+    
+    def save(
+        self,
+        experiment_name: str,
+        config_fingerprint: str,
+        metric_fingerprints: Dict[str, str],
+        stats_df: pd.DataFrame
+    ):
+        """
+        Store the results of some metrics of an experiment.
+        
+        Metrics not included keep their previously stored results.
+        
+        Args:
+            experiment_name: Name of the experiment
+            config_fingerprint: Fingerprint of the experiment config
+            metric_fingerprints: Fingerprint of each stored metric
+            stats_df: Sufficient statistics with a ``metric`` column
+        """
+        directory = os.path.join(self.path, experiment_name)
+        os.makedirs(directory, exist_ok=True)
+        for metric_name in metric_fingerprints:
+            stats_df[stats_df['metric'] == metric_name].to_csv(os.path.join(directory, f'{metric_name}.csv'), index=False)
+        
+        with self._lock:
+            index = self._read_index()
+            entry = index.setdefault(experiment_name, {'metrics': {}})
+            entry['config'] = config_fingerprint
+            entry['metrics'].update(metric_fingerprints)
+            entry['updated_at'] = datetime.now().isoformat(timespec='seconds')
+            self._write_index(index)
+    
+    def load(self, experiment_name: str, metric_names: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Load stored sufficient statistics.
+        
+        Args:
+            experiment_name: Name of the experiment
+            metric_names: Metrics to load (defaults to all stored metrics)
+        
+        Returns:
+            DataFrame of sufficient statistics
+        """
+        stored = self.fingerprints(experiment_name).get('metrics', {})
+        metric_names = [name for name in (metric_names or stored) if name in stored]
+        frames = [
+            pd.read_csv(os.path.join(self.path, experiment_name, f'{metric_name}.csv'))
+            for metric_name in metric_names
+        ]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
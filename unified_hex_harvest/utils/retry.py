@@ -0,0 +1,138 @@
+"""
+Retry policy for transient warehouse errors.
+
+Errors are classified as retryable from their HTTP status and BigQuery error
+reasons (rate limits, backend and internal errors, unavailable service) or
+from being connection errors and timeouts. Everything else, e.g. invalid SQL
+or missing permissions, is raised immediately. Retries wait with exponential
+backoff and full jitter, so concurrent shards and workers do not retry in
+lockstep.
+"""
+
+import concurrent.futures
+import random
+import time
+from typing import Callable, Optional, Tuple, TypeVar
+
+from .cancellation import CancellationToken
+
+T = TypeVar('T')
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_REASONS = {'backendError', 'internalError', 'jobBackendError', 'jobInternalError', 'rateLimitExceeded'}
+
+
+def transient_errors() -> Tuple[type, ...]:
+    """
+    Exception types of connection errors and timeouts.
+    
+    ``concurrent.futures.TimeoutError`` is only an alias of the builtin ``TimeoutError``
+    from Python 3.11, and the ``requests`` errors (raised by the BigQuery client's HTTP
+    transport) do not derive from the builtins, so they are listed explicitly.
+    """
+    errors = [ConnectionError, TimeoutError, concurrent.futures.TimeoutError]
+    try:
+        import requests
+    except ImportError:
+        return tuple(errors)
+    return tuple(errors + [requests.exceptions.ConnectionError, requests.exceptions.Timeout])
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether an error is transient and the operation may succeed if retried.
+    
+    Args:
+        error: Exception raised by the warehouse client or by a job
+    
+    Returns:
+        True for rate limits, backend and internal errors, unavailable service,
+        connection errors and timeouts
+    """
+    if isinstance(error, transient_errors()):
+        return True
+    if getattr(error, 'code', None) in RETRYABLE_STATUS_CODES:
+        return True
+    reasons = {item.get('reason') for item in getattr(error, 'errors', None) or [] if isinstance(item, dict)}
+    return bool(reasons & RETRYABLE_REASONS)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter around retryable errors."""
+    
+    def __init__(
+        self,
+        max_retries: int = 4,
+        initial_delay: float = 1.0,
+        max_delay: float = 60.0,
+        multiplier: float = 2.0,
+        retryable: Callable[[BaseException], bool] = is_retryable
+    ):
+        """
+        Initialize the policy.
+        
+        Args:
+            max_retries: Retries after the first attempt (0 disables retrying)
+            initial_delay: Upper bound of the first wait, in seconds
+            max_delay: Upper bound of any wait, in seconds
+            multiplier: Growth of the wait bound after each attempt
+            retryable: Classification of the errors worth retrying
+        """
+        if max_retries < 0:
+            raise ValueError(f"max_retries must be at least 0, got: {max_retries}")
+        self.max_retries = max_retries
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.retryable = retryable
+    
+    def delay(self, attempt: int) -> float:
+        """
+        Seconds to wait after a failed attempt.
+        
+        Args:
+            attempt: Index of the failed attempt (0 for the first)
+        
+        Returns:
+            Random wait between 0 and the backoff bound of the attempt
+        """
+        return random.uniform(0, min(self.max_delay, self.initial_delay * self.multiplier ** attempt))
+    
+    def should_retry(self, error: BaseException, attempt: int) -> bool:
+        """Whether to retry after the given attempt failed with an error."""
+        return attempt < self.max_retries and self.retryable(error)
+    
+    def call(
+        self,
+        function: Callable[[int], T],
+        description: Optional[str] = None,
+        cancellation: Optional[CancellationToken] = None
+    ) -> T:
+        """
+        Call a function until it succeeds, fails with a non-retryable error or runs out of retries.
+        
+        Args:
+            function: Function taking the attempt index
+            description: What is being retried, for the progress message
+            cancellation: Optional token checked before each attempt and during the waits
+        
+        Returns:
+            Result of the first successful attempt
+        """
+        attempt = 0
+        while True:
+            if cancellation is not None:
+                cancellation.check()
+            try:
+                return function(attempt)
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                delay = self.delay(attempt)
+                print(f"🔁 Retrying {description or 'warehouse call'} in {delay:.1f}s "
+                      f"(attempt {attempt + 2}/{self.max_retries + 1}) after: {type(e).__name__}: {e}")
+                if cancellation is not None:
+                    cancellation.sleep(delay)
+                else:
+                    time.sleep(delay)
+                attempt += 1
@@ -0,0 +1,236 @@
+"""
+Per-stage instrumentation of an analysis run.
+
+Every warehouse job is recorded with its latency, queue time, bytes processed
+and billed, slot time, rows, in-memory result size and cache outcome, and is
+attributed to the stage running at the time (reach, each metric, conversion
+breakdowns, rendering, ...). With memory profiling, the peak and retained Python
+memory of each stage are measured with tracemalloc. Stages running in other
+threads are tracked separately. The report is available as DataFrames and as
+JSON.
+"""
+
+import json
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from .tracing import span
+
+JOB_TOTALS = ['queue_seconds', 'bytes_processed', 'bytes_billed', 'slot_ms', 'rows', 'result_bytes']
+MEMORY_COLUMNS = ['memory_peak_bytes', 'memory_retained_bytes']
+
+
+class RunReport:
+    """Wall time, warehouse usage and cache outcomes of each stage of a run."""
+    
+    def __init__(self, name: Optional[str] = None, profile_memory: bool = False, run_id: Optional[str] = None):
+        """
+        Initialize an empty report.
+        
+        Args:
+            name: Name of the run (e.g. the experiment name)
+            profile_memory: Whether to measure the memory of each stage while ``profiling()`` is active
+            run_id: ID of the run (a new one by default; a resumed run keeps its ID)
+        """
+        self.name = name
+        self.profile_memory = profile_memory
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.created_at = datetime.now().isoformat(timespec='seconds')
+        self.stages: List[Dict[str, Any]] = []
+        self.jobs: List[Dict[str, Any]] = []
+        self._local = threading.local()
+        self._intervals: List[Tuple[float, float]] = []
+        self._peaks: List[int] = []
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def profiling(self) -> Iterator[None]:
+        """
+        Trace Python allocations for the duration of the block, if memory profiling is on.
+        
+        Tracing slows allocations down noticeably, so it is only active around a run.
+        """
+        started = self.profile_memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            yield
+        finally:
+            if started:
+                tracemalloc.stop()
+    
+    @property
+    def _current(self) -> List[str]:
+        """Open stages of the current thread."""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+    
+    def _update_peaks(self, peak: int):
+        """Carry the traced peak so far into every open stage, then restart peak tracking."""
+        self._peaks = [max(stage_peak, peak) for stage_peak in self._peaks]
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+    
+    @contextmanager
+    def stage(self, name: str, category: str = 'stage') -> Iterator[None]:
+        """
+        Attribute the jobs run inside the block to a stage and time it.
+        
+        Stages can be nested; jobs are attributed to the innermost one of their thread. Each stage
+        is also a tracing span. While memory is profiled, the stage's peak and retained
+        memory are recorded relative to the memory in use when it started.
+        
+        Args:
+            name: Stage name
+            category: Tracing span category
+        """
+        profiling = self.profile_memory and tracemalloc.is_tracing()
+        if profiling:
+            memory_start, peak = tracemalloc.get_traced_memory()
+            self._update_peaks(peak)
+            self._peaks.append(memory_start)
+        self._current.append(name)
+        started = time.perf_counter()
+        try:
+            with span(name, category):
+                yield
+        finally:
+            self._current.pop()
+            ended = time.perf_counter()
+            record = {
+                'stage': name,
+                'parent': self._current[-1] if self._current else None,
+                'wall_seconds': ended - started,
+            }
+            if profiling:
+                memory_end, peak = tracemalloc.get_traced_memory()
+                self._update_peaks(peak)
+                record['memory_peak_bytes'] = self._peaks.pop() - memory_start
+                record['memory_retained_bytes'] = memory_end - memory_start
+            with self._lock:
+                self.stages.append(record)
+                if record['parent'] is None:
+                    self._intervals.append((started, ended))
+    
+    @contextmanager
+    def within(self, stage: Optional[str]) -> Iterator[None]:
+        """
+        Attribute the jobs of the current thread to a stage opened in another thread.
+        
+        Used by worker threads of a stage (e.g. shards); the stage is not timed again.
+        
+        Args:
+            stage: Stage name (None leaves attribution unchanged)
+        """
+        if stage is None:
+            yield
+            return
+        self._current.append(stage)
+        try:
+            yield
+        finally:
+            self._current.pop()
+    
+    def wall_seconds(self) -> float:
+        """Wall time covered by the top-level stages, counting overlapping stages once."""
+        total = 0.0
+        covered_until = float('-inf')
+        for start, end in sorted(self._intervals):
+            total += max(0.0, end - max(start, covered_until))
+            covered_until = max(covered_until, end)
+        return total
+    
+    @property
+    def current_stage(self) -> Optional[str]:
+        """Innermost running stage, if any."""
+        return self._current[-1] if self._current else None
+    
+    def record_job(self, **fields):
+        """
+        Record a warehouse job in the current stage.
+        
+        Args:
+            **fields: Job fields (job_id, wall_seconds, queue_seconds, bytes_processed,
+                bytes_billed, slot_ms, rows, result_bytes, cache)
+        """
+        with self._lock:
+            self.jobs.append({'stage': self.current_stage, **fields})
+    
+    def jobs_frame(self) -> pd.DataFrame:
+        """One row per warehouse job."""
+        return pd.DataFrame(
+            self.jobs,
+            columns=['stage', 'job_id', 'cache', 'wall_seconds'] + JOB_TOTALS
+        )
+    
+    def to_frame(self) -> pd.DataFrame:
+        """
+        One row per stage, with its wall time and the totals of its jobs.
+        
+        Returns:
+            DataFrame with stage, parent, wall_seconds, jobs, queue_seconds, bytes_processed,
+            bytes_billed, slot_ms, rows, result_bytes, cache_hits, cache_misses, and
+            memory_peak_bytes and memory_retained_bytes when memory was profiled
+        """
+        stages = pd.DataFrame(self.stages, columns=['stage', 'parent', 'wall_seconds'] + MEMORY_COLUMNS)
+        jobs = self.jobs_frame()
+        totals = jobs.groupby('stage')[JOB_TOTALS].sum(min_count=1)
+        totals['jobs'] = jobs.groupby('stage').size()
+        totals['cache_hits'] = jobs[jobs['cache'] != 'miss'].groupby('stage').size()
+        totals['cache_misses'] = jobs[jobs['cache'] == 'miss'].groupby('stage').size()
+        report = stages.merge(totals, left_on='stage', right_index=True, how='left')
+        counts = ['jobs', 'cache_hits', 'cache_misses']
+        report[counts] = report[counts].fillna(0).astype(int)
+        columns = ['stage', 'parent', 'wall_seconds', 'jobs'] + JOB_TOTALS + ['cache_hits', 'cache_misses']
+        if report[MEMORY_COLUMNS].notna().any().any():
+            columns += MEMORY_COLUMNS
+        return report[columns]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Report as a JSON-serializable dict."""
+        return {
+            'name': self.name,
+            'run_id': self.run_id,
+            'created_at': self.created_at,
+            'stages': json.loads(self.to_frame().to_json(orient='records')),
+            'jobs': json.loads(self.jobs_frame().to_json(orient='records')),
+        }
+    
+    def to_json(self, path: Optional[str] = None) -> str:
+        """
+        Serialize the report to JSON.
+        
+        Args:
+            path: Optional file to write the JSON to
+        
+        Returns:
+            JSON string
+        """
+        data = json.dumps(self.to_dict(), indent=2)
+        if path:
+            with open(path, 'w') as f:
+                f.write(data)
+        return data
+    
+    def summary(self) -> str:
+        """One-line summary of the run."""
+        jobs = self.jobs_frame()
+        summary = (
+            f"⏱️ {self.wall_seconds():.1f}s, {len(jobs)} warehouse jobs "
+            f"({int((jobs['cache'] != 'miss').sum())} cached), "
+            f"{jobs['bytes_billed'].sum() / 2 ** 30:.2f} GiB billed"
+        )
+        peaks = [stage for stage in self.stages if stage.get('memory_peak_bytes') is not None]
+        if peaks:
+            largest = max(peaks, key=lambda stage: stage['memory_peak_bytes'])
+            summary += f", peak memory {largest['memory_peak_bytes'] / 2 ** 20:,.0f} MiB in {largest['stage']}"
+        return summary
@@ -0,0 +1,212 @@
+"""
+HyperLogLog sketches for mergeable reach counts.
+
+Registers are computed in the warehouse (see ``DataQueries.get_exposure_sketch_registers``)
+and stored locally as compressed bytes, one sketch per hour, segment and client. Reach for
+any window or rollup is obtained by merging sketches locally, without re-scanning exposures.
+"""
+
+import os
+import sqlite3
+import zlib
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+HLL_PRECISION = 12
+
+
+def _alpha(m: int) -> float:
+    """Bias correction constant for ``m`` registers."""
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
+
+
+def estimate_cardinality(registers: np.ndarray) -> np.ndarray:
+    """
+    Estimate distinct counts from HLL registers.
+    
+    Args:
+        registers: Array of shape (..., m) with the max rank per register
+    
+    Returns:
+        Array of shape (...) with the estimated counts
+    """
+    registers = np.asarray(registers, dtype=float)
+    m = registers.shape[-1]
+    raw = _alpha(m) * m ** 2 / np.sum(2.0 ** -registers, axis=-1)
+    zeros = np.sum(registers == 0, axis=-1)
+    with np.errstate(divide='ignore'):
+        # Linear counting for small cardinalities
+        linear = m * np.log(m / np.where(zeros > 0, zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+class HyperLogLog:
+    """Dense HyperLogLog sketch."""
+    
+    def __init__(self, precision: int = HLL_PRECISION, registers: Optional[np.ndarray] = None):
+        """
+        Initialize a sketch.
+        
+        Args:
+            precision: Number of index bits (``2 ** precision`` registers)
+            registers: Optional initial registers
+        """
+        self.precision = precision
+        self.registers = (
+            np.zeros(2 ** precision, dtype=np.uint8) if registers is None
+            else np.asarray(registers, dtype=np.uint8)
+        )
+    
+    @classmethod
+    def from_registers(cls, registers: List[int], ranks: List[int], precision: int = HLL_PRECISION) -> 'HyperLogLog':
+        """Build a sketch from sparse (register, rho) pairs."""
+        sketch = cls(precision)
+        np.maximum.at(sketch.registers, np.asarray(registers, dtype=np.int64), np.asarray(ranks, dtype=np.uint8))
+        return sketch
+    
+    @classmethod
+    def from_bytes(cls, data: bytes, precision: int = HLL_PRECISION) -> 'HyperLogLog':
+        """Deserialize a sketch."""
+        return cls(precision, np.frombuffer(zlib.decompress(data), dtype=np.uint8).copy())
+    
+    def to_bytes(self) -> bytes:
+        """Serialize the sketch as compressed registers."""
+        return zlib.compress(self.registers.tobytes())
+    
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """Return the union of two sketches."""
+        return HyperLogLog(self.precision, np.maximum(self.registers, other.registers))
+    
+    def estimate(self) -> float:
+        """Estimated number of distinct users."""
+        return float(estimate_cardinality(self.registers))
+
+
+class SketchStore:
+    """Local SQLite store of hourly exposure sketches."""
+    
+    def __init__(self, path: str = '.reach_sketches.sqlite', precision: int = HLL_PRECISION):
+        """
+        Initialize the store.
+        
+        Args:
+            path: SQLite file path
+            precision: HLL precision of the stored sketches
+        """
+        self.path = path
+        self.precision = precision
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with sqlite3.connect(self.path) as conn:
+            conn.execute(
+                '''CREATE TABLE IF NOT EXISTS sketches (
+                    experiment_name TEXT,
+                    hour TEXT,
+                    segment_name TEXT,
+                    segmentation_client TEXT,
+                    sketch BLOB,
+                    PRIMARY KEY (experiment_name, hour, segment_name, segmentation_client)
+                )'''
+            )
+    
+    def last_hour(self, experiment_name: str) -> Optional[str]:
+        """Latest stored hour for an experiment, or None if nothing is stored."""
+        with sqlite3.connect(self.path) as conn:
+            row = conn.execute('SELECT MAX(hour) FROM sketches WHERE experiment_name = ?', (experiment_name,)).fetchone()
+        return row[0]
+    
+    def add_registers(self, experiment_name: str, df: pd.DataFrame) -> int:
+        """
+        Store sketches built from warehouse register rows, replacing existing hours.
+        
+        Args:
+            experiment_name: Name of the experiment
+            df: DataFrame with hour, segment_name, segmentation_client, register and rho
+        
+        Returns:
+            Number of sketches written
+        """
+        rows = []
+        keys = ['hour', 'segment_name', 'segmentation_client']
+        for (hour, segment, client), group in df.fillna({'segment_name': '', 'segmentation_client': ''}).groupby(keys):
+            sketch = HyperLogLog.from_registers(group['register'], group['rho'], self.precision)
+            rows.append((experiment_name, pd.Timestamp(hour).isoformat(), segment, client, sketch.to_bytes()))
+        
+        with sqlite3.connect(self.path) as conn:
+            conn.executemany('INSERT OR REPLACE INTO sketches VALUES (?, ?, ?, ?, ?)', rows)
+        return len(rows)
+    
+    def load(self, experiment_name: str) -> pd.DataFrame:
+        """Load all sketches of an experiment with their registers decoded."""
+        with sqlite3.connect(self.path) as conn:
+            df = pd.read_sql_query(
+                'SELECT hour, segment_name, segmentation_client, sketch FROM sketches '
+                'WHERE experiment_name = ? ORDER BY hour',
+                conn, params=(experiment_name,)
+            )
+        df['registers'] = [HyperLogLog.from_bytes(data, self.precision).registers for data in df['sketch']]
+        return df.drop(columns='sketch')
+    
+    def reach(
+        self,
+        experiment_name: str,
+        by: Optional[List[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        segments: Optional[List[str]] = None,
+        clients: Optional[List[str]] = None,
+        cumulative: bool = True
+    ) -> pd.DataFrame:
+        """
+        Distinct exposed users for any window and rollup, from merged sketches.
+        
+        Args:
+            experiment_name: Name of the experiment
+            by: Dimensions to keep ('segment_name', 'segmentation_client'); others are merged
+            start: Optional first hour (inclusive, ISO format)
+            end: Optional last hour (inclusive, ISO format)
+            segments: Optional segments to keep
+            clients: Optional clients to keep
+            cumulative: Return the running reach per hour instead of the window total
+        
+        Returns:
+            DataFrame with the ``by`` columns, ``time`` (when cumulative) and ``users``
+        """
+        by = list(by or [])
+        df = self.load(experiment_name)
+        if start:
+            df = df[df['hour'] >= pd.Timestamp(start).isoformat()]
+        if end:
+            df = df[df['hour'] <= pd.Timestamp(end).isoformat()]
+        if segments:
+            df = df[df['segment_name'].isin(segments)]
+        if clients:
+            df = df[df['segmentation_client'].isin(clients)]
+        
+        results = []
+        groups = df.groupby(by, sort=False) if by else [((), df)]
+        for key, group in groups:
+            key = key if isinstance(key, tuple) else (key,)
+            hourly = group.groupby('hour', sort=True)['registers'].apply(lambda r: np.maximum.reduce(list(r)))
+            stacked = np.stack(hourly.to_list()) if len(hourly) else np.zeros((0, 2 ** self.precision), dtype=np.uint8)
+            if cumulative:
+                users = estimate_cardinality(np.maximum.accumulate(stacked, axis=0)) if len(stacked) else []
+                frame = pd.DataFrame({'time': pd.to_datetime(hourly.index), 'users': users})
+            else:
+                total = stacked.max(axis=0) if len(stacked) else np.zeros(2 ** self.precision)
+                frame = pd.DataFrame({'users': [float(estimate_cardinality(total))]})
+            for column, value in zip(by, key):
+                frame[column] = value
+            results.append(frame)
+        
+        columns = by + (['time'] if cumulative else []) + ['users']
+        return pd.concat(results, ignore_index=True)[columns] if results else pd.DataFrame(columns=columns)
@@ -0,0 +1,315 @@
+"""
+Hierarchical tracing spans (run → stage → metric → query → fetch → render).
+
+Spans are emitted through a process-wide tracer. The default tracer does
+nothing, so instrumentation costs a function call when tracing is off. A
+``Tracer`` with exporters records every span; ``JSONLinesExporter`` appends
+one span per line and ``ChromeTraceExporter`` writes a trace-event file that
+opens in ``chrome://tracing`` or Perfetto, with one lane per thread.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+
+class Span:
+    """A timed operation, with its parent and attributes."""
+    
+    __slots__ = ('name', 'category', 'attributes', 'span_id', 'parent_id', 'thread_id', 'thread_name', 'start_ns', 'end_ns')
+    
+    def __init__(self, name: str, category: str, attributes: Dict[str, Any], parent_id: Optional[str]):
+        self.name = name
+        self.category = category
+        self.attributes = attributes
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        thread = threading.current_thread()
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+    
+    @property
+    def duration_ms(self) -> float:
+        """Duration in milliseconds."""
+        return (self.end_ns - self.start_ns) / 1e6
+    
+    def set(self, **attributes):
+        """Add attributes to the span."""
+        self.attributes.update(attributes)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Span as a JSON-serializable dict."""
+        return {
+            'name': self.name,
+            'category': self.category,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'pid': os.getpid(),
+            'thread_id': self.thread_id,
+            'thread_name': self.thread_name,
+            'start_ns': self.start_ns,
+            'duration_ms': self.duration_ms,
+            'attributes': self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Span of the disabled tracer."""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+    
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _SpanContext:
+    """Opens a span on enter and exports it on exit."""
+    
+    __slots__ = ('tracer', 'span')
+    
+    def __init__(self, tracer: 'Tracer', span: Span):
+        self.tracer = tracer
+        self.span = span
+    
+    def __enter__(self) -> Span:
+        self.tracer._stack().append(self.span)
+        return self.span
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.span.end_ns = time.time_ns()
+        if exc_type is not None:
+            self.span.attributes['error'] = f'{exc_type.__name__}: {exc}'
+        self.tracer._stack().pop()
+        self.tracer._export(self.span)
+        return False
+
+
+class SpanExporter(ABC):
+    """Destination of finished spans."""
+    
+    @abstractmethod
+    def export(self, span: Span):
+        """Handle a finished span."""
+    
+    def close(self):
+        """Flush and release resources."""
+
+
+class JSONLinesExporter(SpanExporter):
+    """Appends each finished span to a JSON-lines file."""
+    
+    def __init__(self, path: str = 'trace.jsonl'):
+        """
+        Initialize the exporter.
+        
+        Args:
+            path: Output file, appended to
+        """
+        self.path = path
+        self._file = open(path, 'a')
+        self._lock = threading.Lock()
+    
+    def export(self, span: Span):
+        """Write a span as one line."""
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+    
+    def close(self):
+        """Close the file."""
+        self._file.close()
+
+
+class ChromeTraceExporter(SpanExporter):
+    """Collects spans and writes them as a Chrome trace-event file on close."""
+    
+    def __init__(self, path: str = 'trace.json'):
+        """
+        Initialize the exporter.
+        
+        Args:
+            path: Output file, overwritten on close
+        """
+        self.path = path
+        self._events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+    
+    def export(self, span: Span):
+        """Add a complete event for a span."""
+        event = {
+            'name': span.name,
+            'cat': span.category,
+            'ph': 'X',
+            'ts': span.start_ns / 1000,
+            'dur': (span.end_ns - span.start_ns) / 1000,
+            'pid': os.getpid(),
+            'tid': span.thread_id,
+            'args': span.attributes,
+        }
+        with self._lock:
+            self._events.append(event)
+            self._threads[span.thread_id] = span.thread_name
+    
+    def close(self):
+        """Write the trace file, with thread names for the timeline lanes."""
+        with self._lock:
+            metadata = [
+                {'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}}
+                for tid, name in self._threads.items()
+            ]
+            data = json.dumps({'traceEvents': metadata + self._events, 'displayTimeUnit': 'ms'}, default=str)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+
+class Tracer:
+    """Records spans and hands them to exporters."""
+    
+    enabled = True
+    
+    def __init__(self, exporters: Optional[List[SpanExporter]] = None):
+        """
+        Initialize the tracer.
+        
+        Args:
+            exporters: Destinations of the finished spans
+        """
+        self.exporters = exporters or []
+        self._local = threading.local()
+    
+    def _stack(self) -> List[Span]:
+        """Open spans of the current thread."""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+    
+    def span(self, name: str, category: str = 'stage', **attributes) -> _SpanContext:
+        """
+        Open a span as a context manager.
+        
+        Spans opened in worker threads have no parent and appear on their own lane.
+        
+        Args:
+            name: Span name
+            category: One of run, stage, metric, query, fetch, render (or any other label)
+            **attributes: Span attributes
+        """
+        stack = self._stack()
+        return _SpanContext(self, Span(name, category, attributes, stack[-1].span_id if stack else None))
+    
+    def _export(self, span: Span):
+        """Send a finished span to every exporter."""
+        for exporter in self.exporters:
+            exporter.export(span)
+    
+    def close(self):
+        """Close every exporter."""
+        for exporter in self.exporters:
+            exporter.close()
+
+
+class NoopTracer(Tracer):
+    """Default tracer: records nothing."""
+    
+    enabled = False
+    
+    def __init__(self):
+        super().__init__([])
+    
+    def span(self, name: str, category: str = 'stage', **attributes) -> _NoopSpan:
+        """Return a span that does nothing."""
+        return _NOOP_SPAN
+
+
+_tracer: Tracer = NoopTracer()
+
+
+def get_tracer() -> Tracer:
+    """Current process-wide tracer."""
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> Tracer:
+    """
+    Replace the process-wide tracer.
+    
+    Args:
+        tracer: New tracer (None restores the no-op tracer)
+    
+    Returns:
+        Previous tracer
+    """
+    global _tracer
+    previous, _tracer = _tracer, tracer or NoopTracer()
+    return previous
+
+
+def enable_tracing(jsonl_path: Optional[str] = None, chrome_path: Optional[str] = None) -> Tracer:
+    """
+    Record spans to local files until ``disable_tracing`` is called.
+    
+    Args:
+        jsonl_path: Optional JSON-lines output file
+        chrome_path: Optional Chrome trace-event output file
+    
+    Returns:
+        Tracer object
+    """
+    exporters = []
+    if jsonl_path:
+        exporters.append(JSONLinesExporter(jsonl_path))
+    if chrome_path:
+        exporters.append(ChromeTraceExporter(chrome_path))
+    tracer = Tracer(exporters)
+    set_tracer(tracer)
+    return tracer
+
+
+def disable_tracing():
+    """Close the current tracer's exporters and restore the no-op tracer."""
+    set_tracer(None).close()
+
+
+def span(name: str, category: str = 'stage', **attributes):
+    """Open a span on the process-wide tracer."""
+    return _tracer.span(name, category, **attributes)
+
+
+def traced(category: str, name: Optional[str] = None) -> Callable:
+    """
+    Decorator running a function inside a span.
+    
+    Args:
+        category: Span category
+        name: Span name (defaults to the function name)
+    """
+    def decorator(function: Callable) -> Callable:
+        span_name = name or function.__qualname__
+        
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return function(*args, **kwargs)
+            with _tracer.span(span_name, category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
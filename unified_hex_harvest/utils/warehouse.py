@@ -0,0 +1,358 @@
+"""
+Single entry point for the warehouse queries run by the library.
+"""
+
+import concurrent.futures
+import itertools
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from typing import Any, ContextManager, Dict, Iterator, Optional
+
+import pandas as pd
+
+from .cancellation import Cancelled, CancellationToken
+from .cost_ledger import CostLedger, current_user, label_value
+from .credentials import shared_client
+from .limiter import PRIORITIES, WarehouseLimiter
+from .result_cache import LocalBackend, ResultCache, query_fingerprint
+from .retry import RetryPolicy
+from .run_report import RunReport
+from .tracing import span
+
+# Seconds between cancellation checks while waiting for a job
+JOB_POLL_SECONDS = 1.0
+
+
+class Warehouse:
+    """Runs warehouse queries, serving them from the result cache when possible."""
+    
+    def __init__(
+        self,
+        cache: Optional[ResultCache] = None,
+        limiter: Optional[WarehouseLimiter] = None,
+        execution_mode: str = 'interactive',
+        report: Optional[RunReport] = None,
+        ledger: Optional[CostLedger] = None,
+        labels: Optional[Dict[str, str]] = None,
+        memory_warning_bytes: Optional[int] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        cancellation: Optional[CancellationToken] = None
+    ):
+        """
+        Initialize the warehouse client.
+        
+        Args:
+            cache: Optional shared result cache
+            limiter: Optional limit of concurrent warehouse jobs shared with other processes
+            execution_mode: 'interactive' for low-latency jobs (the notebook cell being looked at),
+                'batch' for jobs that can wait for idle capacity (scheduled refreshes). Sets both
+                the BigQuery job priority and the limiter priority, and is recorded as a job label.
+            report: Optional run report recording every job
+            ledger: Optional cost ledger recording every warehouse job
+            labels: Labels of every job (e.g. experiment), completed with the stage, user and mode
+            memory_warning_bytes: Size of a single result in memory above which a warning is printed
+            retry_policy: Retries of transient errors (defaults to ``RetryPolicy()``)
+            cancellation: Token cancelling the client's waits and in-flight jobs (a new one by default)
+        """
+        if execution_mode not in PRIORITIES:
+            raise ValueError(f"execution_mode must be one of {list(PRIORITIES)}, got: {execution_mode}")
+        self.cache = cache
+        self.limiter = limiter
+        self.execution_mode = execution_mode
+        self.report = report
+        self.ledger = ledger
+        self.labels = dict(labels or {})
+        self.memory_warning_bytes = memory_warning_bytes
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.cancellation = cancellation or CancellationToken()
+        self._run_id: Optional[str] = None
+        self._client = None
+    
+    @classmethod
+    def from_config(
+        cls,
+        config,
+        execution_mode: str = 'interactive',
+        cancellation: Optional[CancellationToken] = None
+    ) -> 'Warehouse':
+        """
+        Build the warehouse client configured for an experiment.
+        
+        Args:
+            config: ExperimentConfig object
+            execution_mode: 'interactive' or 'batch'
+            cancellation: Optional cancellation token
+        
+        Returns:
+            Warehouse object
+        """
+        cache = None
+        if config.result_cache:
+            cache = ResultCache(LocalBackend(config.result_cache_dir), config.result_cache_max_age_hours)
+        limiter = None
+        if config.warehouse_slots is not None:
+            limiter = WarehouseLimiter(
+                config.warehouse_slots_path,
+                slots=config.warehouse_slots,
+                interactive_reserved_slots=config.interactive_reserved_slots
+            )
+        ledger = CostLedger(config.cost_ledger_path) if config.cost_ledger else None
+        memory_warning_bytes = int(config.memory_warning_mb * 2 ** 20) if config.memory_warning_mb is not None else None
+        retry_policy = RetryPolicy(
+            config.query_retries,
+            initial_delay=config.retry_initial_delay_seconds,
+            max_delay=config.retry_max_delay_seconds
+        )
+        return cls(
+            cache, limiter, execution_mode,
+            ledger=ledger,
+            labels={'experiment': config.experiment_name},
+            memory_warning_bytes=memory_warning_bytes,
+            retry_policy=retry_policy,
+            cancellation=cancellation
+        )
+    
+    def slot(self, cancellation: Optional[CancellationToken] = None) -> ContextManager:
+        """
+        Hold a warehouse slot, for jobs submitted outside ``read_gbq`` (e.g. ``request_multiple_metrics``).
+        
+        Args:
+            cancellation: Token stopping the wait for a slot (defaults to the client's)
+        
+        Returns:
+            Context manager (a no-op without a limiter)
+        """
+        if self.limiter is None:
+            return nullcontext()
+        return self.limiter.slot(self.execution_mode, cancellation or self.cancellation)
+    
+    @property
+    def client(self):
+        """BigQuery client shared by every warehouse client of the process (see ``shared_client``)."""
+        if self._client is None:
+            self._client = shared_client()
+        return self._client
+    
+    @property
+    def run_id(self) -> Optional[str]:
+        """ID of the run in progress (see ``run``), or None outside a run."""
+        return self._run_id
+    
+    @contextmanager
+    def run(self, run_id: str) -> Iterator[None]:
+        """
+        Give the queries of the block deterministic job IDs under a run ID.
+        
+        A resumed run keeps its run ID, so its queries re-attach to the jobs submitted
+        by the interrupted attempt instead of paying for them twice.
+        
+        Args:
+            run_id: ID of the run (e.g. the run report's)
+        """
+        self._run_id = run_id
+        try:
+            yield
+        finally:
+            self._run_id = None
+    
+    def job_id(self, query: str) -> str:
+        """
+        BigQuery job ID of a query.
+        
+        In a run, the ID is made of the run ID and the query fingerprint, so the same
+        query in a resumed run re-attaches to its job. Outside a run, every call gets a
+        new ID: calling again later runs the query again rather than returning the rows
+        of an old job, whose temporary result table may also have expired. Retries of
+        a call always keep its ID (see ``read_gbq``).
+        
+        Args:
+            query: Compiled SQL string
+        
+        Returns:
+            Job ID made of the run ID (or a new ID) and the query fingerprint
+        """
+        run_id = self.run_id or uuid.uuid4().hex[:12]
+        return f'harvest_{label_value(run_id)}_{query_fingerprint(query)[:40]}'
+    
+    def job_labels(self, labels: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        Attribution of a job: experiment, metric, stage, user and execution mode.
+        
+        Args:
+            labels: Labels of this job, overriding the client's
+        
+        Returns:
+            Dict of raw (unsanitized) label values
+        """
+        job_labels = {**self.labels, **(labels or {})}
+        if self.report is not None and self.report.current_stage:
+            job_labels.setdefault('stage', self.report.current_stage)
+        job_labels['user'] = current_user()
+        job_labels['execution_mode'] = self.execution_mode
+        return job_labels
+    
+    def job_configuration(self, labels: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        BigQuery job configuration of this client's queries.
+        
+        Args:
+            labels: Raw label values (defaults to ``job_labels()``)
+        
+        Returns:
+            Job configuration in the REST API format
+        """
+        labels = self.job_labels() if labels is None else labels
+        return {
+            'query': {'priority': self.execution_mode.upper()},
+            'labels': {key: label_value(value) for key, value in labels.items() if value is not None},
+        }
+    
+    def read_gbq(
+        self,
+        query: str,
+        labels: Optional[Dict[str, str]] = None,
+        cancellation: Optional[CancellationToken] = None
+    ) -> pd.DataFrame:
+        """
+        Run a query and return its result.
+        
+        The job is cancelled if the call is interrupted, or if the cancellation token
+        is cancelled or one of its deadlines passes while the job runs.
+        
+        Args:
+            query: Compiled SQL string
+            labels: Labels of this job (e.g. ``{'metric': 'Retention'}``), added to the client's
+            cancellation: Token of this call (defaults to the client's)
+        
+        Returns:
+            DataFrame with the query result
+        
+        Raises:
+            Cancelled: If the token was cancelled or a deadline passed
+        """
+        cancellation = cancellation or self.cancellation
+        cancellation.check()
+        labels = self.job_labels(labels)
+        started = time.perf_counter()
+        with span('query', 'query', execution_mode=self.execution_mode) as query_span:
+            if self.cache is not None:
+                df = self.cache.get(query)
+                if df is not None:
+                    query_span.set(cache='result_cache', rows=len(df))
+                    self._record(None, df, started, 'result_cache')
+                    return df
+            
+            job_id = self.job_id(query)
+            job, df = self.retry_policy.call(
+                lambda attempt: self._run_job(query, labels, job_id, cancellation), f'job {job_id}', cancellation
+            )
+            cache = 'bigquery' if job.cache_hit else 'miss'
+            query_span.set(job_id=job.job_id, cache=cache, rows=len(df))
+            self._record(job, df, started, cache)
+            if self.ledger is not None:
+                self.ledger.record(
+                    run_id=self.report.run_id if self.report is not None else None,
+                    job_id=job.job_id,
+                    experiment_name=labels.get('experiment'),
+                    metric=labels.get('metric'),
+                    stage=labels.get('stage'),
+                    user=labels['user'],
+                    execution_mode=self.execution_mode,
+                    cache=cache,
+                    bytes_processed=job.total_bytes_processed,
+                    bytes_billed=job.total_bytes_billed,
+                    slot_ms=job.slot_millis
+                )
+            
+            if self.cache is not None:
+                self.cache.put(query, df)
+            return df
+    
+    def _run_job(self, query: str, labels: Dict[str, str], job_id: str, cancellation: CancellationToken):
+        """
+        Run a query job (or re-attach to it) while holding a warehouse slot, and fetch its result.
+        
+        Returns:
+            Tuple of (job, DataFrame)
+        """
+        from google.cloud import bigquery
+        with self.slot(cancellation):
+            job_config = bigquery.QueryJobConfig.from_api_repr(self.job_configuration(labels))
+            job = self._submit(query, job_config, job_id)
+            with span('wait', 'query', job_id=job.job_id):
+                try:
+                    self._wait(job, cancellation)
+                except (Cancelled, KeyboardInterrupt):
+                    self._cancel(job)
+                    raise
+            with span('fetch', 'fetch', job_id=job.job_id):
+                df = job.to_dataframe()
+        return job, df
+    
+    def _submit(self, query: str, job_config, job_id: str):
+        """
+        Submit a job under a deterministic ID, or re-attach to the job that already has it.
+        
+        A job that already failed under that ID is not reused: the query is submitted
+        again under the next ID of the sequence (``<job_id>_retry<n>``).
+        
+        Returns:
+            QueryJob object
+        """
+        from google.api_core.exceptions import Conflict
+        for retry in itertools.count():
+            candidate = job_id if retry == 0 else f'{job_id}_retry{retry}'
+            try:
+                return self.client.query(query, job_config=job_config, job_id=candidate, job_retry=None)
+            except Conflict:
+                job = self.client.get_job(candidate, location=self.client.location)
+                if job.state == 'DONE' and job.error_result is not None:
+                    continue
+                print(f"🔗 Re-attaching to warehouse job {candidate}")
+                return job
+    
+    @staticmethod
+    def _wait(job, cancellation: CancellationToken):
+        """Wait for a job to finish, checking the cancellation token between polls."""
+        while True:
+            cancellation.check()
+            try:
+                job.result(timeout=cancellation.wait_time(JOB_POLL_SECONDS))
+                return
+            except concurrent.futures.TimeoutError:
+                continue
+    
+    @staticmethod
+    def _cancel(job):
+        """Ask the warehouse to cancel a job, so it stops billing."""
+        try:
+            job.cancel()
+            print(f"🛑 Cancelled warehouse job {job.job_id}")
+        except Exception as e:
+            print(f"⚠️  Could not cancel warehouse job {job.job_id}: {e}")
+    
+    def _record(self, job, df: pd.DataFrame, started: float, cache: str):
+        """Add a job to the run report, if any, and warn about large results."""
+        result_bytes = int(df.memory_usage(deep=True).sum())
+        if self.memory_warning_bytes is not None and result_bytes > self.memory_warning_bytes:
+            stage = self.report.current_stage if self.report is not None else None
+            print(f"⚠️  Query result of {result_bytes / 2 ** 20:,.0f} MiB ({len(df):,} rows)"
+                  + (f" in {stage}" if stage else "")
+                  + f" is above the {self.memory_warning_bytes / 2 ** 20:,.0f} MiB warning threshold")
+        if self.report is None:
+            return
+        queue_seconds = None
+        if job is not None and job.started is not None and job.created is not None:
+            queue_seconds = (job.started - job.created).total_seconds()
+        self.report.record_job(
+            job_id=job.job_id if job is not None else None,
+            cache=cache,
+            wall_seconds=time.perf_counter() - started,
+            queue_seconds=queue_seconds,
+            bytes_processed=job.total_bytes_processed if job is not None else 0,
+            bytes_billed=job.total_bytes_billed if job is not None else 0,
+            slot_ms=job.slot_millis if job is not None else 0,
+            rows=len(df),
+            result_bytes=result_bytes
+        )
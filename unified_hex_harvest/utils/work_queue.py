@@ -0,0 +1,284 @@
+"""
+Work queue for distributing experiment analyses across worker processes and hosts.
+
+``WorkQueue`` is the interface; ``SQLiteWorkQueue`` is a local implementation
+that any number of processes can consume, including on several hosts when the
+database lives on a shared filesystem with working file locks. Tasks are leased
+for a limited time, so a crashed worker's task is picked up again once its
+lease expires. Failures are retried with backoff, and results are only written
+by the current lease holder, once.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from typing import Any, Callable, Dict, Optional
+
+Task = namedtuple('Task', ['task_id', 'payload', 'attempts', 'lease_token'])
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class WorkQueue(ABC):
+    """Interface of a work queue with leases and retries."""
+    
+    @abstractmethod
+    def put(self, task_id: str, payload: Dict[str, Any], max_attempts: int = 3) -> bool:
+        """
+        Add a task unless a task with the same id already exists.
+        
+        Args:
+            task_id: Stable task id (e.g. the config fingerprint), making enqueues idempotent
+            payload: JSON-serializable task payload
+            max_attempts: Number of attempts before the task is marked failed
+        
+        Returns:
+            Whether the task was added
+        """
+    
+    @abstractmethod
+    def lease(self, worker_id: str, lease_seconds: float = 1800) -> Optional[Task]:
+        """
+        Lease the next available task.
+        
+        Args:
+            worker_id: Id of the leasing worker
+            lease_seconds: Lease duration; the task becomes available again after it
+        
+        Returns:
+            Task, or None if no task is available
+        """
+    
+    @abstractmethod
+    def extend(self, task: Task, lease_seconds: float = 1800) -> bool:
+        """Extend a lease still held; returns False if it was lost."""
+    
+    @abstractmethod
+    def complete(self, task: Task, result: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Record the result of a leased task.
+        
+        Only the current lease holder can complete a task, and only once, so a
+        worker whose lease expired cannot overwrite the result of its successor.
+        
+        Returns:
+            Whether the result was recorded
+        """
+    
+    @abstractmethod
+    def fail(self, task: Task, error: str, retry_delay: float = 60) -> bool:
+        """
+        Record a failed attempt; the task is retried after ``retry_delay`` seconds
+        (doubling with each attempt) until it runs out of attempts.
+        
+        Returns:
+            Whether the failure was recorded
+        """
+    
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        """Number of tasks per status."""
+    
+    @abstractmethod
+    def result(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Result of a completed task, or None."""
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Work queue stored in a SQLite database."""
+    
+    def __init__(self, path: str = '.work_queue.sqlite'):
+        """
+        Initialize the queue.
+        
+        Args:
+            path: SQLite file path
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                '''CREATE TABLE IF NOT EXISTS tasks (
+                    task_id TEXT PRIMARY KEY,
+                    payload TEXT,
+                    status TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    max_attempts INTEGER,
+                    available_at REAL,
+                    lease_owner TEXT,
+                    lease_token TEXT,
+                    lease_expires REAL,
+                    error TEXT,
+                    result TEXT,
+                    updated_at REAL
+                )'''
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection that waits on locks held by other workers."""
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+    
+    def put(self, task_id: str, payload: Dict[str, Any], max_attempts: int = 3) -> bool:
+        """Add a task unless a task with the same id already exists."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO tasks (task_id, payload, status, max_attempts, available_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (task_id, json.dumps(payload), PENDING, max_attempts, now, now)
+            )
+            return cursor.rowcount == 1
+    
+    def lease(self, worker_id: str, lease_seconds: float = 1800) -> Optional[Task]:
+        """Lease the next available task."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            # Take the write lock first so two workers cannot lease the same task
+            conn.execute('BEGIN IMMEDIATE')
+            # Expired leases of tasks out of attempts are failed rather than retried
+            conn.execute(
+                'UPDATE tasks SET status = ?, error = COALESCE(error, ?), updated_at = ? '
+                'WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts',
+                (FAILED, 'lease expired', now, LEASED, now)
+            )
+            row = conn.execute(
+                'SELECT task_id, payload, attempts FROM tasks '
+                'WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires < ?) '
+                'ORDER BY available_at LIMIT 1',
+                (PENDING, now, LEASED, now)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            token = uuid.uuid4().hex
+            conn.execute(
+                'UPDATE tasks SET status = ?, attempts = attempts + 1, lease_owner = ?, lease_token = ?, '
+                'lease_expires = ?, updated_at = ? WHERE task_id = ?',
+                (LEASED, worker_id, token, now + lease_seconds, now, row[0])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return Task(row[0], json.loads(row[1]), row[2] + 1, token)
+    
+    def _update_leased(self, task: Task, assignments: str, params: tuple) -> bool:
+        """Update a task only if the given lease is still held."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f'UPDATE tasks SET {assignments}, updated_at = ? '
+                'WHERE task_id = ? AND status = ? AND lease_token = ?',
+                params + (time.time(), task.task_id, LEASED, task.lease_token)
+            )
+            return cursor.rowcount == 1
+    
+    def extend(self, task: Task, lease_seconds: float = 1800) -> bool:
+        """Extend a lease still held."""
+        return self._update_leased(task, 'lease_expires = ?', (time.time() + lease_seconds,))
+    
+    def complete(self, task: Task, result: Optional[Dict[str, Any]] = None) -> bool:
+        """Record the result of a leased task."""
+        return self._update_leased(
+            task, 'status = ?, result = ?, error = NULL', (DONE, json.dumps(result, default=str))
+        )
+    
+    def fail(self, task: Task, error: str, retry_delay: float = 60) -> bool:
+        """Record a failed attempt."""
+        with self._connect() as conn:
+            row = conn.execute('SELECT max_attempts FROM tasks WHERE task_id = ?', (task.task_id,)).fetchone()
+        if row is not None and task.attempts >= row[0]:
+            return self._update_leased(task, 'status = ?, error = ?', (FAILED, error))
+        available_at = time.time() + retry_delay * 2 ** (task.attempts - 1)
+        return self._update_leased(task, 'status = ?, error = ?, available_at = ?', (PENDING, error, available_at))
+    
+    def counts(self) -> Dict[str, int]:
+        """Number of tasks per status."""
+        with self._connect() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status').fetchall()
+        counts = {status: 0 for status in (PENDING, LEASED, DONE, FAILED)}
+        counts.update(dict(rows))
+        return counts
+    
+    def result(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Result of a completed task, or None."""
+        with self._connect() as conn:
+            row = conn.execute('SELECT result FROM tasks WHERE task_id = ? AND status = ?', (task_id, DONE)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def run_worker(
+    queue: WorkQueue,
+    handler: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+    worker_id: Optional[str] = None,
+    lease_seconds: float = 1800,
+    poll_interval: float = 10,
+    max_tasks: Optional[int] = None,
+    stop_when_empty: bool = True
+) -> int:
+    """
+    Consume tasks from a queue until it is empty.
+    
+    The lease is renewed in the background while a task runs, so long analyses
+    are not handed to another worker.
+    
+    Args:
+        queue: Work queue to consume
+        handler: Function running a task payload and returning a JSON-serializable result
+        worker_id: Id of this worker (defaults to host and process id)
+        lease_seconds: Lease duration
+        poll_interval: Seconds to wait when no task is available
+        max_tasks: Optional number of tasks after which the worker stops
+        stop_when_empty: Stop when no task is available instead of polling
+    
+    Returns:
+        Number of tasks completed by this worker
+    """
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+    completed = 0
+    while max_tasks is None or completed < max_tasks:
+        task = queue.lease(worker_id, lease_seconds)
+        if task is None:
+            if stop_when_empty:
+                break
+            time.sleep(poll_interval)
+            continue
+        
+        print(f"🔧 {worker_id} running {task.task_id} (attempt {task.attempts})")
+        done = threading.Event()
+        
+        def heartbeat():
+            while not done.wait(lease_seconds / 3):
+                queue.extend(task, lease_seconds)
+        
+        renewer = threading.Thread(target=heartbeat, daemon=True)
+        renewer.start()
+        try:
+            result = handler(task.payload)
+        except Exception as e:
+            done.set()
+            queue.fail(task, f'{type(e).__name__}: {e}')
+            print(f"⚠️  {task.task_id} failed: {e}")
+            continue
+        finally:
+            done.set()
+            renewer.join()
+        
+        if queue.complete(task, result):
+            completed += 1
+        else:
+            print(f"⚠️  Lease on {task.task_id} was lost, result discarded")
+    return completed